@@ -0,0 +1,540 @@
+# Copyright (c) 2022-2024 InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Micro-benchmarks of the split inference hot paths.
+
+All inputs are synthetic: no model weights, datasets or external codecs are needed.
+Each case runs at several sizes and reports the median time, the throughput and the
+peak memory. Results can be saved as a baseline, and later runs compared against it.
+
+Timings depend on the machine, so no baseline is committed. Save one on the machine
+used for the comparison, from the reference commit and with a fixed number of threads,
+then run the changed tree against it with the same options:
+
+.. code-block:: bash
+
+    git checkout <reference commit>
+    python benchmarks/hot_paths.py --threads 4 --save-baseline baseline.json
+    git checkout -
+    python benchmarks/hot_paths.py --threads 4 --baseline baseline.json --max-regression 10
+    python benchmarks/hot_paths.py -k fpn yuv --sizes small  # subset of the cases
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from tabulate import tabulate
+
+from compressai_vision.codecs.encdec_utils.rawvideo import (
+    RawVideoSequence,
+    VideoFormat,
+)
+from compressai_vision.codecs.std_codecs import HeaderReader, HeaderWriter
+from compressai_vision.codecs.utils import (
+    MIN_MAX_DATASET,
+    FpnUtils,
+    min_max_normalization,
+)
+from compressai_vision.evaluators.tf_evaluation_utils import (
+    metrics,
+    np_box_ops,
+    np_mask_ops,
+)
+from compressai_vision.model_wrappers.intconv2d import IntConv2d
+from compressai_vision.pipelines.base import BasePipeline
+from compressai_vision.utils.dataio import PixelFormat, readwriteYUV
+
+DATACATALOG = "SFUHW"
+
+# input image sizes (height, width) of the feature pyramid based cases
+IMAGE_SIZES = {
+    "small": (384, 640),
+    "medium": (800, 1216),
+    "large": (1088, 1920),
+}
+
+CASES = {}
+
+
+def case(name, sizes, unit):
+    """registers a benchmark case
+
+    The decorated function gets one of `sizes` and a working directory, and returns
+    the callable to be timed and the amount of work it does, in `unit`.
+    """
+
+    def decorator(setup):
+        CASES[name] = {"setup": setup, "sizes": sizes, "unit": unit}
+        return setup
+
+    return decorator
+
+
+def _feature_pyramid(size, device, num_channels=256):
+    """R50/X101-FPN like features: p2 to p5, at strides 4 to 32"""
+    h, w = IMAGE_SIZES[size]
+    minv, maxv = MIN_MAX_DATASET[DATACATALOG]
+    return {
+        f"p{level}": (
+            torch.rand(1, num_channels, h >> level, w >> level, device=device)
+            * (maxv - minv)
+            + minv
+        )
+        for level in range(2, 6)
+    }
+
+
+def _packed_frames(size, device, bitdepth=10):
+    fpn = FpnUtils()
+    frames = fpn.reshape_feature_pyramid_to_frame(
+        _feature_pyramid(size, device), packing_all_in_one=True
+    )
+    frames, mid_level = min_max_normalization(
+        frames, *MIN_MAX_DATASET[DATACATALOG], bitdepth=bitdepth
+    )
+    return frames, mid_level
+
+
+def _nbytes(x):
+    if isinstance(x, dict):
+        return sum(_nbytes(v) for v in x.values())
+    return x.numel() * x.element_size()
+
+
+@case("fpn_pack", sizes=list(IMAGE_SIZES), unit="MB")
+def fpn_pack(size, workdir, device):
+    features = _feature_pyramid(size, device)
+    fpn = FpnUtils()
+
+    def run():
+        fpn.reshape_feature_pyramid_to_frame(features, packing_all_in_one=True)
+
+    return run, _nbytes(features) / 1e6
+
+
+@case("fpn_unpack", sizes=list(IMAGE_SIZES), unit="MB")
+def fpn_unpack(size, workdir, device):
+    features = _feature_pyramid(size, device)
+    fpn = FpnUtils()
+    frames = fpn.reshape_feature_pyramid_to_frame(features, packing_all_in_one=True)
+
+    # same ordering as the packing, i.e., largest tensor first
+    keys = sorted(features, key=lambda k: features[k].numel(), reverse=True)
+    tensor_shape = {k: list(features[k].shape) for k in keys}
+    subframe_heights = dict(zip(keys, fpn.subframe_heights))
+
+    def run():
+        fpn.reshape_frame_to_feature_pyramid(
+            frames, tensor_shape, subframe_heights, packing_all_in_one=True
+        )
+
+    return run, _nbytes(features) / 1e6
+
+
+@case("min_max_normalization", sizes=list(IMAGE_SIZES), unit="MB")
+def min_max_norm(size, workdir, device):
+    frames = FpnUtils().reshape_feature_pyramid_to_frame(
+        _feature_pyramid(size, device), packing_all_in_one=True
+    )
+    minv, maxv = MIN_MAX_DATASET[DATACATALOG]
+
+    def run():
+        min_max_normalization(frames, minv, maxv, bitdepth=10)
+
+    return run, _nbytes(frames) / 1e6
+
+
+@case("yuv_write", sizes=list(IMAGE_SIZES), unit="frames")
+def yuv_write(size, workdir, device):
+    frames, mid_level = _packed_frames(size, device)
+    frames = frames.repeat(4, 1, 1)
+    nb_frames, height, width = frames.size()
+    yuvio = readwriteYUV(device="cpu", format=PixelFormat.YUV400_10le)
+    path = str(workdir / f"write_{size}.yuv")
+
+    def run():
+        yuvio.setWriter(write_path=path, frmWidth=width, frmHeight=height)
+        for frame in frames:
+            yuvio.write_one_frame(frame, mid_level=mid_level)
+        yuvio.writer = None
+
+    return run, nb_frames
+
+
+@case("yuv_read", sizes=list(IMAGE_SIZES), unit="frames")
+def yuv_read(size, workdir, device):
+    frames, mid_level = _packed_frames(size, device)
+    frames = frames.repeat(4, 1, 1)
+    nb_frames, height, width = frames.size()
+    yuvio = readwriteYUV(device="cpu", format=PixelFormat.YUV400_10le)
+    path = str(workdir / f"read_{size}.yuv")
+
+    yuvio.setWriter(write_path=path, frmWidth=width, frmHeight=height)
+    for frame in frames:
+        yuvio.write_one_frame(frame, mid_level=mid_level)
+    yuvio.writer = None
+
+    def run():
+        yuvio.setReader(read_path=path, frmWidth=width, frmHeight=height)
+        torch.stack([yuvio.read_one_frame(i) for i in range(nb_frames)])
+
+    return run, nb_frames
+
+
+@case("rawvideo_access", sizes=["416x240", "1920x1080", "3840x2160"], unit="frames")
+def rawvideo_access(size, workdir, device):
+    width, height = map(int, size.split("x"))
+    nb_frames = 16
+    path = workdir / f"rawvideo_{size}_8bit_420.yuv"
+    if not path.is_file():
+        frame_size = width * height * 3 // 2
+        rng = np.random.default_rng(0)
+        rng.integers(0, 256, nb_frames * frame_size, dtype=np.uint8).tofile(path)
+
+    def run():
+        seq = RawVideoSequence.from_file(
+            str(path),
+            width=width,
+            height=height,
+            bitdepth=8,
+            format=VideoFormat.YUV420,
+            framerate=30,
+        )
+        for i in range(nb_frames):
+            frame = seq[i]
+            np.array(frame["y"]), np.array(frame["u"]), np.array(frame["v"])
+        seq.close()
+
+    return run, nb_frames
+
+
+for n_bits in (8, 16):
+
+    @case(f"feature_dump_{n_bits}bit", sizes=list(IMAGE_SIZES), unit="MB")
+    def feature_dump(size, workdir, device, n_bits=n_bits):
+        features = {"data": _feature_pyramid(size, device), "input_size": [(0, 0)]}
+
+        def run():
+            BasePipeline._prep_features_to_dump(features, n_bits, DATACATALOG)
+
+        return run, _nbytes(features["data"]) / 1e6
+
+    @case(f"feature_load_{n_bits}bit", sizes=list(IMAGE_SIZES), unit="MB")
+    def feature_load(size, workdir, device, n_bits=n_bits):
+        features = {"data": _feature_pyramid(size, device), "input_size": [(0, 0)]}
+        nbytes = _nbytes(features["data"]) / 1e6
+        dumped = BasePipeline._prep_features_to_dump(features, n_bits, DATACATALOG)
+
+        def run():
+            # the loaded features are updated in place
+            BasePipeline._post_process_loaded_features(
+                dumped.copy(), n_bits, DATACATALOG
+            )
+
+        return run, nbytes
+
+
+@case("header_roundtrip", sizes=[1, 64, 1024], unit="frames")
+def header_roundtrip(size, workdir, device):
+    sequence_info = {"bitdepth": 10, "frame_size": (4600, 4864), "num_frames": size}
+    frame_info = {"minv": -17.8848, "maxv": 16.69418}
+
+    def run():
+        fd = io.BytesIO()
+        writer = HeaderWriter()
+        writer.write_sequence_info(fd, sequence_info)
+        for _ in range(size):
+            writer.write_frame_info(fd, frame_info)
+
+        fd.seek(0)
+        reader = HeaderReader()
+        reader.read_sequence_info(fd)
+        for _ in range(size):
+            reader.read_frame_info(fd)
+
+    return run, size
+
+
+def _random_boxes(rng, n):
+    yx = rng.uniform(0, 1000, size=(n, 2))
+    hw = rng.uniform(1, 200, size=(n, 2))
+    return np.concatenate([yx, yx + hw], axis=1).astype(np.float32)
+
+
+@case("box_iou", sizes=["100x100", "1000x100", "1000x1000"], unit="pairs")
+def box_iou(size, workdir, device):
+    n, m = map(int, size.split("x"))
+    rng = np.random.default_rng(0)
+    boxes1, boxes2 = _random_boxes(rng, n), _random_boxes(rng, m)
+
+    def run():
+        np_box_ops.iou(boxes1, boxes2)
+
+    return run, n * m
+
+
+@case("mask_iou", sizes=["10x10", "50x50", "100x100"], unit="pairs")
+def mask_iou(size, workdir, device):
+    n, m = map(int, size.split("x"))
+    rng = np.random.default_rng(0)
+    masks1 = rng.integers(0, 2, size=(n, 256, 256), dtype=np.uint8)
+    masks2 = rng.integers(0, 2, size=(m, 256, 256), dtype=np.uint8)
+
+    def run():
+        np_mask_ops.iou(masks1, masks2)
+
+    return run, n * m
+
+
+@case("precision_recall", sizes=[1_000, 100_000, 1_000_000], unit="detections")
+def precision_recall(size, workdir, device):
+    rng = np.random.default_rng(0)
+    scores = rng.uniform(size=size).astype(np.float32)
+    labels = rng.uniform(size=size) > 0.5
+
+    def run():
+        metrics.compute_precision_recall(scores, labels, int(labels.sum()) + 1)
+
+    return run, size
+
+
+@case("int_conv2d", sizes=list(IMAGE_SIZES), unit="GMAC")
+def int_conv2d(size, workdir, device):
+    h, w = IMAGE_SIZES[size]
+    torch.manual_seed(0)
+    conv = IntConv2d(256, 256, kernel_size=3, padding=1).to(device)
+    with torch.no_grad():
+        conv.quantize_weights()
+
+    # p3 of a FPN
+    x = torch.randn(1, 256, h // 8, w // 8, device=device)
+
+    def run():
+        with torch.no_grad():
+            conv.integer_conv2d(x)
+
+    return run, conv.weight.numel() * (h // 8) * (w // 8) / 1e9
+
+
+class PeakMemory:
+    """peak memory over a code block: sampled RSS and, on GPU, allocated memory"""
+
+    def __init__(self, device, interval=0.001):
+        self.device = device
+        self.interval = interval
+        self.peak = 0
+
+    @staticmethod
+    def _rss():
+        try:
+            with open("/proc/self/statm", "r") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, IndexError, ValueError):
+            return 0
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self._rss_peak = max(self._rss_peak, self._rss())
+
+    def __enter__(self):
+        self._rss_start = self._rss_peak = self._rss()
+        if self.device.startswith("cuda"):
+            torch.cuda.synchronize()
+            torch.cuda.reset_peak_memory_stats()
+            self._device_start = torch.cuda.memory_allocated()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+        self._rss_peak = max(self._rss_peak, self._rss())
+        self.peak = self._rss_peak - self._rss_start
+        if self.device.startswith("cuda"):
+            torch.cuda.synchronize()
+            device_peak = torch.cuda.max_memory_allocated() - self._device_start
+            self.peak = max(self.peak, device_peak)
+
+
+def run_case(name, size, workdir, device, repeat, warmup):
+    spec = CASES[name]
+    run, work = spec["setup"](size, workdir, device)
+
+    for _ in range(warmup):
+        run()
+
+    times = []
+    with PeakMemory(device) as mem:
+        for _ in range(repeat):
+            if device.startswith("cuda"):
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            run()
+            if device.startswith("cuda"):
+                torch.cuda.synchronize()
+            times.append(time.perf_counter() - start)
+
+    median = statistics.median(times)
+    return {
+        "median": median,
+        "min": min(times),
+        "throughput": work / median,
+        "unit": f"{spec['unit']}/s",
+        "peak_mem_mb": mem.peak / 2**20,
+    }
+
+
+def compare(results, baseline, max_regression):
+    """relative change of the median time wrt the baseline, in percent"""
+    regressions = []
+    for key, res in results.items():
+        ref = baseline.get("results", {}).get(key)
+        if ref is None:
+            res["delta_%"] = None
+            continue
+        res["delta_%"] = 100.0 * (res["median"] - ref["median"]) / ref["median"]
+        if max_regression is not None and res["delta_%"] > max_regression:
+            regressions.append(key)
+    return regressions
+
+
+def select(patterns, sizes):
+    for name, spec in CASES.items():
+        if patterns and not any(p in name for p in patterns):
+            continue
+        for size in spec["sizes"]:
+            if sizes and str(size) not in sizes and size in IMAGE_SIZES:
+                continue
+            yield name, size
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "-k", nargs="*", default=[], help="run the cases containing any of these"
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="*",
+        default=[],
+        choices=list(IMAGE_SIZES),
+        help="image sizes of the feature pyramid based cases (default: all)",
+    )
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=None, help="torch threads")
+    parser.add_argument("--baseline", type=str, help="baseline JSON to compare with")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=None,
+        help="exit with an error if a case is slower than the baseline by more than "
+        "this percentage",
+    )
+    parser.add_argument("--save-baseline", type=str, help="save results as baseline")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, spec in CASES.items():
+            print(f"{name:<24s} sizes: {spec['sizes']}")
+        return 0
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="cv_bench_") as workdir:
+        for name, size in select(args.k, args.sizes):
+            key = f"{name}[{size}]"
+            print(f"running {key}", file=sys.stderr)
+            results[key] = run_case(
+                name, size, Path(workdir), args.device, args.repeat, args.warmup
+            )
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+
+    rows = [
+        {
+            "case": key,
+            "median (ms)": res["median"] * 1e3,
+            "min (ms)": res["min"] * 1e3,
+            "throughput": f"{res['throughput']:.2f} {res['unit']}",
+            "peak mem (MB)": res["peak_mem_mb"],
+            **({"delta (%)": res["delta_%"]} if args.baseline else {}),
+        }
+        for key, res in results.items()
+    ]
+    print(tabulate(rows, headers="keys", tablefmt="psql", floatfmt=".2f"))
+
+    if args.save_baseline:
+        meta = {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "numpy": np.__version__,
+            "device": args.device,
+            "threads": torch.get_num_threads(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        }
+        with open(args.save_baseline, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+    if regressions:
+        print(
+            f"regressions over {args.max_regression}%: {', '.join(regressions)}",
+            file=sys.stderr,
+        )
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
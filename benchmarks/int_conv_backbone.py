@@ -0,0 +1,170 @@
+# Copyright (c) 2022-2024 InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Integer convolutions over the full R50-FPN backbone, against the VCM-RS reference.
+
+The backbone of faster_rcnn_R_50_FPN_3x is built with random weights (no checkpoint
+is needed), its convolutions are replaced by integer convolutions and intified, and
+the FPN features are computed with the optimized and the reference implementations.
+The median times are reported and the features must be identical, bit for bit.
+
+Usage:
+
+.. code-block:: bash
+
+    python benchmarks/int_conv_backbone.py --device cuda --sizes 800x1216 1088x1920
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+from contextlib import contextmanager
+
+import torch
+
+from detectron2 import model_zoo
+from detectron2.config import get_cfg
+from detectron2.modeling import build_model
+from tabulate import tabulate
+
+from compressai_vision.model_wrappers.detectron2 import Rcnn_R_50_X_101_FPN
+from compressai_vision.model_wrappers.intconv2d import IntConv2d, IntTransposedConv2d
+
+REFERENCE_METHODS = {
+    IntConv2d: ("integer_conv2d", "integer_conv2d_reference"),
+    IntTransposedConv2d: (
+        "integer_transposeconv2d",
+        "integer_transposeconv2d_reference",
+    ),
+}
+
+
+@contextmanager
+def reference_implementation():
+    """runs the integer convolutions with the VCM-RS reference implementation"""
+    saved = {}
+    for cls, (name, reference) in REFERENCE_METHODS.items():
+        saved[cls] = getattr(cls, name)
+        setattr(cls, name, getattr(cls, reference))
+    try:
+        yield
+    finally:
+        for cls, (name, _) in REFERENCE_METHODS.items():
+            setattr(cls, name, saved[cls])
+
+
+def build_int_backbone(config: str, device: str, integer: bool = True):
+    cfg = get_cfg()
+    cfg.merge_from_file(model_zoo.get_config_file(config))
+    cfg.MODEL.DEVICE = device
+
+    torch.manual_seed(0)
+    model = build_model(cfg)
+    if integer:
+        Rcnn_R_50_X_101_FPN.replace_conv2d_modules(model)
+    model = model.to(device).eval()
+    for param in model.parameters():
+        param.requires_grad = False
+
+    if integer:
+        with torch.no_grad():
+            Rcnn_R_50_X_101_FPN.quantize_weights(model)
+    return model.backbone
+
+
+def time_backbone(backbone, x, repeat, warmup):
+    with torch.no_grad():
+        for _ in range(warmup):
+            out = backbone(x)
+
+        times = []
+        for _ in range(repeat):
+            if x.is_cuda:
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            out = backbone(x)
+            if x.is_cuda:
+                torch.cuda.synchronize()
+            times.append(time.perf_counter() - start)
+
+    return statistics.median(times), out
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--config", default="COCO-Detection/faster_rcnn_R_50_FPN_3x.yaml"
+    )
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--sizes", nargs="*", default=["512x768", "800x1216"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument(
+        "--float", action="store_true", help="also time the float backbone"
+    )
+    args = parser.parse_args(argv)
+
+    backbone = build_int_backbone(args.config, args.device)
+    float_backbone = None
+    if args.float:
+        float_backbone = build_int_backbone(args.config, args.device, integer=False)
+
+    rows = []
+    bit_exact = True
+    for size in args.sizes:
+        h, w = map(int, size.split("x"))
+        torch.manual_seed(0)
+        x = torch.randn(1, 3, h, w, device=args.device) * 50
+
+        optimized, out = time_backbone(backbone, x, args.repeat, args.warmup)
+        with reference_implementation():
+            reference, ref_out = time_backbone(backbone, x, args.repeat, args.warmup)
+
+        exact = all(torch.equal(out[k], ref_out[k]) for k in ref_out)
+        bit_exact = bit_exact and exact
+        row = {
+            "size": size,
+            "reference (ms)": reference * 1e3,
+            "optimized (ms)": optimized * 1e3,
+            "speedup": reference / optimized,
+            "bit exact": exact,
+        }
+        if float_backbone is not None:
+            elapsed, _ = time_backbone(float_backbone, x, args.repeat, args.warmup)
+            row["float (ms)"] = elapsed * 1e3
+        rows.append(row)
+
+    print(tabulate(rows, headers="keys", tablefmt="psql", floatfmt=".2f"))
+    return 0 if bit_exact else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,526 @@
+# Copyright (c) 2022-2024 InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""End-to-end benchmark of the split and remote inference pipelines.
+
+The pipelines run as configured by the cfgs/ files, with a registered stub vision model
+emitting FPN-shaped features, a stub codec calling an external stand-in executable
+that copies the YUV files (stub_codec_exec.py, with a configurable delay per frame)
+and a stub evaluator. Neither model weights nor codec binaries are needed, and it runs
+on CPU.
+
+For each pipeline, resolution and sequence length, the frame rate, the time per frame
+of each stage and the peak memory are reported, along with the growth of the peak memory
+with the sequence length.
+
+Usage:
+
+.. code-block:: bash
+
+    python benchmarks/pipeline_e2e.py --pipelines video-split image-split \\
+        --resolutions 640x384 1920x1088 --frames 8 32 --delay 0.005
+    python benchmarks/pipeline_e2e.py --max-growth 2.0  # fails above 2 MB per frame
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from hot_paths import PeakMemory
+from hydra import compose, initialize_config_dir
+from PIL import Image
+from tabulate import tabulate
+from torch.utils.data import DataLoader, Dataset
+
+from compressai_vision.codecs.utils import (
+    MIN_MAX_DATASET,
+    FpnUtils,
+    min_max_inv_normalization,
+    min_max_normalization,
+)
+from compressai_vision.config import (
+    create_codec,
+    create_evaluator,
+    create_pipline,
+    create_vision_model,
+)
+from compressai_vision.evaluators import BaseEvaluator
+from compressai_vision.model_wrappers import BaseWrapper
+from compressai_vision.registry import (
+    register_codec,
+    register_evaluator,
+    register_vision_model,
+)
+from compressai_vision.utils import time_measure, tracer
+from compressai_vision.utils.dataio import PixelFormat, readwriteYUV
+from compressai_vision.utils.external_exec import run_cmdline
+
+thisdir = Path(__file__).parent
+config_path = str(thisdir.joinpath("../cfgs").resolve())
+stub_exec_path = str(thisdir.joinpath("stub_codec_exec.py").resolve())
+
+PIPELINES = {
+    "video-split": "eval_split_inference_example",
+    "image-split": "eval_split_inference_example",
+    "video-remote": "eval_remote_inference_example",
+    "image-remote": "eval_remote_inference_example",
+}
+
+
+@register_vision_model("stub_fpn")
+class StubFpnModel(BaseWrapper):
+    """Emits random features shaped as the FPN outputs (p2 to p5) of a R50/X101-FPN,
+    within the min/max range of the datacatalog, without any weights"""
+
+    def __init__(self, device: str, num_channels=256, datacatalog="SFUHW", **kwargs):
+        super().__init__(device)
+        self.num_channels = num_channels
+        self.min_max = MIN_MAX_DATASET[datacatalog]
+        self.split_layer_list = ["p2", "p3", "p4", "p5"]
+        self.model_info = {"cfg": "stub", "weights": "stub"}
+
+    def input_to_features(self, x, device: str):
+        images = torch.stack([d["image"] for d in x]).to(device)
+        n, _, h, w = images.size()
+        minv, maxv = self.min_max
+
+        data = {}
+        for level, key in enumerate(self.split_layer_list, start=2):
+            shape = (n, self.num_channels, h >> level, w >> level)
+            data[key] = torch.rand(shape, device=device) * (maxv - minv) + minv
+
+        return {"data": data, "input_size": [(h, w)] * n}
+
+    def features_to_output(self, x, device: str):
+        return {k: v.mean().item() for k, v in x["data"].items()}
+
+    def forward(self, x, input_map_function=None):
+        return {"mean": x[0]["image"].float().mean().item()}
+
+
+@register_evaluator("STUB-EVAL")
+class StubEvaluator(BaseEvaluator):
+    def __init__(
+        self,
+        datacatalog_name,
+        dataset_name,
+        dataset,
+        output_dir="./vision_output/",
+        eval_criteria=None,
+        **args,
+    ):
+        super().__init__(
+            datacatalog_name, dataset_name, dataset, output_dir, eval_criteria
+        )
+        self.reset()
+
+    def reset(self):
+        self._num_frames = 0
+
+    def digest(self, gt, pred):
+        self._num_frames += 1
+
+    def results(self, save_path: str = None):
+        out = {"num_frames": self._num_frames}
+        if save_path:
+            self.write_results(out, save_path)
+        return out
+
+
+@register_codec("stub_external")
+class StubExternalCodec(nn.Module):
+    """Goes through the steps of the VTM codec, i.e., packing of the feature pyramid,
+    min-max normalization, YUV I/O and an external encoder/decoder, where the external
+    executable only copies the YUV file, taking a given time per frame"""
+
+    def __init__(
+        self,
+        vision_model: BaseWrapper,
+        dataset,
+        delay_per_frame: float = 0.0,
+        eval_encode: str = "bpp",
+        **kwargs,
+    ):
+        super().__init__()
+        self.delay_per_frame = delay_per_frame
+        self.eval_encode = eval_encode
+        self.min_max_dataset = MIN_MAX_DATASET[dataset.datacatalog]
+        self.yuvio = readwriteYUV(device="cpu", format=PixelFormat.YUV400_10le)
+        self.fpn_utils = FpnUtils()
+
+    @property
+    def qp_value(self):
+        return None
+
+    @property
+    def eval_encode_type(self):
+        return self.eval_encode
+
+    def _run_stub_exec(self, inp, out, frame_bytes):
+        cmd = [sys.executable, stub_exec_path, "-i", inp, "-o", out]
+        cmd += ["--frame-bytes", frame_bytes, "--delay", self.delay_per_frame]
+        start = time_measure()
+        run_cmdline(list(map(str, cmd)), logpath=Path(f"{out}.log"))
+        return time_measure() - start
+
+    def encode(
+        self,
+        x,
+        codec_output_dir,
+        bitstream_name,
+        file_prefix: str = "",
+        remote_inference=False,
+    ):
+        if file_prefix == "":
+            file_prefix = f"{codec_output_dir}/{bitstream_name}"
+        else:
+            file_prefix = f"{codec_output_dir}/{bitstream_name}-{file_prefix}"
+
+        start = time_measure()
+        if remote_inference:
+            file_names = x["file_names"][x.get("frame_skip", 0) : x.get("last_frame")]
+            frames = [np.asarray(Image.open(f).convert("RGB")) for f in file_names]
+            frame_height, frame_width, _ = frames[0].shape
+            header = {"remote": True, "file_names": [Path(f).name for f in file_names]}
+            frame_bytes = frame_height * frame_width * 3
+
+            yuv_in_path = f"{file_prefix}_input.rgb"
+            with open(yuv_in_path, "wb") as f:
+                for frame in frames:
+                    f.write(frame.transpose(2, 0, 1).tobytes())
+        else:
+            frames = self.fpn_utils.reshape_feature_pyramid_to_frame(
+                x["data"], packing_all_in_one=True
+            )
+            minv, maxv = self.min_max_dataset
+            frames, mid_level = min_max_normalization(frames, minv, maxv, bitdepth=10)
+            _, frame_height, frame_width = frames.size()
+            header = {
+                "remote": False,
+                "fpn": {k: list(v.size()) for k, v in x["data"].items()},
+                "subframe_heights": dict(
+                    zip(x["data"].keys(), self.fpn_utils.subframe_heights)
+                ),
+                "input_size": x["input_size"],
+                "org_input_size": x["org_input_size"],
+            }
+            frame_bytes = frame_height * frame_width * 2
+
+            yuv_in_path = f"{file_prefix}_input.yuv"
+            self.yuvio.setWriter(
+                write_path=yuv_in_path, frmWidth=frame_width, frmHeight=frame_height
+            )
+            for frame in frames:
+                self.yuvio.write_one_frame(frame, mid_level=mid_level)
+            self.yuvio.writer = None
+        conversion_time = time_measure() - start
+
+        header["frame_size"] = (frame_height, frame_width)
+        header["nb_frames"] = len(frames)
+        with open(f"{file_prefix}.json", "w") as f:
+            json.dump(header, f)
+
+        bitstream_path = f"{file_prefix}.bin"
+        enc_time = self._run_stub_exec(yuv_in_path, bitstream_path, frame_bytes)
+        Path(yuv_in_path).unlink()
+
+        nb_frames = header["nb_frames"]
+        avg_bytes_per_frame = Path(bitstream_path).stat().st_size / nb_frames
+        output = {
+            "bytes": [avg_bytes_per_frame] * nb_frames,
+            "bitstream": bitstream_path,
+        }
+        enc_times = {"video": enc_time, "conversion": conversion_time}
+        return output, enc_times, None
+
+    def decode(
+        self,
+        bitstream_path=None,
+        codec_output_dir: str = "",
+        file_prefix: str = "",
+        org_img_size=None,
+        remote_inference=False,
+        vcm_mode=False,
+    ):
+        bitstream_path = Path(bitstream_path)
+        with open(bitstream_path.with_suffix(".json"), "r") as f:
+            header = json.load(f)
+        frame_height, frame_width = header["frame_size"]
+        nb_frames = header["nb_frames"]
+
+        yuv_dec_path = f"{codec_output_dir}/{bitstream_path.stem}_dec.yuv"
+        frame_bytes = frame_height * frame_width * (3 if header["remote"] else 2)
+        dec_time = self._run_stub_exec(bitstream_path, yuv_dec_path, frame_bytes)
+
+        start = time_measure()
+        if header["remote"]:
+            rec_frames = np.fromfile(yuv_dec_path, dtype=np.uint8).reshape(
+                nb_frames, 3, frame_height, frame_width
+            )
+            png_dir = Path(f"{codec_output_dir}/{bitstream_path.stem}_rec")
+            png_dir.mkdir(parents=True, exist_ok=True)
+            file_names = []
+            for name, frame in zip(header["file_names"], rec_frames):
+                file_names.append(str(png_dir / name))
+                Image.fromarray(frame.transpose(1, 2, 0)).save(file_names[-1])
+            output = {"file_names": file_names}
+        else:
+            self.yuvio.setReader(
+                read_path=yuv_dec_path, frmWidth=frame_width, frmHeight=frame_height
+            )
+            rec_frames = torch.stack(
+                [self.yuvio.read_one_frame(i) for i in range(nb_frames)]
+            )
+            minv, maxv = self.min_max_dataset
+            rec_frames = min_max_inv_normalization(rec_frames, minv, maxv, bitdepth=10)
+            features = self.fpn_utils.reshape_frame_to_feature_pyramid(
+                rec_frames,
+                header["fpn"],
+                header["subframe_heights"],
+                packing_all_in_one=True,
+            )
+            output = {
+                "data": features,
+                "input_size": [tuple(s) for s in header["input_size"]],
+                "org_input_size": header["org_input_size"],
+            }
+        conversion_time = time_measure() - start
+        Path(yuv_dec_path).unlink()
+
+        dec_times = {"video": dec_time, "conversion": conversion_time}
+        return output, dec_times, None
+
+
+class SyntheticFrames(Dataset):
+    """a sequence of frames of a given resolution, stored as PNG files
+
+    As the mapped inputs of the Detectron2Dataset, samples are lists of one dict.
+    """
+
+    def __init__(self, root: Path, width: int, height: int, nb_frames: int):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.width, self.height = width, height
+        self.collate_fn = lambda batch: batch
+
+        rng = np.random.default_rng(0)
+        base = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+        self.file_names = []
+        for i in range(nb_frames):
+            file_name = self.root / f"frame_{i:05d}.png"
+            if not file_name.is_file():
+                Image.fromarray(np.roll(base, i, axis=1)).save(file_name)
+            self.file_names.append(str(file_name))
+
+        self._image = torch.from_numpy(base).permute(2, 0, 1).float()
+
+    def get_org_mapper_func(self):
+        def mapper(d):
+            image = np.asarray(Image.open(d["file_name"]).convert("RGB"))
+            return [{"image": torch.from_numpy(image.transpose(2, 0, 1).copy())}]
+
+        return mapper
+
+    def __getitem__(self, idx):
+        return {
+            "image": self._image,
+            "image_id": idx,
+            "height": self.height,
+            "width": self.width,
+            "file_name": self.file_names[idx],
+        }
+
+    def __len__(self):
+        return len(self.file_names)
+
+
+def compose_conf(pipeline: str, workdir: Path, args):
+    kind, name = pipeline.split("-")
+    overrides = [
+        f"pipeline.type={kind}",
+        f"paths._common_root={workdir}",
+        "misc.device.nn_parts=cpu",
+        "vision_model.arch=stub_fpn",
+        f"+vision_model.stub_fpn.num_channels={args.num_channels}",
+        "codec.type=stub_external",
+        f"+codec.delay_per_frame={args.delay}",
+        "codec.eval_encode=bpp",
+        "evaluator.type=STUB-EVAL",
+        "dataset.datacatalog=SFUHW",
+        "dataset.config.dataset_name=synthetic",
+        "pipeline.evaluation.dump=False",
+    ]
+    if name == "split":
+        overrides += [
+            f"pipeline.nn_task_part1.batch_size={args.batch_size}",
+            f"pipeline.nn_task_part1.prefetch_depth={args.prefetch_depth}",
+        ]
+
+    with initialize_config_dir(config_dir=config_path, version_base=None):
+        return compose(config_name=PIPELINES[pipeline], overrides=overrides)
+
+
+def run_case(pipeline: str, resolution: str, nb_frames: int, workdir: Path, args):
+    width, height = map(int, resolution.split("x"))
+    case_dir = workdir / f"{pipeline}_{resolution}_{nb_frames}"
+    conf = compose_conf(pipeline, case_dir, args)
+
+    frames_dir = workdir / f"frames_{resolution}"
+    dataset = SyntheticFrames(frames_dir, width, height, nb_frames)
+    dataloader = DataLoader(dataset, batch_size=1, collate_fn=dataset.collate_fn)
+
+    vision_model = create_vision_model(conf.misc.device.nn_parts, conf.vision_model)
+    codec = create_codec(conf.codec, vision_model, conf.dataset)
+    evaluator = create_evaluator(
+        conf.evaluator, conf.dataset.datacatalog, "synthetic", dataset
+    )
+    pipe = create_pipline(conf.pipeline, conf.misc.device)
+
+    tracer.enable(args.trace_dir is not None)
+    with PeakMemory("cpu") as mem:
+        start = time.perf_counter()
+        timing, *_ = pipe(vision_model, codec, dataloader, evaluator)
+        elapsed = time.perf_counter() - start
+
+    if args.trace_dir:
+        tracer.export(args.trace_dir, name=case_dir.name)
+    tracer.enable(False)
+    shutil.rmtree(case_dir, ignore_errors=True)
+
+    stages = {
+        f"{k} (ms/frame)": 1e3 * v / nb_frames
+        for k, v in timing.items()
+        if k in ("nn_part_1", "encode", "decode", "nn_part_2", "nn_task")
+    }
+    return {
+        "pipeline": pipeline,
+        "resolution": resolution,
+        "frames": nb_frames,
+        "fps": nb_frames / elapsed,
+        **stages,
+        "peak_mem_mb": mem.peak / 2**20,
+    }
+
+
+def memory_growth(results):
+    """peak memory growth per frame, between the shortest and the longest sequences"""
+    growth = {}
+    for res in results:
+        key = (res["pipeline"], res["resolution"])
+        growth.setdefault(key, []).append((res["frames"], res["peak_mem_mb"]))
+
+    out = {}
+    for key, points in growth.items():
+        (n0, m0), (n1, m1) = min(points), max(points)
+        if n1 > n0:
+            out[key] = (m1 - m0) / (n1 - n0)
+    return out
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--pipelines", nargs="*", default=list(PIPELINES), choices=list(PIPELINES)
+    )
+    parser.add_argument(
+        "--resolutions", nargs="*", default=["640x384", "1920x1088"], help="WxH"
+    )
+    parser.add_argument("--frames", nargs="*", type=int, default=[8, 32])
+    parser.add_argument(
+        "--delay", type=float, default=0.0, help="stub codec seconds per frame"
+    )
+    parser.add_argument("--num-channels", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=1, help="NN part 1")
+    parser.add_argument("--prefetch-depth", type=int, default=0, help="NN part 1")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads")
+    parser.add_argument("--trace-dir", type=str, default=None)
+    parser.add_argument("--json", type=str, default=None, help="save the results")
+    parser.add_argument(
+        "--max-growth",
+        type=float,
+        default=None,
+        help="exit with an error if the peak memory grows by more than this many MB "
+        "per frame of sequence length",
+    )
+    args = parser.parse_args(argv)
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="cv_e2e_") as workdir:
+        for pipeline in args.pipelines:
+            for resolution in args.resolutions:
+                for nb_frames in sorted(args.frames):
+                    print(f"running {pipeline} {resolution} x{nb_frames}")
+                    results.append(
+                        run_case(pipeline, resolution, nb_frames, Path(workdir), args)
+                    )
+
+    print(tabulate(results, headers="keys", tablefmt="psql", floatfmt=".2f"))
+
+    growth = memory_growth(results)
+    rows = [[*key, value] for key, value in growth.items()]
+    print(
+        tabulate(
+            rows,
+            headers=["pipeline", "resolution", "MB/frame"],
+            tablefmt="psql",
+            floatfmt=".3f",
+        )
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            growth_list = [
+                {"pipeline": pipeline, "resolution": resolution, "mb_per_frame": v}
+                for (pipeline, resolution), v in growth.items()
+            ]
+            json.dump({"results": results, "growth": growth_list}, f, indent=2)
+
+    if args.max_growth is not None:
+        over = [key for key, value in growth.items() if value > args.max_growth]
+        if over:
+            print(f"peak memory grows over {args.max_growth} MB/frame: {over}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
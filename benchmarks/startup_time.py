@@ -0,0 +1,130 @@
+# Copyright (c) 2022-2024 InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Measures the start-up (import) time of compressai-vision entry points.
+
+Each case runs in a fresh interpreter, several times, and the median wall time is reported.
+The registry lookup cases show what a run pays for one model, codec or evaluator only.
+
+Usage:
+
+.. code-block:: bash
+
+    python benchmarks/startup_time.py --repeat 5
+    python benchmarks/startup_time.py --importtime  # top modules by cumulative import time
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+CASES = {
+    "import compressai_vision": "import compressai_vision",
+    "import registry": "import compressai_vision.registry",
+    "import config": "import compressai_vision.config",
+    "import eval_split_inference": "import compressai_vision.run.eval_split_inference",
+    "lookup codec vtm": "from compressai_vision.registry import CODECS; CODECS['vtm']",
+    "lookup model faster_rcnn_X_101_32x8d_FPN_3x": (
+        "from compressai_vision.registry import VISIONMODELS;"
+        "VISIONMODELS['faster_rcnn_X_101_32x8d_FPN_3x']"
+    ),
+    "lookup evaluator OIC-EVAL": (
+        "from compressai_vision.registry import EVALUATORS; EVALUATORS['OIC-EVAL']"
+    ),
+    "lookup pipeline image-split-inference": (
+        "from compressai_vision.registry import PIPELINES;"
+        "PIPELINES['image-split-inference']"
+    ),
+}
+
+
+def time_case(code: str, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True
+        )
+        elapsed = time.perf_counter() - start
+        if proc.returncode != 0:
+            return None, (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+        times.append(elapsed)
+    return statistics.median(times), None
+
+
+def top_imports(code: str, n: int):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True
+    )
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = [p.strip() for p in line[len("import time:") :].split("|")]
+        # only top level packages, nested ones are accounted in their parents
+        if "." not in name:
+            entries.append((int(cumulative), name))
+    return sorted(entries, reverse=True)[:n]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--importtime",
+        action="store_true",
+        help="list the top level packages taking the most import time per case",
+    )
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", type=str, default=None, help="save results to")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, code in CASES.items():
+        elapsed, error = time_case(code, args.repeat)
+        results[name] = elapsed
+        if error is not None:
+            print(f"{name:<55} failed: {error}")
+            continue
+        print(f"{name:<55} {elapsed:8.3f} s")
+
+        if args.importtime:
+            for cumulative, module in top_imports(code, args.top):
+                print(f"    {module:<51} {cumulative / 1e6:8.3f} s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,17 +27,7 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
 # ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from . import (
-    codecs,
-    config,
-    datasets,
-    evaluators,
-    model_wrappers,
-    pipelines,
-    registry,
-    run,
-    utils,
-)
+import importlib
 
 __all__ = [
     "codecs",
@@ -50,3 +40,10 @@ __all__ = [
     "run",
     "utils",
 ]
+
+
+def __getattr__(name):
+    # subpackages pull in heavy third party libraries, they are imported on first access only
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
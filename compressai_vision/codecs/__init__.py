@@ -27,21 +27,28 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
 # ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import importlib
+import importlib.util
 
-from .base import Bypass
-from .ffmpeg import x264, x265
-from .sic_sfu2022 import SIC_SFU2022
-from .std_codecs import HM, VTM, VVENC
+_LAZY_ATTRS = {
+    "Bypass": ".base",
+    "HM": ".std_codecs",
+    "VTM": ".std_codecs",
+    "x264": ".ffmpeg",
+    "x265": ".ffmpeg",
+    "VVENC": ".std_codecs",
+    "SIC_SFU2022": ".sic_sfu2022",
+}
 
 __all__ = ["Bypass", "HM", "VTM", "x264", "x265", "VVENC", "SIC_SFU2022"]
 
-try:
-    from .fctm import FCTM
-except ImportError as e:
-    if e.name == f"{__package__}.fctm":
-        # Could not import "FCTM".
-        pass
-    else:
-        raise e
-else:
+if importlib.util.find_spec(f"{__name__}.fctm") is not None:
+    _LAZY_ATTRS["FCTM"] = ".fctm"
     __all__.append("FCTM")
+
+
+def __getattr__(name):
+    # submodules are imported on first access only, see compressai_vision.registry
+    if name in _LAZY_ATTRS:
+        return getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
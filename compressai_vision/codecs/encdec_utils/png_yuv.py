@@ -27,17 +27,139 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
 # ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import fcntl
+import hashlib
 import logging
 import math
+import os
 import shutil
 
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 from compressai_vision.utils.external_exec import run_cmdline
 
 from .rawvideo import get_raw_video_file_info
 
+# bump when the conversion command changes in a way that alters the output samples
+CONVERTED_INPUT_FORMAT_VERSION = 2
+
+BYTES_PER_LUMA_SAMPLE = {"gray": 1, "yuv420p": 1.5, "yuv422p": 2, "yuv444p": 3}
+
+
+def expected_yuv_file_size(
+    frame_width: int, frame_height: int, pix_fmt: str, bitdepth: int, nb_frames: int
+) -> int:
+    bytes_per_sample = (bitdepth + 7) >> 3
+    return int(
+        frame_width
+        * frame_height
+        * BYTES_PER_LUMA_SAMPLE[pix_fmt]
+        * bytes_per_sample
+        * nb_frames
+    )
+
+
+def link_or_copy(src: Union[Path, str], dst: Union[Path, str]) -> Path:
+    """Makes ``dst`` point to the content of ``src`` without duplicating it when possible.
+
+    A hard link is tried first, then a symbolic link (e.g., across file systems).
+    The file is only copied as a last resort. Removing ``dst`` afterwards never affects ``src``.
+    """
+    src, dst = Path(src), Path(dst)
+    if dst.is_symlink() or dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        try:
+            os.symlink(src.resolve(), dst)
+        except OSError:
+            shutil.copy(src, dst)
+    return dst
+
+
+class ConvertedInputStore:
+    """Shared store of source images/videos converted to YUV.
+
+    Each entry is keyed by the source files (path, size and modification time),
+    the frame range, the pixel format, the bitdepth, the padded frame size and the
+    options of the conversion command, so that a sequence is converted only once and
+    reused by all the jobs pointing to the same store, e.g., all QPs of a sweep.
+    Creation is serialized with a lock file so that concurrent jobs starting at the
+    same time do not convert the same input twice.
+
+    Entries are never evicted: the store is opt-in (codec.converted_input_dir) and
+    is to be cleaned up by the user once the sweep is over.
+    """
+
+    def __init__(self, root: Union[Path, str], logger: logging.Logger):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.logger = logger
+
+    @staticmethod
+    def make_key(
+        source_files: List[Union[Path, str]],
+        pix_fmt: str,
+        bitdepth: int,
+        frame_width: int,
+        frame_height: int,
+        frame_range: Tuple[int, int] = (0, 0),
+        convert_args: List[str] = (),
+    ) -> str:
+        h = hashlib.sha1()
+        h.update(
+            f"v{CONVERTED_INPUT_FORMAT_VERSION}_{pix_fmt}_{bitdepth}bit_"
+            f"{frame_width}x{frame_height}_{len(source_files)}_"
+            f"{frame_range[0]}-{frame_range[1]}_{' '.join(convert_args)}".encode()
+        )
+        for file_path in source_files:
+            st = os.stat(file_path)
+            h.update(
+                f"{Path(file_path).resolve()}:{st.st_size}:{st.st_mtime_ns}".encode()
+            )
+        return h.hexdigest()[:20]
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}.yuv"
+
+    def get_or_create(
+        self, key: str, expected_size: int, create: Callable[[Path], None]
+    ) -> Path:
+        """Returns the path of the converted input, running ``create`` only if it is not in the store yet."""
+        path = self.path(key)
+        if self._is_complete(path, expected_size):
+            return path
+
+        with open(self.root / f"{key}.lock", "w") as lock_fd:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                # another job may have completed the conversion while waiting for the lock
+                if self._is_complete(path, expected_size):
+                    return path
+
+                tmp_path = self.root / f"{key}.{os.getpid()}.tmp"
+                try:
+                    create(tmp_path)
+                    size = tmp_path.stat().st_size
+                    assert (
+                        size == expected_size
+                    ), f"converted input of {size} bytes differs from expected size of {expected_size} bytes"
+                    os.replace(tmp_path, path)
+                finally:
+                    if tmp_path.exists():
+                        tmp_path.unlink()
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+        self.logger.debug(f"converted input stored in {path}")
+        return path
+
+    @staticmethod
+    def _is_complete(path: Path, expected_size: int) -> bool:
+        return path.is_file() and path.stat().st_size == expected_size
+
 
 class PngFilesToYuvFileConverter:
     def __init__(
@@ -47,12 +169,18 @@ class PngFilesToYuvFileConverter:
         frame_rate,
         ffmpeg_loglevel: str,
         logger: logging.Logger,
+        converted_input_dir: Optional[str] = None,
     ):
         self.chroma_format = chroma_format
         self.input_bitdepth = input_bitdepth
         self.frame_rate = frame_rate
         self.ffmpeg_loglevel = ffmpeg_loglevel
         self.logger = logger
+        self.store = (
+            ConvertedInputStore(converted_input_dir, logger)
+            if converted_input_dir
+            else None
+        )
 
     def __call__(self, input: Dict, file_prefix: str):
         """Converts the input image or video to YUV format using ffmpeg.
@@ -67,7 +195,7 @@ class PngFilesToYuvFileConverter:
 
         Returns:
             Tuple[str, int, int, int, str]: A tuple containing the following:
-                - yuv_in_path (str): The path to the converted YUV input file.
+                - yuv_in_path (str): The path to the converted YUV input file. When a pre-existing YUV or a converted input store is used, this is a link to the shared file.
                 - nb_frames (int): The number of frames in the input.
                 - frame_width (int): The width of the frames in the input.
                 - frame_height (int): The height of the frames in the input.
@@ -84,7 +212,8 @@ class PngFilesToYuvFileConverter:
             parent = Path(file_names[0]).parent
             ext = next((e for e in ["*.png", "*.jpg"] if list(parent.glob(e))), None)
             filename_pattern = f"{parent}/{ext}"
-            images_in_folder = len(list(parent.glob(ext)))
+            source_files = sorted(parent.glob(ext))
+            images_in_folder = len(source_files)
             nb_frames = input["last_frame"] - input["frame_skip"]
 
             assert (
@@ -106,6 +235,7 @@ class PngFilesToYuvFileConverter:
         else:
             nb_frames = 1
             input_info = ["-i", file_names[0]]
+            source_files = [file_names[0]]
             yuv_file = None
 
         chroma_format = self.chroma_format
@@ -119,37 +249,24 @@ class PngFilesToYuvFileConverter:
         pix_fmt_suffix = "10le" if input_bitdepth == 10 else ""
         chroma_format = "gray" if chroma_format == "400" else f"yuv{chroma_format}p"
 
+        expected_size = expected_yuv_file_size(
+            frame_width, frame_height, chroma_format, input_bitdepth, nb_frames
+        )
+
         # Use existing YUV (if found):
         if yuv_file is not None:
             size = yuv_file.stat().st_size
-            bytes_per_luma_sample = {"yuv420p": 1.5}[chroma_format]
-            bytes_per_sample = (input_bitdepth + 7) >> 3
-            expected_size = int(
-                frame_width
-                * frame_height
-                * bytes_per_luma_sample
-                * bytes_per_sample
-                * nb_frames
-            )
             assert (
                 size == expected_size
             ), f"YUV found for input but expected size of {expected_size} bytes differs from actual size of {size} bytes"
-            shutil.copy(yuv_file, yuv_in_path)
+            link_or_copy(yuv_file, yuv_in_path)
             print(f"Using pre-existing YUV file: {yuv_file}")
             return (yuv_in_path, nb_frames, frame_width, frame_height, file_prefix)
 
         # TODO (fracape)
         # we don't enable skipping frames (codec.skip_n_frames) nor use n_frames_to_be_encoded in video mode
 
-        convert_cmd = [
-            "ffmpeg",
-            "-y",
-            "-hide_banner",
-            "-loglevel",
-            f"{self.ffmpeg_loglevel}",
-        ]
-        convert_cmd += input_info
-        convert_cmd += [
+        convert_args = [
             "-vf",
             "pad=ceil(iw/2)*2:ceil(ih/2)*2",
             "-f",
@@ -160,10 +277,38 @@ class PngFilesToYuvFileConverter:
             "1",  #  (fracape) convert to full range for now
         ]
 
-        convert_cmd.append(yuv_in_path)
-        self.logger.debug(convert_cmd)
-
-        run_cmdline(convert_cmd)
+        def convert(output_path):
+            convert_cmd = [
+                "ffmpeg",
+                "-y",
+                "-hide_banner",
+                "-loglevel",
+                f"{self.ffmpeg_loglevel}",
+            ]
+            convert_cmd += input_info
+            convert_cmd += convert_args
+            convert_cmd.append(str(output_path))
+            self.logger.debug(convert_cmd)
+
+            run_cmdline(convert_cmd)
+
+        if self.store is None:
+            convert(yuv_in_path)
+            return yuv_in_path, nb_frames, frame_width, frame_height, file_prefix
+
+        # Convert once into the shared store and reuse the converted input in place
+        key = self.store.make_key(
+            source_files,
+            chroma_format,
+            input_bitdepth,
+            frame_width,
+            frame_height,
+            frame_range=(input.get("frame_skip", 0), input.get("last_frame", 1)),
+            convert_args=convert_args,
+        )
+        stored_yuv = self.store.get_or_create(key, expected_size, convert)
+        link_or_copy(stored_yuv, yuv_in_path)
+        print(f"Using converted input from store: {stored_yuv}")
 
         return yuv_in_path, nb_frames, frame_width, frame_height, file_prefix
 
@@ -30,10 +30,11 @@
 import configparser
 import json
 import logging
+import shutil
 import time
 
 from pathlib import Path
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Tuple, Union
 
 import torch
 import torch.nn as nn
@@ -41,11 +42,12 @@ import torch.nn as nn
 from compressai_vision.codecs.utils import FpnUtils
 from compressai_vision.model_wrappers import BaseWrapper
 from compressai_vision.registry import register_codec
-from compressai_vision.utils import time_measure
+from compressai_vision.utils import thread_budget, time_measure, tracer
 from compressai_vision.utils.dataio import PixelFormat, readwriteYUV
 from compressai_vision.utils.external_exec import run_cmdline
 
 from .encdec_utils import get_raw_video_file_info
+from .rate_control import RateSearch
 from .utils import MIN_MAX_DATASET, min_max_inv_normalization, min_max_normalization
 
 
@@ -66,6 +68,8 @@ class x264(nn.Module):
         super().__init__()
 
         self.qp = kwargs["encoder_config"]["qp"]
+        # QP picked by the rate search for the last encode, if any
+        self.searched_qp = None
 
         self.eval_encode = kwargs["eval_encode"]
 
@@ -104,12 +108,17 @@ class x264(nn.Module):
 
         self.logger.setLevel(logging_level)
 
+        # QP search for a target rate, None to encode with the configured QP
+        self.rate_search = RateSearch.from_config(
+            kwargs.get("rate_search"), self.logger
+        )
+
         self.fpn_utils = FpnUtils()
 
     # can be added to base class (if inherited) | Should we inherit from the base codec?
     @property
     def qp_value(self):
-        return self.qp
+        return self.qp if self.searched_qp is None else self.searched_qp
 
     # can be added to base class (if inherited) | Should we inherit from the base codec?
     @property
@@ -159,11 +168,59 @@ class x264(nn.Module):
             "-pix_fmt",
             "yuv444p10le",  # to be checked
             "-threads",
-            "4",
+            f"{thread_budget.codec_threads()}",
             f"{bitstream_path}",
         ]
         return cmd
 
+    def search_qp(
+        self,
+        x: Dict,
+        yuv_in_path: Path,
+        nb_frames: int,
+        width: int,
+        height: int,
+        frmRate: int,
+        work_dir: Path,
+    ) -> Tuple[int, Union[Path, None]]:
+        """
+        Searches the QP (crf) hitting the target rate with trial encodes of a frame subset.
+        Args:
+            x (Dict): The input data, for the size of the original frames.
+            yuv_in_path (Path): The input YUV video file path.
+            nb_frames (int): The number of frames in the input YUV file.
+            width (int): The width of the video frame.
+            height (int): The height of the video frame.
+            frmRate (int): The frame rate of the video.
+            work_dir (Path): The directory of the trials without cache_dir.
+        Returns:
+            Tuple[int, Union[Path, None]]: the QP and, when the trials encoded all the frames, the trial bitstream at this QP.
+        """
+
+        def make_cmd(inp_yuv_path, qp, bitstream_path, nb_frames):
+            # ffmpeg encodes all the frames of the (subset) input
+            return self.get_encode_cmd(
+                inp_yuv_path,
+                width=width,
+                height=height,
+                qp=qp,
+                bitstream_path=bitstream_path,
+                frmRate=frmRate,
+            )
+
+        org_size = x.get("org_input_size")
+        return self.rate_search(
+            yuv_in_path,
+            nb_frames,
+            -1,  # the default GOP of ffmpeg is longer than the sequences
+            make_cmd,
+            first_qp=self.qp,
+            frame_rate=float(frmRate),
+            num_pixels=org_size["height"] * org_size["width"] if org_size else None,
+            suffix=".mp4",
+            work_dir=Path(work_dir) / "rate_search",
+        )
+
     def get_decode_cmd(self, bitstream_path: Path, yuv_dec_path: Path) -> List[Any]:
         """
         Get the ffmpeg decode command (x264 lib) for the given bitstream path and YUV decode path.
@@ -208,9 +265,10 @@ class x264(nn.Module):
 
         start = time.time()
 
-        frames = self.fpn_utils.reshape_feature_pyramid_to_frame(
-            x["data"], packing_all_in_one=True
-        )
+        with tracer.span("pack", cat="codec"):
+            frames = self.fpn_utils.reshape_feature_pyramid_to_frame(
+                x["data"], packing_all_in_one=True
+            )
         minv, maxv = self.min_max_dataset
         frames, mid_level = min_max_normalization(frames, minv, maxv, bitdepth=bitdepth)
 
@@ -241,11 +299,28 @@ class x264(nn.Module):
         for i, frame in enumerate(frames):
             self.yuvio.write_one_frame(frame, mid_level=mid_level, frame_idx=i)
 
+        qp = self.qp
+        trial_bitstream = None
+        if self.rate_search is not None:
+            start = time.time()
+            qp, trial_bitstream = self.search_qp(
+                x,
+                yuv_in_path,
+                nbframes,
+                frame_width,
+                frame_height,
+                frmRate,
+                codec_output_dir,
+            )
+            rate_search_time = time.time() - start
+            self.logger.debug(f"rate_search_time:{rate_search_time}")
+            self.searched_qp = qp
+
         cmd = self.get_encode_cmd(
             yuv_in_path,
             width=frame_width,
             height=frame_height,
-            qp=self.qp,
+            qp=qp,
             bitstream_path=bitstream_path,
             frmRate=frmRate,
         )
@@ -253,7 +328,10 @@ class x264(nn.Module):
         # self.logger.debug(cmd)
 
         start = time.time()
-        run_cmdline(cmd, logpath=logpath)
+        if trial_bitstream is not None:  # the trials encoded all the frames
+            shutil.copyfile(trial_bitstream, bitstream_path)
+        else:
+            run_cmdline(cmd, logpath=logpath)
         enc_time = time.time() - start
         # self.logger.debug(f"enc_time:{enc_time}")
 
@@ -274,6 +352,8 @@ class x264(nn.Module):
             "video": enc_time,
             "conversion": conversion_time,
         }
+        if self.rate_search is not None:
+            enc_times["rate_search"] = rate_search_time
 
         mac_calculations = None  # no NN-related complexity calculation with std codecs
 
@@ -360,12 +440,13 @@ class x264(nn.Module):
                 print(f'Error reading file "{fpn_sizes}"')
                 raise err
 
-        features = self.fpn_utils.reshape_frame_to_feature_pyramid(
-            rec_frames,
-            json_dict["fpn"],
-            json_dict["subframe_heights"],
-            packing_all_in_one=True,
-        )
+        with tracer.span("unpack", cat="codec"):
+            features = self.fpn_utils.reshape_frame_to_feature_pyramid(
+                rec_frames,
+                json_dict["fpn"],
+                json_dict["subframe_heights"],
+                packing_all_in_one=True,
+            )
 
         conversion_time = time_measure() - start
         self.logger.debug(f"conversion_time:{conversion_time}")
@@ -441,7 +522,7 @@ class x265(x264):
             "-pix_fmt",
             "gray10le",
             "-threads",
-            "4",
+            f"{thread_budget.codec_threads()}",
             f"{bitstream_path}",
         ]
         return cmd
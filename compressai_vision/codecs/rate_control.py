@@ -0,0 +1,305 @@
+# Copyright (c) 2022-2024, InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import hashlib
+import logging
+import math
+import os
+import time
+import uuid
+
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from compressai_vision.utils.external_exec import run_cmdline
+
+# rate roughly halves every 6 QPs with H.264/HEVC/VVC, used until two trials are known
+DEFAULT_LOG_RATE_SLOPE = -math.log(2) / 6
+
+
+def subset_segments(
+    nb_frames: int, intra_period: int, num_segments: int, max_frames: int
+) -> List[Tuple[int, int]]:
+    """Selects the frames encoded by the trials, as (offset, count) segments.
+
+    Sequences of at most max_frames frames are used as a whole. Otherwise, with an
+    intra period, the segments are whole intra periods spread evenly over the sequence,
+    at most max_frames in total, so that their concatenation is coded with the same
+    structure as the full sequence (an intra frame at every period boundary). Without
+    intra period, the first max_frames frames are used.
+    """
+    if intra_period < 1 or nb_frames <= max_frames:
+        return [(0, min(nb_frames, max_frames))]
+
+    num_periods = max(1, nb_frames // intra_period)  # complete periods
+    num_segments = min(num_segments, num_periods, max(1, max_frames // intra_period))
+
+    periods = sorted(
+        {int((i + 0.5) * num_periods / num_segments) for i in range(num_segments)}
+    )
+    return [
+        (p * intra_period, min(intra_period, nb_frames - p * intra_period))
+        for p in periods
+    ]
+
+
+class RateSearch:
+    """Searches the QP hitting a target bitrate (kbps) or bpp with trial encodes.
+
+    The trials encode a subset of the frames (see subset_segments) and the rate of the
+    full sequence is extrapolated from the bytes per frame of the subset. Starting from
+    the configured QP, the next trial is predicted with a log-linear rate-QP model,
+    log(rate) = a + b * qp, fitted on the trials bracketing the target, and falls back
+    to bisection when the prediction does not shrink the bracket fast enough. The QP
+    whose rate is the closest to the target (in the log domain) is selected.
+
+    Trial bitstreams are cached in cache_dir, under a key that hashes the subset
+    and the encoder command line, so that runs of the same sequence with the same
+    encoder settings (e.g., other targets of a sweep) reuse the trials already encoded.
+    When the subset is the whole sequence, the trial at the selected QP is returned to
+    the codec to be used as is, instead of encoding the sequence again.
+    """
+
+    def __init__(
+        self,
+        target_bitrate: Optional[float] = None,
+        target_bpp: Optional[float] = None,
+        qp_range: Tuple[int, int] = (0, 63),
+        num_segments: int = 8,
+        max_frames: int = 64,
+        max_trials: int = 10,
+        cache_dir: Union[Path, str] = "",
+        logger: Optional[logging.Logger] = None,
+    ):
+        assert (target_bitrate is None) != (
+            target_bpp is None
+        ), "rate_search requires one of target_bitrate or target_bpp"
+        assert qp_range[0] < qp_range[1], f"invalid qp_range {qp_range}"
+
+        self.target_bitrate = target_bitrate
+        self.target_bpp = target_bpp
+        self.qp_min, self.qp_max = int(qp_range[0]), int(qp_range[1])
+        self.num_segments = num_segments
+        self.max_frames = max_frames
+        self.max_trials = max_trials
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+
+    @classmethod
+    def from_config(
+        cls, conf: Optional[Dict], logger: logging.Logger
+    ) -> Optional["RateSearch"]:
+        """Returns None when no target is configured, i.e., the configured QP is used"""
+        if not conf:
+            return None
+        if conf.get("target_bitrate") is None and conf.get("target_bpp") is None:
+            return None
+        return cls(**conf, logger=logger)
+
+    @property
+    def target(self) -> float:
+        if self.target_bitrate is not None:
+            return self.target_bitrate
+        return self.target_bpp
+
+    def _rate(self, nbytes: float, frame_rate: float, num_pixels: int) -> float:
+        """rate of nbytes per frame, in kbps or in bits per pixel"""
+        if self.target_bitrate is not None:
+            return nbytes * 8 * frame_rate / 1000
+        return nbytes * 8 / num_pixels
+
+    def __call__(
+        self,
+        yuv_in_path: Union[Path, str],
+        nb_frames: int,
+        intra_period: int,
+        make_cmd: Callable[[Path, int, Path, int], List[str]],
+        first_qp: int,
+        frame_rate: float = 1,
+        num_pixels: Optional[int] = None,
+        suffix: str = ".bin",
+        work_dir: Union[Path, str] = "",
+    ) -> Tuple[int, Optional[Path]]:
+        """Searches the QP for the input YUV file.
+
+        Args:
+            yuv_in_path: input YUV file of nb_frames frames, as encoded by the codec.
+            nb_frames: number of frames in yuv_in_path.
+            intra_period: intra period of the encoder, < 1 when only the first frame
+                is intra.
+            make_cmd: returns the encoder command line for
+                (input YUV path, qp, bitstream path, number of frames).
+            first_qp: QP of the first trial, typically the configured one.
+            frame_rate: frame rate used for bitrate targets.
+            num_pixels: number of pixels of an original frame, required for bpp targets.
+            suffix: suffix of the bitstream files, e.g., ".mp4" for ffmpeg.
+            work_dir: directory of the run, for the subset of frames, and of the
+                trials when no cache_dir is configured.
+
+        Returns:
+            Tuple[int, Optional[Path]]: the selected QP and, when the trials encoded the
+            whole sequence, the trial bitstream at this QP.
+        """
+        assert (
+            self.target_bpp is None or num_pixels
+        ), "the size of the original frames is needed for target_bpp"
+
+        start = time.time()
+        segments = subset_segments(
+            nb_frames, intra_period, self.num_segments, self.max_frames
+        )
+        subset_frames = sum(count for _, count in segments)
+        whole_sequence = subset_frames == nb_frames
+
+        cache_dir = self.cache_dir if self.cache_dir is not None else Path(work_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        subset_path = Path(yuv_in_path)
+        if not whole_sequence:
+            # not in cache_dir, which may be shared by the jobs of several nodes
+            Path(work_dir).mkdir(parents=True, exist_ok=True)
+            subset_path = Path(work_dir) / f"subset-{uuid.uuid4().hex}.yuv"
+            frame_size = Path(yuv_in_path).stat().st_size // nb_frames
+            _write_segments(yuv_in_path, subset_path, segments, frame_size)
+
+        try:
+            template = make_cmd("{input}", "{qp}", "{bitstream}", subset_frames)
+            trial_dir = cache_dir / _cache_key(subset_path, template)
+            trial_dir.mkdir(exist_ok=True)
+
+            def encode_trial(qp: int) -> float:
+                bitstream_path = trial_dir / f"qp{qp}{suffix}"
+                cached = bitstream_path.is_file()
+                if not cached:
+                    # written under a temporary name, another job may run the same trial
+                    tmp_path = trial_dir / f"qp{qp}-{uuid.uuid4().hex}{suffix}"
+                    cmd = make_cmd(subset_path, qp, tmp_path, subset_frames)
+                    run_cmdline(cmd, logpath=trial_dir / f"qp{qp}_enc.log")
+                    os.replace(tmp_path, bitstream_path)
+
+                nbytes = bitstream_path.stat().st_size / subset_frames
+                rate = self._rate(nbytes, frame_rate, num_pixels)
+                self.logger.info(
+                    f"rate search: qp {qp} -> {rate:.4f}"
+                    f"{' (cached)' if cached else ''}"
+                )
+                return rate
+
+            qp = self._search(encode_trial, first_qp)
+        finally:
+            if subset_path != Path(yuv_in_path) and subset_path.is_file():
+                subset_path.unlink()
+
+        self.logger.info(
+            f"rate search: qp {qp} selected for target {self.target} from "
+            f"{subset_frames}/{nb_frames} frames in {time.time() - start:.1f}s"
+        )
+
+        reusable = trial_dir / f"qp{qp}{suffix}" if whole_sequence else None
+        return qp, reusable
+
+    def _search(self, encode_trial: Callable[[int], float], first_qp: int) -> int:
+        log_target = math.log(self.target)
+        log_rates = {}
+
+        def clip(qp):
+            return min(max(int(qp), self.qp_min), self.qp_max)
+
+        qp = clip(first_qp)
+        prev_width = None
+        for _ in range(self.max_trials):
+            log_rates[qp] = math.log(max(encode_trial(qp), 1e-12))
+
+            # rate decreases with the QP: lo is above the target, hi below
+            lo = max((q for q, r in log_rates.items() if r >= log_target), default=None)
+            hi = min((q for q, r in log_rates.items() if r < log_target), default=None)
+
+            if lo is not None and hi is not None:
+                if hi - lo <= 1:
+                    break
+                width = hi - lo
+                qp = _predict_qp(log_rates, lo, hi, log_target)
+                if prev_width is not None and width > prev_width / 2:
+                    qp = (lo + hi) // 2
+                qp = min(max(qp, lo + 1), hi - 1)
+                prev_width = width
+            elif lo is None:  # all the trials are below the target
+                low, *others = sorted(log_rates)
+                if low == self.qp_min:
+                    self.logger.warning(f"target {self.target} not reached at qp_min")
+                    break
+                nearest = others[0] if others else low
+                qp = _predict_qp(log_rates, low, nearest, log_target)
+                qp = min(clip(qp), low - 1)
+            else:  # all the trials are above the target
+                high, *others = sorted(log_rates, reverse=True)
+                if high == self.qp_max:
+                    self.logger.warning(f"target {self.target} not reached at qp_max")
+                    break
+                nearest = others[0] if others else high
+                qp = _predict_qp(log_rates, high, nearest, log_target)
+                qp = max(clip(qp), high + 1)
+
+        return min(log_rates, key=lambda q: abs(log_rates[q] - log_target))
+
+
+def _predict_qp(
+    log_rates: Dict[int, float], qp_a: int, qp_b: int, log_target: float
+) -> int:
+    """QP where the rate-QP line through qp_a and qp_b reaches the target.
+
+    With a single point, or when the rate does not decrease between both points, the
+    default slope is used.
+    """
+    slope = DEFAULT_LOG_RATE_SLOPE
+    if qp_a != qp_b:
+        fitted = (log_rates[qp_b] - log_rates[qp_a]) / (qp_b - qp_a)
+        if fitted < 0:
+            slope = fitted
+    return round(qp_a + (log_target - log_rates[qp_a]) / slope)
+
+
+def _write_segments(
+    src_path: Union[Path, str],
+    dst_path: Path,
+    segments: List[Tuple[int, int]],
+    frame_size: int,
+):
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        for offset, count in segments:
+            src.seek(offset * frame_size)
+            dst.write(src.read(count * frame_size))
+
+
+def _cache_key(subset_path: Path, template: List[str]) -> str:
+    h = hashlib.sha1(" ".join(str(x) for x in template).encode())
+    with open(subset_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 24), b""):
+            h.update(chunk)
+    return h.hexdigest()[:20]
@@ -32,6 +32,7 @@ import json
 import logging
 import math
 import os
+import shutil
 import sys
 import time
 
@@ -45,12 +46,13 @@ import torch.nn as nn
 from compressai_vision.codecs.utils import FpnUtils
 from compressai_vision.model_wrappers import BaseWrapper
 from compressai_vision.registry import register_codec
-from compressai_vision.utils import time_measure
+from compressai_vision.utils import thread_budget, time_measure, tracer
 from compressai_vision.utils.dataio import PixelFormat, readwriteYUV
 from compressai_vision.utils.external_exec import run_cmdline, run_cmdlines_parallel
 
 from .encdec_utils import *
 from .encdec_utils.png_yuv import PngFilesToYuvFileConverter, YuvFileToPngFilesConverter
+from .rate_control import RateSearch
 from .utils import MIN_MAX_DATASET, min_max_inv_normalization, min_max_normalization
 
 
@@ -145,6 +147,8 @@ class VTM(nn.Module):
                 )
 
         self.qp = self.enc_cfgs["qp"]
+        # QP picked by the rate search for the last encode, if any
+        self.searched_qp = None
         self.eval_encode = kwargs["eval_encode"]
 
         self.dump = kwargs["dump"]
@@ -182,12 +186,18 @@ class VTM(nn.Module):
 
         self.logger.setLevel(logging_level)
 
+        # QP search for a target rate, None to encode with the configured QP
+        self.rate_search = RateSearch.from_config(
+            kwargs.get("rate_search"), self.logger
+        )
+
         self.convert_input_to_yuv = PngFilesToYuvFileConverter(
             chroma_format=self.enc_cfgs["chroma_format"],
             input_bitdepth=self.enc_cfgs["input_bitdepth"],
             frame_rate=self.frame_rate,
             ffmpeg_loglevel=self.ffmpeg_loglevel,
             logger=self.logger,
+            converted_input_dir=kwargs.get("converted_input_dir", None),
         )
 
         self.convert_yuv_to_pngs = YuvFileToPngFilesConverter(
@@ -209,7 +219,7 @@ class VTM(nn.Module):
     # can be added to base class (if inherited) | Should we inherit from the base codec?
     @property
     def qp_value(self):
-        return self.qp
+        return self.qp if self.searched_qp is None else self.searched_qp
 
     # can be added to base class (if inherited) | Should we inherit from the base codec?
     @property
@@ -354,6 +364,56 @@ class VTM(nn.Module):
 
         return cmds
 
+    def search_qp(
+        self,
+        x: Dict,
+        yuv_in_path: Path,
+        nb_frames: int,
+        width: int,
+        height: int,
+        work_dir: Path,
+    ) -> Tuple[int, Union[Path, None]]:
+        """
+        Searches the QP hitting the target rate with trial encodes of a frame subset.
+        Args:
+            x (Dict): The input data, for the size of the original frames.
+            yuv_in_path (Path): The path to the input YUV file.
+            nb_frames (int): The number of frames in the input YUV file.
+            width (int): The width of the video.
+            height (int): The height of the video.
+            work_dir (Path): The directory of the trials without cache_dir.
+        Returns:
+            Tuple[int, Union[Path, None]]: the QP and, when the trials encoded all the frames, the trial bitstream at this QP.
+        """
+
+        def make_cmd(inp_yuv_path, qp, bitstream_path, nb_frames):
+            cmds = self.get_encode_cmd(
+                inp_yuv_path,
+                width=width,
+                height=height,
+                qp=qp,
+                bitstream_path=bitstream_path,
+                nb_frames=nb_frames,
+                chroma_format=self.enc_cfgs["chroma_format"],
+                input_bitdepth=self.enc_cfgs["input_bitdepth"],
+                output_bitdepth=self.enc_cfgs["output_bitdepth"],
+                parallel_encoding=False,
+                hash_check=self.hash_check,
+            )
+            return cmds[0]
+
+        org_size = x.get("org_input_size")
+        return self.rate_search(
+            yuv_in_path,
+            nb_frames,
+            self.intra_period,
+            make_cmd,
+            first_qp=self.qp,
+            frame_rate=float(self.frame_rate),
+            num_pixels=org_size["height"] * org_size["width"] if org_size else None,
+            work_dir=Path(work_dir) / "rate_search",
+        )
+
     def get_parcat_cmd(
         self,
         bitstream_path: Path,
@@ -437,9 +497,10 @@ class VTM(nn.Module):
             self.logger.debug(f"conversion time:{conversion_time}")
         else:
             start = time.time()
-            frames = self.fpn_utils.reshape_feature_pyramid_to_frame(
-                x["data"], packing_all_in_one=True
-            )
+            with tracer.span("pack", cat="codec"):
+                frames = self.fpn_utils.reshape_feature_pyramid_to_frame(
+                    x["data"], packing_all_in_one=True
+                )
 
             # Generate json files with fpn sizes for the decoder
             # manually activate the following and run in encode_only mode
@@ -477,28 +538,47 @@ class VTM(nn.Module):
                 frmHeight=frame_height,
             )
 
-            for frame in frames:
-                self.yuvio.write_one_frame(frame, mid_level=mid_level)
+            with tracer.span("yuv_write", cat="codec", frames=nb_frames):
+                for frame in frames:
+                    self.yuvio.write_one_frame(frame, mid_level=mid_level)
 
         bitstream_path = Path(f"{file_prefix}.bin")
         logpath = Path(f"{file_prefix}_enc.log")
-        cmds = self.get_encode_cmd(
-            yuv_in_path,
-            width=frame_width,
-            height=frame_height,
-            qp=self.qp,
-            bitstream_path=bitstream_path,
-            nb_frames=nb_frames,
-            chroma_format=self.enc_cfgs["chroma_format"],
-            input_bitdepth=self.enc_cfgs["input_bitdepth"],
-            output_bitdepth=self.enc_cfgs["output_bitdepth"],
-            parallel_encoding=self.parallel_encoding,
-            hash_check=self.hash_check,
-        )
+
+        qp = self.qp
+        trial_bitstream = None
+        if self.rate_search is not None:
+            start = time.time()
+            qp, trial_bitstream = self.search_qp(
+                x, yuv_in_path, nb_frames, frame_width, frame_height, codec_output_dir
+            )
+            rate_search_time = time.time() - start
+            self.logger.debug(f"rate_search_time:{rate_search_time}")
+            self.searched_qp = qp
+
+        cmds = []
+        if trial_bitstream is None:
+            cmds = self.get_encode_cmd(
+                yuv_in_path,
+                width=frame_width,
+                height=frame_height,
+                qp=qp,
+                bitstream_path=bitstream_path,
+                nb_frames=nb_frames,
+                chroma_format=self.enc_cfgs["chroma_format"],
+                input_bitdepth=self.enc_cfgs["input_bitdepth"],
+                output_bitdepth=self.enc_cfgs["output_bitdepth"],
+                parallel_encoding=self.parallel_encoding,
+                hash_check=self.hash_check,
+            )
 
         start = time.time()
-        if len(cmds) > 1:  # post parallel encoding
-            run_cmdlines_parallel(cmds, logpath=logpath)
+        if trial_bitstream is not None:  # the trials encoded all the frames
+            shutil.copyfile(trial_bitstream, bitstream_path)
+        elif len(cmds) > 1:  # post parallel encoding
+            run_cmdlines_parallel(
+                cmds, logpath=logpath, max_workers=thread_budget.codec_slots(len(cmds))
+            )
         else:
             run_cmdline(cmds[0], logpath=logpath)
         enc_time = time.time() - start
@@ -555,6 +635,8 @@ class VTM(nn.Module):
             "video": enc_time,
             "conversion": conversion_time,
         }
+        if self.rate_search is not None:
+            enc_times["rate_search"] = rate_search_time
 
         mac_calculations = None  # no NN-related complexity calculation with std codecs
 
@@ -686,12 +768,13 @@ class VTM(nn.Module):
                 frame_width * frame_height * factor
             )
 
-            rec_frames = []
-            for i in range(nb_frames):
-                rec_yuv = self.yuvio.read_one_frame(i)
-                rec_frames.append(rec_yuv)
+            with tracer.span("yuv_read", cat="codec", frames=nb_frames):
+                rec_frames = []
+                for i in range(nb_frames):
+                    rec_yuv = self.yuvio.read_one_frame(i)
+                    rec_frames.append(rec_yuv)
 
-            rec_frames = torch.stack(rec_frames)
+                rec_frames = torch.stack(rec_frames)
 
             start = time_measure()
             minv, maxv = self.min_max_dataset
@@ -720,12 +803,13 @@ class VTM(nn.Module):
                     print(f'Error reading file "{fpn_sizes}"')
                     raise err
 
-            features = self.fpn_utils.reshape_frame_to_feature_pyramid(
-                rec_frames,
-                json_dict["fpn"],
-                json_dict["subframe_heights"],
-                packing_all_in_one=True,
-            )
+            with tracer.span("unpack", cat="codec"):
+                features = self.fpn_utils.reshape_frame_to_feature_pyramid(
+                    rec_frames,
+                    json_dict["fpn"],
+                    json_dict["subframe_heights"],
+                    packing_all_in_one=True,
+                )
 
             conversion_time = time_measure() - start
             self.logger.debug(f"conversion_time:{conversion_time}")
@@ -1017,6 +1101,7 @@ class VCMRS(VTM):
         **kwargs,
     ):
         super().__init__(vision_model, dataset, **kwargs)
+        assert self.rate_search is None, "rate_search is not supported with VCM-RS"
         self.use_descriptors = True
         self.tmp_dir = Path(self.codec_paths["tmp_dir"])
 
@@ -67,6 +67,65 @@ def min_max_inv_normalization(x, min: float, max: float, bitdepth: int = 10):
     return out
 
 
+def packed_feature_dtype(bitdepth: int):
+    """integer dtype holding bitdepth-bit codes, None if torch lacks it"""
+    if bitdepth <= 8:
+        return torch.uint8
+    if bitdepth <= 16:
+        return getattr(torch, "uint16", None)  # torch >= 2.3
+    raise NotImplementedError
+
+
+def quantize_feature_levels(
+    features: Dict[str, Tensor], min: float, max: float, bitdepth: int, dtype=None
+) -> Dict[str, Tensor]:
+    """
+    Range checks, min-max normalizes and quantizes all the feature levels at once.
+
+    The levels are gathered in one buffer so that the range check is a single
+    reduction and the normalization runs in place, with the same operations (and
+    codes) as min_max_normalization. The codes are packed as dtype, by default the
+    smallest integer dtype holding bitdepth bits, and the returned levels are views
+    of one packed buffer.
+    """
+    dtype = packed_feature_dtype(bitdepth) if dtype is None else dtype
+    assert dtype is not None, f"{bitdepth}-bit features require torch.uint16"
+
+    shapes = {k: v.shape for k, v in features.items()}
+    numels = [v.numel() for v in features.values()]
+    buf = torch.cat([v.reshape(-1) for v in features.values()])
+
+    lo, hi = torch.aminmax(buf)
+    assert (
+        lo >= min and hi <= max
+    ), f"{lo} should be greater than {min} and {hi} should be less than {max}"
+
+    max_num_bins = (2**bitdepth) - 1
+    buf.sub_(min).div_(max - min).clamp_(0, 1).mul_(max_num_bins).floor_()
+    codes = buf.to(dtype).split(numels)
+
+    return {k: c.view(shapes[k]) for k, c in zip(shapes, codes)}
+
+
+def dequantize_feature_levels(
+    features: Dict[str, Tensor], min: float, max: float, bitdepth: int
+) -> Dict[str, Tensor]:
+    """
+    Inverse of quantize_feature_levels, into float32 views of one buffer.
+    """
+    shapes = {k: v.shape for k, v in features.items()}
+    numels = [v.numel() for v in features.values()]
+    device = next(iter(features.values())).device
+    out = torch.empty(sum(numels), dtype=torch.float32, device=device)
+
+    chunks = out.split(numels)
+    for v, chunk in zip(features.values(), chunks):
+        chunk.copy_(v.reshape(-1))
+    out.div_((2**bitdepth) - 1).mul_(max - min).add_(min)
+
+    return {k: c.view(shapes[k]) for k, c in zip(shapes, chunks)}
+
+
 def pad(x, p=2**6, bottom_right=False):
     h, w = x.size(2), x.size(3)
     H = (h + p - 1) // p * p
@@ -38,11 +38,6 @@ from omegaconf import DictConfig, OmegaConf
 from torch.utils.data import DataLoader, Dataset
 from torchvision import transforms
 
-import compressai_vision.codecs  # noqa: E731
-import compressai_vision.evaluators  # noqa: E731
-import compressai_vision.model_wrappers  # noqa: E731
-import compressai_vision.pipelines  # noqa: E731
-
 from compressai_vision.datasets import DataCatalog
 from compressai_vision.registry import (
     CODECS,
@@ -54,6 +49,7 @@ from compressai_vision.registry import (
     TRANSFORMS,
     VISIONMODELS,
 )
+from compressai_vision.utils import thread_budget
 
 from .env import get_env
 
@@ -68,7 +64,11 @@ def create_vision_model(device: str, conf: DictConfig) -> nn.Module:
     if conf.arch.lower() == "none":
         return None
 
-    return VISIONMODELS[conf.arch](device, **conf[conf.arch]).eval()
+    vision_model = VISIONMODELS[conf.arch](device, **conf[conf.arch]).eval()
+    if "runtime" in conf:
+        vision_model.enable_runtime(**conf.runtime)
+
+    return vision_model
 
 
 def create_data_transform(conf: DictConfig) -> transforms.Compose:
@@ -110,7 +110,7 @@ def create_dataloader(conf: DictConfig, device: str, cfg: Any = None) -> DataLoa
     return DataLoader(
         dataset,
         batch_size=conf["loader"].batch_size,
-        num_workers=conf["loader"].num_workers,
+        num_workers=thread_budget.dataloader_workers(conf["loader"].num_workers),
         sampler=dataset.sampler,
         collate_fn=dataset.collate_fn,
         shuffle=conf["loader"].shuffle,
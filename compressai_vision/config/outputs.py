@@ -39,14 +39,16 @@ from omegaconf import DictConfig, OmegaConf
 
 import compressai_vision
 
-from compressai_vision.utils import git, pip
+from compressai_vision.utils import git, pip, thread_budget
 
 CONFIG_DIR = "configs"
 CONFIG_NAME = "config.yaml"
+THREAD_BUDGET_NAME = "thread_budget.yaml"
 
 
 def write_outputs(conf: DictConfig):
     write_config(conf)
+    write_thread_budget(conf)
     write_git_diff(conf, compressai_vision)
     write_pip_list(conf)
     write_pip_requirements(conf)
@@ -61,6 +63,14 @@ def write_config(conf: DictConfig):
         f.write(s)
 
 
+def write_thread_budget(conf: DictConfig):
+    logdir = Path(conf.paths.configs)
+    logdir.mkdir(parents=True, exist_ok=True)
+    s = OmegaConf.to_yaml(OmegaConf.create(thread_budget.allocation))
+    with open(logdir / THREAD_BUDGET_NAME, "w") as f:
+        f.write(s)
+
+
 def write_git_diff(conf: Mapping[str, Any], package: ModuleType) -> str:
     data = git.diff(root=package.__path__[0])
     return _write_src(conf, f"{package.__name__}.patch", data)
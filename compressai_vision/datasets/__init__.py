@@ -34,9 +34,11 @@ from .image import (
     TrackingDataset,
     deccode_compressed_rle,
 )
+from .prefetch import BackgroundPrefetcher
 from .utils import get_seq_info
 
 __all__ = [
+    "BackgroundPrefetcher",
     "DataCatalog",
     "Detectron2Dataset",
     "TrackingDataset",
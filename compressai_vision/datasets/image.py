@@ -44,13 +44,19 @@ from detectron2.data.dataset_mapper import DatasetMapper
 from detectron2.data.datasets import load_coco_json, register_coco_instances
 from detectron2.data.samplers import InferenceSampler
 from detectron2.utils.serialize import PicklableWrapper
-from jde.utils.io import read_results
 from PIL import Image
 from torch.utils.data import Dataset
 
 from compressai_vision.registry import register_datacatalog, register_dataset
 
-from .utils import JDECustomMapper, LinearMapper, MMPOSECustomMapper, YOLOXCustomMapper
+from .utils import (
+    CachedMapper,
+    JDECustomMapper,
+    LinearMapper,
+    MappedImageCache,
+    MMPOSECustomMapper,
+    YOLOXCustomMapper,
+)
 
 
 def manual_load_data(path, ext):
@@ -123,6 +129,19 @@ class BaseDataset(Dataset):
         self.thing_classes = []
         self.thing_dataset_id_to_contiguous_id = []
 
+        self.image_cache_dir = kwargs.get("image_cache_dir", None)
+
+    def _cached(self, mapper):
+        """serves mapped samples from the decoded-image cache when one is configured"""
+        if not self.image_cache_dir:
+            return mapper
+
+        cache = MappedImageCache(
+            self.image_cache_dir, self.dataset_name, self.images_folder, mapper
+        )
+        self.logger.info(f"decoded-image cache: {cache.cache_dir}")
+        return CachedMapper(mapper, cache)
+
 
 @register_dataset("DefaultDataset")
 class DefaultDataset(BaseDataset):
@@ -174,11 +193,13 @@ class DefaultDataset(BaseDataset):
             if kwargs["cfg"] is not None:
                 mapper = DatasetMapper(kwargs["cfg"], False)
 
-                self.mapDataset = MapDataset(_dataset, mapper)
+                self.mapDataset = MapDataset(_dataset, self._cached(mapper))
 
                 return
 
-        self.mapDataset = MapDataset(_dataset, LinearMapper(bgr=self.use_BGR))
+        self.mapDataset = MapDataset(
+            _dataset, self._cached(LinearMapper(bgr=self.use_BGR))
+        )
 
     def __getitem__(self, index):
         """
@@ -245,7 +266,7 @@ class Detectron2Dataset(BaseDataset):
             ), "A proper mapper information via cfg must be provided"
             mapper = DatasetMapper(kwargs["cfg"], False)
 
-        self.mapDataset = MapDataset(_dataset, mapper)
+        self.mapDataset = MapDataset(_dataset, self._cached(mapper))
         self._org_mapper_func = PicklableWrapper(DatasetMapper(kwargs["cfg"], False))
 
         metaData = MetadataCatalog.get(dataset_name)
@@ -284,7 +305,7 @@ class TrackingDataset(BaseDataset):
         else:
             mapper = JDECustomMapper(kwargs["patch_size"])
 
-        self.mapDataset = MapDataset(_dataset, mapper)
+        self.mapDataset = MapDataset(_dataset, self._cached(mapper))
         self._org_mapper_func = PicklableWrapper(JDECustomMapper(kwargs["patch_size"]))
 
     def get_org_mapper_func(self):
@@ -315,7 +336,7 @@ class YOLOXDataset(BaseDataset):
             mapper = YOLOXCustomMapper(kwargs["patch_size"])
 
         self.input_size = kwargs["patch_size"]
-        self.mapDataset = MapDataset(_dataset, mapper)
+        self.mapDataset = MapDataset(_dataset, self._cached(mapper))
         self._org_mapper_func = PicklableWrapper(
             YOLOXCustomMapper(kwargs["patch_size"])
         )
@@ -357,7 +378,7 @@ class MMPOSEDataset(BaseDataset):
             mapper = MMPOSECustomMapper(kwargs["patch_size"])
 
         self.input_size = kwargs["patch_size"]
-        self.mapDataset = MapDataset(_dataset, mapper)
+        self.mapDataset = MapDataset(_dataset, self._cached(mapper))
         self._org_mapper_func = PicklableWrapper(
             MMPOSECustomMapper(kwargs["patch_size"])
         )
@@ -487,6 +508,8 @@ class MPEGTVDTRACKING(DataCatalog):
             ext=ext,
         )
 
+        from jde.utils.io import read_results
+
         self.data_type = "mot"
         gt_frame_dict = read_results(
             str(self.annotation_path), self.data_type, is_gt=True
@@ -0,0 +1,133 @@
+# Copyright (c) 2022-2024, InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import queue
+import threading
+
+from typing import Iterable
+
+import torch
+
+from compressai_vision.utils import time_measure
+
+__all__ = ["BackgroundPrefetcher"]
+
+
+class _EndOfLoader:
+    def __init__(self, error: BaseException = None):
+        self.error = error
+
+
+class BackgroundPrefetcher:
+    """
+    Iterates a dataloader from a background thread, keeping up to `depth` mapped samples ready,
+    so that image decoding and mapping overlap with NN Part 1 on the main thread.
+
+    When the NN Part 1 device is cuda, sample images are staged in pinned memory so that
+    the host to device copies are fast.
+
+    Attributes
+    ----------
+        stall_time : float
+            total time the consumer waited on an empty queue, in seconds
+        mean_queue_depth : float
+            average number of samples ready when the consumer asked for the next one
+    """
+
+    def __init__(self, loader: Iterable, depth: int = 2, device: str = "cpu"):
+        assert depth > 0, f"prefetch depth must be positive, got {depth}"
+
+        self.loader = loader
+        self.depth = depth
+        self.pin_memory = "cuda" in str(device) and torch.cuda.is_available()
+
+        self.stall_time = 0.0
+        self._depth_sum = 0
+        self._nb_gets = 0
+
+    def __len__(self):
+        return len(self.loader)
+
+    @property
+    def mean_queue_depth(self):
+        return self._depth_sum / self._nb_gets if self._nb_gets > 0 else 0.0
+
+    def _stage(self, d):
+        if not self.pin_memory:
+            return d
+
+        for sample in d:
+            if isinstance(sample.get("image", None), torch.Tensor):
+                sample["image"] = sample["image"].pin_memory()
+        return d
+
+    def _produce(self, q: queue.Queue, stop: threading.Event):
+        try:
+            for d in self.loader:
+                d = self._stage(d)
+                while not stop.is_set():
+                    try:
+                        q.put(d, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            q.put(_EndOfLoader())
+        except BaseException as error:  # forwarded to the consumer
+            q.put(_EndOfLoader(error))
+
+    def __iter__(self):
+        q = queue.Queue(maxsize=self.depth)
+        stop = threading.Event()
+        worker = threading.Thread(target=self._produce, args=(q, stop), daemon=True)
+        worker.start()
+
+        try:
+            while True:
+                self._depth_sum += q.qsize()
+                self._nb_gets += 1
+
+                start = time_measure()
+                d = q.get()
+                self.stall_time += time_measure() - start
+
+                if isinstance(d, _EndOfLoader):
+                    if d.error is not None:
+                        raise d.error
+                    return
+                yield d
+        finally:
+            # the consumer may stop early (e.g., n_frames_to_be_encoded)
+            stop.set()
+            while worker.is_alive():
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    worker.join(timeout=0.1)
@@ -30,16 +30,28 @@
 
 import configparser
 import copy
+import fcntl
+import hashlib
+import json
+import os
+import re
+
+from pathlib import Path
 
 import cv2
 import numpy as np
 import torch
 
-from jde.utils.datasets import letterbox
-from mmpose.structures.bbox import get_warp_matrix
 from torchvision import transforms
 
-__all__ = ["MMPOSECustomMapper", "YOLOXCustomMapper", "JDECustomMapper", "LinearMapper"]
+__all__ = [
+    "MMPOSECustomMapper",
+    "YOLOXCustomMapper",
+    "JDECustomMapper",
+    "LinearMapper",
+    "MappedImageCache",
+    "CachedMapper",
+]
 
 
 def yolox_style_scaling(img, input_size, padding=False):
@@ -141,6 +153,8 @@ class MMPOSECustomMapper:
         dataset_dict["height"] = img_h
         dataset_dict["width"] = img_w
 
+        from mmpose.structures.bbox import get_warp_matrix
+
         _input_h, _input_w = self.input_img_size
         # mmpose style scaling
         scale, center = self.compute_scale_and_center(img_w, img_h)
@@ -286,6 +300,8 @@ class JDECustomMapper:
         org_img = cv2.imread(dataset_dict["file_name"])  # return img in BGR by default
         dataset_dict["height"], dataset_dict["width"], _ = org_img.shape
 
+        from jde.utils.datasets import letterbox
+
         # Padded resize
         image, _, _, _ = letterbox(org_img, height=self.height, width=self.width)
 
@@ -354,6 +370,142 @@ class LinearMapper:
         return dataset_dict
 
 
+class MappedImageCache:
+    """
+    A store of mapped input images, shared across runs over the same dataset (e.g., QP sweeps).
+
+    Images are kept as uint8 .npy files, memory-mapped on reading, under a directory keyed by
+    the dataset, the mapper type and the mapper parameters. Entries are indexed by image_id
+    in an append-only index file, so that concurrent dataloader workers can fill the store.
+    """
+
+    INDEX_FILE_NAME = "index.jsonl"
+
+    def __init__(self, root, dataset_name, images_folder, mapper):
+        mapper_params = re.sub(
+            r" at 0x[0-9a-fA-F]+", "", repr(sorted(vars(mapper).items()))
+        )
+        key = hashlib.sha1(
+            json.dumps(
+                [
+                    dataset_name,
+                    str(Path(images_folder).resolve()),
+                    type(mapper).__name__,
+                    mapper_params,
+                ]
+            ).encode()
+        ).hexdigest()[:16]
+
+        self.cache_dir = Path(root) / f"{dataset_name}_{type(mapper).__name__}_{key}"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / self.INDEX_FILE_NAME
+
+        self.index = {}
+        if self.index_path.is_file():
+            with open(self.index_path, "r") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.index[entry["image_id"]] = entry
+
+    def _file_path(self, image_id):
+        file_stem = hashlib.sha1(image_id.encode()).hexdigest()[:20]
+        return self.cache_dir / f"{file_stem}.npy"
+
+    @staticmethod
+    def _source_stat(file_name):
+        stat = os.stat(file_name)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    @staticmethod
+    def _to_uint8(image: torch.Tensor):
+        # mapped images are uint8, or float holding uint8 values, possibly scaled by 1/255
+        if image.dtype == torch.uint8:
+            return image.numpy(), "raw"
+
+        u8 = image.round().clamp(0, 255).to(torch.uint8)
+        if torch.equal(u8.to(image.dtype), image):
+            return u8.numpy(), "int"
+
+        u8 = (image * 255.0).round().clamp(0, 255).to(torch.uint8)
+        if torch.equal(u8.to(image.dtype) / 255.0, image):
+            return u8.numpy(), "div255"
+
+        return None, None
+
+    def get(self, dataset_dict):
+        entry = self.index.get(str(dataset_dict["image_id"]), None)
+        if entry is None:
+            return None
+        if entry["source_stat"] != self._source_stat(dataset_dict["file_name"]):
+            return None
+
+        # copy-on-write mapping: pages are loaded lazily and shared until written to,
+        # and the tensor is writable (only raw entries are returned without a copy)
+        image = torch.from_numpy(
+            np.load(self._file_path(entry["image_id"]), mmap_mode="c")
+        )
+        if entry["mode"] != "raw":
+            image = image.to(getattr(torch, entry["dtype"]))
+            if entry["mode"] == "div255":
+                image = image / 255.0
+
+        mapped_dict = {
+            k: v for k, v in dataset_dict.items() if k not in entry["dropped_keys"]
+        }
+        mapped_dict["height"] = entry["height"]
+        mapped_dict["width"] = entry["width"]
+        mapped_dict["image"] = image
+
+        return mapped_dict
+
+    def put(self, dataset_dict, mapped_dict):
+        image = mapped_dict["image"]
+        array, mode = self._to_uint8(image)
+        if array is None:
+            return
+
+        image_id = str(dataset_dict["image_id"])
+        file_path = self._file_path(image_id)
+        tmp_path = file_path.with_suffix(f".{os.getpid()}.tmp.npy")
+        np.save(tmp_path, array)
+        os.replace(tmp_path, file_path)
+
+        entry = {
+            "image_id": image_id,
+            "source_stat": self._source_stat(dataset_dict["file_name"]),
+            "mode": mode,
+            "dtype": str(image.dtype).split(".")[-1],
+            "height": mapped_dict["height"],
+            "width": mapped_dict["width"],
+            "dropped_keys": [k for k in dataset_dict if k not in mapped_dict],
+        }
+        with open(self.index_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(json.dumps(entry) + "\n")
+        self.index[image_id] = entry
+
+
+class CachedMapper:
+    """
+    A callable which serves mapped samples from a MappedImageCache and runs the wrapped mapper
+    (then fills the cache) only for the images not in it yet.
+    """
+
+    def __init__(self, mapper, cache: MappedImageCache):
+        self.mapper = mapper
+        self.cache = cache
+
+    def __call__(self, dataset_dict):
+        mapped_dict = self.cache.get(dataset_dict)
+        if mapped_dict is not None:
+            return mapped_dict
+
+        mapped_dict = self.mapper(dataset_dict)
+        self.cache.put(dataset_dict, mapped_dict)
+
+        return mapped_dict
+
+
 def get_seq_info(seq_info_path):
     config = configparser.ConfigParser()
     config.read(seq_info_path)
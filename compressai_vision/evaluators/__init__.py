@@ -27,16 +27,18 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
 # ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from .base_evaluator import BaseEvaluator
-from .evaluators import (
-    COCOEVal,
-    MOT_HiEve_Eval,
-    MOT_JDE_Eval,
-    MOT_TVD_Eval,
-    OpenImagesChallengeEval,
-    VisualQualityEval,
-    YOLOXCOCOEval,
-)
+import importlib
+
+_LAZY_ATTRS = {
+    "BaseEvaluator": ".base_evaluator",
+    "COCOEVal": ".evaluators",
+    "OpenImagesChallengeEval": ".evaluators",
+    "YOLOXCOCOEval": ".evaluators",
+    "MOT_JDE_Eval": ".evaluators",
+    "MOT_HiEve_Eval": ".evaluators",
+    "MOT_TVD_Eval": ".evaluators",
+    "VisualQualityEval": ".evaluators",
+}
 
 __all__ = [
     "BaseEvaluator",
@@ -48,3 +50,10 @@ __all__ = [
     "MOT_TVD_Eval",
     "VisualQualityEval",
 ]
+
+
+def __getattr__(name):
+    # submodules are imported on first access only, see compressai_vision.registry
+    if name in _LAZY_ATTRS:
+        return getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -32,11 +32,15 @@ import json
 import logging
 
 from pathlib import Path
+from typing import Dict, List
 
 import torch.nn as nn
 
 
 class BaseEvaluator(nn.Module):
+    # attributes holding the partial evaluation, see checkpoint_state()
+    _checkpoint_attributes: List[str] = []
+
     def __init__(
         self,
         datacatalog_name,
@@ -84,9 +88,23 @@ class BaseEvaluator(nn.Module):
     def digest(self, gt, pred):
         raise NotImplementedError
 
+    def digest_batch(self, gts: List, preds: List):
+        """digests a list of (gt, pred) pairs, one per frame, in the given order"""
+        assert len(gts) == len(preds)
+        for gt, pred in zip(gts, preds):
+            self.digest(gt, pred)
+
     def results(self, save_path: str = None):
         raise NotImplementedError
 
+    def checkpoint_state(self) -> Dict:
+        """partial state of the evaluation, to resume an interrupted run"""
+        return {k: getattr(self, k) for k in self._checkpoint_attributes}
+
+    def load_checkpoint_state(self, state: Dict):
+        for k, v in state.items():
+            setattr(self, k, v)
+
     def write_results(self, out, path: str = None):
         if path is None:
             path = f"{self.output_dir}"
@@ -44,16 +44,9 @@ import torch
 from detectron2.data import MetadataCatalog
 from detectron2.evaluation import COCOEvaluator
 from detectron2.utils.visualizer import Visualizer
-from jde.utils.io import unzip_objs
-from mmpose.datasets.datasets import BaseCocoStyleDataset
-from mmpose.datasets.transforms import PackPoseInputs
-from mmpose.evaluation.metrics import CocoMetric
 from pycocotools.coco import COCO
 from pytorch_msssim import ms_ssim
 from tqdm import tqdm
-from yolox.data.datasets.coco import remove_useless_info
-from yolox.evaluators import COCOEvaluator as YOLOX_COCOEvaluator
-from yolox.utils import xyxy2xywh
 
 from compressai_vision.datasets import deccode_compressed_rle
 from compressai_vision.registry import register_evaluator
@@ -147,6 +140,12 @@ class COCOEVal(BaseEvaluator):
     def digest(self, gt, pred):
         return self._evaluator.process(gt, pred)
 
+    def checkpoint_state(self):
+        return {"_predictions": self._evaluator._predictions}
+
+    def load_checkpoint_state(self, state):
+        self._evaluator._predictions = state["_predictions"]
+
     def save_visualization(self, gt, pred, output_dir, threshold):
         gt_image = gt[0]["image"]
         if torch.is_floating_point(gt_image):
@@ -187,6 +186,8 @@ class COCOEVal(BaseEvaluator):
 
 @register_evaluator("OIC-EVAL")
 class OpenImagesChallengeEval(BaseEvaluator):
+    _checkpoint_attributes = ["_predictions", "_cc"]
+
     def __init__(
         self,
         datacatalog_name,
@@ -455,6 +456,8 @@ class SemanticSegmentationEval(BaseEvaluator):
     Based on code from the Nokia Pandaset evaluation scripts
     """
 
+    _checkpoint_attributes = ["_seq_gt_cats", "_seq_det_cats", "_frame_ctr"]
+
     def __init__(
         self,
         datacatalog_name,
@@ -558,6 +561,8 @@ class MOT_JDE_Eval(BaseEvaluator):
 
     """
 
+    _checkpoint_attributes = ["acc", "_predictions"]
+
     def __init__(
         self,
         datacatalog_name,
@@ -720,6 +725,8 @@ class MOT_JDE_Eval(BaseEvaluator):
         return ret
 
     def mot_eval(self):
+        from jde.utils.io import unzip_objs
+
         assert len(self.dataset) == len(
             self._predictions
         ), "Total number of frames are mismatch"
@@ -895,6 +902,8 @@ class MOT_HiEve_Eval(MOT_JDE_Eval):
 
 @register_evaluator("YOLOX-COCO-EVAL")
 class YOLOXCOCOEval(BaseEvaluator):
+    _checkpoint_attributes = ["data_list", "output_data"]
+
     def __init__(
         self,
         datacatalog_name,
@@ -908,6 +917,10 @@ class YOLOXCOCOEval(BaseEvaluator):
             datacatalog_name, dataset_name, dataset, output_dir, eval_criteria
         )
 
+        # yolox is only imported when its evaluator is used
+        from yolox.data.datasets.coco import remove_useless_info
+        from yolox.evaluators import COCOEvaluator as YOLOX_COCOEvaluator
+
         self.set_annotation_info(dataset)
 
         cocoapi = COCO(self.annotation_path)
@@ -980,6 +993,8 @@ class YOLOXCOCOEval(BaseEvaluator):
         return {"AP": listed_items[0] * 100, "AP50": listed_items[1] * 100}
 
     def _convert_to_coco_format(self, outputs, info_imgs, ids):
+        from yolox.utils import xyxy2xywh
+
         # reference : yolox > evaluators > coco_evaluator > convert_to_coco_format
         data_list = []
         image_wise_data = defaultdict(dict)
@@ -1044,6 +1059,11 @@ class MMPOSECOCOEval(BaseEvaluator):
             datacatalog_name, dataset_name, dataset, output_dir, eval_criteria
         )
 
+        # mmpose is only imported when its evaluator is used
+        from mmpose.datasets.datasets import BaseCocoStyleDataset
+        from mmpose.datasets.transforms import PackPoseInputs
+        from mmpose.evaluation.metrics import CocoMetric
+
         self.set_annotation_info(dataset)
         self.input_size = dataset.input_size
         self.comput_scale_and_center = (
@@ -1142,6 +1162,16 @@ class MMPOSECOCOEval(BaseEvaluator):
         self._evaluator.process({"dummy": None}, [_data_sample.to_dict()])
         self.pred_data_list_cnt = self.pred_data_list_cnt + 1
 
+    def checkpoint_state(self):
+        return {
+            "pred_data_list_cnt": self.pred_data_list_cnt,
+            "results": self._evaluator.results,
+        }
+
+    def load_checkpoint_state(self, state):
+        self.pred_data_list_cnt = state["pred_data_list_cnt"]
+        self._evaluator.results = state["results"]
+
     def results(self, save_path: str = None):
         assert self._loaded_data_sample_size == self.pred_data_list_cnt
         eval_results = self._evaluator.evaluate(self.pred_data_list_cnt)
@@ -1174,6 +1204,8 @@ class MMPOSECOCOEval(BaseEvaluator):
 
 @register_evaluator("VISUAL-QUALITY-EVAL")
 class VisualQualityEval(BaseEvaluator):
+    _checkpoint_attributes = ["_evaluations", "_sum_psnr", "_sum_msssim", "_cc"]
+
     def __init__(
         self,
         datacatalog_name,
@@ -27,17 +27,19 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
 # ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from .detectron2 import (
-    BaseWrapper,
-    faster_rcnn_R_50_FPN_3x,
-    faster_rcnn_X_101_32x8d_FPN_3x,
-    mask_rcnn_R_50_FPN_3x,
-    mask_rcnn_X_101_32x8d_FPN_3x,
-    panoptic_rcnn_R_101_FPN_3x,
-)
-from .jde import jde_1088x608
-from .rtmo import rtmo_multi_person_pose_estimation
-from .yolox import yolox_darknet53
+import importlib
+
+_LAZY_ATTRS = {
+    "BaseWrapper": ".base_wrapper",
+    "faster_rcnn_X_101_32x8d_FPN_3x": ".detectron2",
+    "mask_rcnn_X_101_32x8d_FPN_3x": ".detectron2",
+    "faster_rcnn_R_50_FPN_3x": ".detectron2",
+    "mask_rcnn_R_50_FPN_3x": ".detectron2",
+    "panoptic_rcnn_R_101_FPN_3x": ".detectron2",
+    "jde_1088x608": ".jde",
+    "yolox_darknet53": ".yolox",
+    "rtmo_multi_person_pose_estimation": ".rtmo",
+}
 
 __all__ = [
     "BaseWrapper",
@@ -50,3 +52,10 @@ __all__ = [
     "yolox_darknet53",
     "rtmo_multi_person_pose_estimation",
 ]
+
+
+def __getattr__(name):
+    # submodules are imported on first access only, see compressai_vision.registry
+    if name in _LAZY_ATTRS:
+        return getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
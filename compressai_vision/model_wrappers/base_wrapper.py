@@ -35,6 +35,8 @@ import torch.nn as nn
 
 from torch import Tensor
 
+from .runtime import ExportedRuntime
+
 
 class BaseWrapper(nn.Module):
     """NOTE: virtual class to build *your* wrapper and interface with compressai_vision
@@ -46,9 +48,14 @@ class BaseWrapper(nn.Module):
         super().__init__()
         self.logger = logging.getLogger(self.__class__.__name__)
         self.device = device
+        self.runtime = None
 
     def input_to_features(self, x, device: str) -> Dict:
-        """Computes deep features at the intermediate layer(s) all the way from the input"""
+        """Computes deep features at the intermediate layer(s) all the way from the input
+
+        x is a list of input samples of the same size, processed as one batch.
+        The returned "input_size" holds one entry per sample.
+        """
         raise NotImplementedError
 
     def features_to_output(self, x: Dict, device: str):
@@ -61,6 +68,33 @@ class BaseWrapper(nn.Module):
         """
         raise NotImplementedError
 
+    def enable_runtime(self, backend: str = "eager", **kwargs):
+        """Runs the exportable parts of NN-part1 and NN-part2 as exported graphs
+
+        backend is one of "eager", "torchscript" or "onnxruntime". See ExportedRuntime.
+        """
+        if backend == "eager":
+            self.runtime = None
+            return
+
+        split_id = getattr(self, "split_id", None)
+        kwargs.setdefault("model_key", f"{self.__class__.__name__}:{split_id}")
+        self.runtime = ExportedRuntime(backend, **kwargs)
+        self.logger.info(f"Running exportable parts with {backend}")
+
+    def run_exported(self, name: str, module: nn.Module, *args):
+        """Runs module(*args), as an exported graph when a runtime is enabled"""
+        if self.runtime is None:
+            return module(*args)
+        return self.runtime(name, module, *args)
+
+    def checkpoint_state(self) -> Dict:
+        """state kept across frames (e.g., tracks), to resume an interrupted run"""
+        return {}
+
+    def load_checkpoint_state(self, state: Dict):
+        assert not state, f"{self.__class__.__name__} has no state to restore"
+
     def forward(self, x, input_map_function):
         """Complete the downstream task with end-to-end manner all the way from the input"""
         raise NotImplementedError
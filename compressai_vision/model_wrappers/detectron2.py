@@ -48,6 +48,7 @@ from compressai_vision.registry import register_vision_model
 
 from .base_wrapper import BaseWrapper
 from .intconv2d import IntConv2d, IntTransposedConv2d
+from .runtime import Subgraph
 
 __all__ = [
     "faster_rcnn_X_101_32x8d_FPN_3x",
@@ -172,7 +173,9 @@ class Rcnn_R_50_X_101_FPN(BaseWrapper):
         _integer_conv_weight = bool(kwargs["integer_conv_weight"])
 
         self.model = build_model(self._cfg)
-        self.replace_conv2d_modules(self.model)
+        # integer convolutions are only needed with integerized weights
+        if _integer_conv_weight:
+            self.replace_conv2d_modules(self.model)
         self.model = self.model.to(device).eval()
 
         DetectionCheckpointer(self.model).load(f"{_path_prefix}/{kwargs['weights']}")
@@ -191,7 +194,10 @@ class Rcnn_R_50_X_101_FPN(BaseWrapper):
         self.postprocess = self.model._postprocess
 
         # to be used for printing info logs
-        self.model_info = {"cfg": kwargs["cfg"], "weights": kwargs["weights"]}
+        self.model_info = {
+            "cfg": f"{_path_prefix}/{kwargs['cfg']}",
+            "weights": f"{_path_prefix}/{kwargs['weights']}",
+        }
 
         self.supported_split_points = Split_Points
 
@@ -230,7 +236,8 @@ class Rcnn_R_50_X_101_FPN(BaseWrapper):
     def size_divisibility(self):
         return self.backbone.size_divisibility
 
-    def replace_conv2d_modules(self, module):
+    @classmethod
+    def replace_conv2d_modules(cls, module):
         for child_name, child_module in module.named_children():
             if type(child_module).__name__ in ["Conv2d", "ConvTranspose2d"]:
                 if type(child_module).__name__ == "Conv2d":
@@ -259,7 +266,7 @@ class Rcnn_R_50_X_101_FPN(BaseWrapper):
                 # The funnction can be rewritten by specifically iterate for each module
                 # including Conv2d and Trasnposed Conv2d.
                 # type(module).__name__ in ["FPN", "BasicStem", "BottleneckBlock", "StandardRPNHead", "MaskRCNNConvUpsampledHead"]
-                self.replace_conv2d_modules(child_module)
+                cls.replace_conv2d_modules(child_module)
 
     @staticmethod
     def quantize_weights(model):
@@ -315,7 +322,7 @@ class Rcnn_R_50_X_101_FPN(BaseWrapper):
     def _input_to_feature_pyramid(self, x):
         """Computes and return feature pyramid ['p2', 'p3', 'p4', 'p5'] all the way from the input"""
         imgs = self.model.preprocess_image(x)
-        feature_pyramid = self.backbone(imgs.tensor)
+        feature_pyramid = self.run_exported("nn_part1_fpn", self.backbone, imgs.tensor)
         del feature_pyramid["p6"]
 
         return {"data": feature_pyramid, "input_size": imgs.image_sizes}
@@ -326,33 +333,49 @@ class Rcnn_R_50_X_101_FPN(BaseWrapper):
         imgs = self.model.preprocess_image(x)
 
         c_features = self.split_layer_list
+        results = self.run_exported(
+            "nn_part1_c2",
+            Subgraph(self._bottom_up_to_c2, backbone=self.backbone),
+            imgs.tensor,
+        )
+
+        assert len(c_features) == len(results)
+        out = {f: res for f, res in zip(c_features, results)}
+
+        return {"data": out, "input_size": imgs.image_sizes}
+
+    def _bottom_up_to_c2(self, x):
         ref_features = self.backbone.in_features
 
         results = []
 
         # Resnet FPN
-        bottom_up_features = self.backbone.bottom_up(imgs.tensor)
+        bottom_up_features = self.backbone.bottom_up(x)
 
         for idx, lateral_conv in enumerate(self.backbone.lateral_convs):
             features = bottom_up_features[ref_features[-idx - 1]]
             results.insert(0, lateral_conv(features))
 
-        assert len(c_features) == len(results)
-        out = {f: res for f, res in zip(c_features, results)}
-
-        return {"data": out, "input_size": imgs.image_sizes}
+        return results
 
     @torch.no_grad()
     def _input_to_r2(self, x):
         """Computes and return feature tensor at R2 from input"""
         imgs = self.model.preprocess_image(x)
 
-        # Resnet FPN
-        stem_out = self.backbone.bottom_up.stem(imgs.tensor)
-        r2_out = self.backbone.bottom_up.res2(stem_out)
+        r2_out = self.run_exported(
+            "nn_part1_r2",
+            Subgraph(self._bottom_up_to_r2, backbone=self.backbone),
+            imgs.tensor,
+        )
 
         return {"data": {"r2": r2_out}, "input_size": imgs.image_sizes}
 
+    def _bottom_up_to_r2(self, x):
+        # Resnet FPN
+        stem_out = self.backbone.bottom_up.stem(x)
+        return self.backbone.bottom_up.res2(stem_out)
+
     @torch.no_grad()
     def get_input_size(self, x):
         """Computes input image size to the network"""
@@ -411,8 +434,11 @@ class Rcnn_R_50_X_101_FPN(BaseWrapper):
 
         """
         # Replacing tag names for interfacing with NN-part2
-        x = dict(zip(self.features_at_splits.keys(), x.values()))
-        x = self.backbone.forward_after_c2(x)
+        x = self.run_exported(
+            "nn_part2_c2",
+            Subgraph(self._c2_to_feature_pyramid, backbone=self.backbone),
+            *x.values(),
+        )
 
         class dummy:
             def __init__(self, img_size: list):
@@ -438,19 +464,11 @@ class Rcnn_R_50_X_101_FPN(BaseWrapper):
     def _feature_r2_to_output(self, x: Dict, org_img_size: Dict, input_img_size: List):
         assert "r2" in x
 
-        r2_out = x["r2"]
-        r3_out = self.backbone.bottom_up.res3(r2_out)
-        r4_out = self.backbone.bottom_up.res4(r3_out)
-        r5_out = self.backbone.bottom_up.res5(r4_out)
-
-        bottom_up_features = {
-            "res2": r2_out,
-            "res3": r3_out,
-            "res4": r4_out,
-            "res5": r5_out,
-        }
-
-        fptensors = self.backbone(bottom_up_features, no_bottom_up=True)
+        fptensors = self.run_exported(
+            "nn_part2_r2",
+            Subgraph(self._r2_to_feature_pyramid, backbone=self.backbone),
+            x["r2"],
+        )
 
         class dummy:
             def __init__(self, img_size: list):
@@ -473,6 +491,24 @@ class Rcnn_R_50_X_101_FPN(BaseWrapper):
             input_img_size,
         )
 
+    def _c2_to_feature_pyramid(self, *c_features):
+        x = dict(zip(self.features_at_splits.keys(), c_features))
+        return self.backbone.forward_after_c2(x)
+
+    def _r2_to_feature_pyramid(self, r2_out):
+        r3_out = self.backbone.bottom_up.res3(r2_out)
+        r4_out = self.backbone.bottom_up.res4(r3_out)
+        r5_out = self.backbone.bottom_up.res5(r4_out)
+
+        bottom_up_features = {
+            "res2": r2_out,
+            "res3": r3_out,
+            "res4": r4_out,
+            "res5": r5_out,
+        }
+
+        return self.backbone(bottom_up_features, no_bottom_up=True)
+
     @torch.no_grad()
     def deeper_features_for_accuracy_proxy(self, x: Dict):
         """
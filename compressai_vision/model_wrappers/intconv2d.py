@@ -36,6 +36,30 @@ import torch
 from torch.nn import functional as F
 
 
+def _input_scale(x: torch.Tensor, x_scale: float) -> torch.Tensor:
+    """fx of the VCM-RS reference, x_scale / max(|x|), or 1 for an all-zero input
+
+    Computed as in the reference (x_scale / x_max, i.e., x_max.reciprocal() * x_scale),
+    from the min and max of x rather than |x|, and without synchronizing on the device.
+    """
+    x_min, x_max = torch.aminmax(x)
+    x_max = torch.maximum(x_max, x_min.neg())
+    return torch.where(x_max > 0, x_scale / x_max, torch.ones_like(x_max))
+
+
+def _exact_accumulation(x: torch.Tensor) -> bool:
+    """whether the integer convolution of x is computed in float64, then rounded
+
+    The intified inputs and weights are scaled so that the accumulations fit in the
+    float32 mantissa, which makes float32 convolutions exact when computed directly.
+    cuDNN may however pick transform based algorithms (e.g., Winograd, FFT) or TF32,
+    which are not. Instead of disabling cuDNN, such convolutions run in float64, where
+    their error is far below 0.5, and are rounded back to the exact integers.
+    PyTorch has no integer convolution kernels to accumulate in int32/int64 directly.
+    """
+    return x.is_cuda and x.dtype == torch.float32
+
+
 class IntConv2d(torch.nn.Conv2d):
     def __init__(self, *args, **kwargs) -> None:
         _nkwargs = copy.deepcopy(kwargs)
@@ -55,9 +79,11 @@ class IntConv2d(torch.nn.Conv2d):
 
         super().__init__(*args, **_nkwargs)
         self.initified_weight_mode = False
+        self._int_params_cache = {}
 
     def quantize_weights(self):
         self.initified_weight_mode = True
+        self._int_params_cache = {}
 
         if self.bias is None:
             self.float_bias = torch.zeros(self.out_channels, device=self.weight.device)
@@ -89,6 +115,7 @@ class IntConv2d(torch.nn.Conv2d):
         self.w_sum[self.w_sum == 0] = 1  # prevent divide by 0
 
         self.fw = (self.factor / self.sf - np.sqrt(N / 12) * 5) / self.w_sum
+        self.x_scale = self.factor * self.sf - 0.5
 
         # intify weights
         self.weight.requires_grad = False  # Just make sure
@@ -103,7 +130,55 @@ class IntConv2d(torch.nn.Conv2d):
 
         ###### END OF THE REFERENCE IMPELEMENTATION OF THE INT CONVS IN VCMRS ######
 
+    def _int_params(self, device: torch.device):
+        """scales and float bias of the layer, on the device of the input, cached"""
+        params = self._int_params_cache.get(device)
+        if params is None:
+            params = {
+                "fw": self.fw.to(device).view(-1, 1, 1),
+                "bias": self.float_bias.to(device).view(-1, 1, 1),
+            }
+            self._int_params_cache[device] = params
+        return params
+
     def integer_conv2d(self, x: torch.Tensor):
+        """integer convolution, bit exact with integer_conv2d_reference"""
+        _dtype = x.dtype
+        params = self._int_params(x.device)
+
+        fx = _input_scale(x, self.x_scale)
+        out_x = torch.round(fx * x)
+
+        if _exact_accumulation(out_x):
+            if "weight64" not in params:
+                params["weight64"] = self.weight.to(x.device, torch.float64)
+            out_x = F.conv2d(
+                out_x.double(),
+                params["weight64"],
+                None,
+                self.stride,
+                self.padding,
+                self.dilation,
+                self.groups,
+            )
+            out_x = out_x.round_().float()
+        else:
+            out_x = F.conv2d(
+                out_x,
+                self.weight,
+                self.bias,
+                self.stride,
+                self.padding,
+                self.dilation,
+                self.groups,
+            )
+
+        # x should be all integers, then apply bias in float format
+        out_x = out_x.div_(fx * params["fw"]).add_(params["bias"])
+
+        return out_x.to(_dtype)
+
+    def integer_conv2d_reference(self, x: torch.Tensor):
         _dtype = x.dtype
         _cudnn_enabled = torch.backends.cudnn.enabled
         torch.backends.cudnn.enabled = False
@@ -172,10 +247,12 @@ class IntTransposedConv2d(torch.nn.ConvTranspose2d):
 
         super().__init__(*args, **_nkwargs)
         self.initified_weight_mode = False
+        self._int_params_cache = {}
 
     # prepare quantized weights
     def quantize_weights(self):
         self.initified_weight_mode = True
+        self._int_params_cache = {}
 
         if self.bias is None:
             self.float_bias = torch.zeros(self.out_channels, device=self.weight.device)
@@ -207,6 +284,7 @@ class IntTransposedConv2d(torch.nn.ConvTranspose2d):
         self.w_sum[self.w_sum == 0] = 1  # prevent divide by 0
 
         self.fw = (self.factor / self.sf - np.sqrt(N / 12) * 5) / self.w_sum
+        self.x_scale = self.factor * self.sf - 0.5
 
         # intify weights
         self.weight.requires_grad = False  # Just make sure
@@ -221,7 +299,48 @@ class IntTransposedConv2d(torch.nn.ConvTranspose2d):
 
         ###### END OF THE REFERENCE IMPELEMENTATION OF THE INT CONVS IN VCMRS ######
 
+    def _int_params(self, device: torch.device):
+        """scales and float bias of the layer, on the device of the input, cached"""
+        params = self._int_params_cache.get(device)
+        if params is None:
+            params = {
+                "fw": self.fw.to(device).view(-1, 1, 1),
+                "bias": self.float_bias.to(device).view(-1, 1, 1),
+            }
+            self._int_params_cache[device] = params
+        return params
+
     def integer_transposeconv2d(self, x: torch.Tensor):
+        """integer transposed convolution, bit exact with the reference"""
+        _dtype = x.dtype
+        params = self._int_params(x.device)
+
+        fx = _input_scale(x, self.x_scale)
+        out_x = torch.round(fx * x)
+
+        if _exact_accumulation(out_x):
+            if "weight64" not in params:
+                params["weight64"] = self.weight.to(x.device, torch.float64)
+            out_x = F.conv_transpose2d(
+                out_x.double(),
+                params["weight64"],
+                None,
+                self.stride,
+                self.padding,
+                self.output_padding,
+                self.groups,
+                self.dilation,
+            )
+            out_x = out_x.round_().float()
+        else:
+            out_x = super().forward(out_x)
+
+        # x should be all integers, then apply bias in float format
+        out_x = out_x.div_(fx * params["fw"]).add_(params["bias"])
+
+        return out_x.to(_dtype)
+
+    def integer_transposeconv2d_reference(self, x: torch.Tensor):
         _dtype = x.dtype
         _cudnn_enabled = torch.backends.cudnn.enabled
         torch.backends.cudnn.enabled = False
@@ -37,7 +37,7 @@ import torch
 
 from jde.models import Darknet
 from jde.tracker import matching
-from jde.tracker.basetrack import TrackState
+from jde.tracker.basetrack import BaseTrack, TrackState
 from jde.tracker.multitracker import (
     STrack,
     joint_stracks,
@@ -129,6 +129,23 @@ class jde_1088x608(BaseWrapper):
 
         self.frame_id = 0
 
+    def checkpoint_state(self) -> Dict:
+        return {
+            "global_active_tracks": self.global_active_tracks,
+            "global_onhold_tracks": self.global_onhold_tracks,
+            "global_removed_tracks": self.global_removed_tracks,
+            "frame_id": self.frame_id,
+            "track_count": BaseTrack._count,
+        }
+
+    def load_checkpoint_state(self, state: Dict):
+        self.global_active_tracks = state["global_active_tracks"]
+        self.global_onhold_tracks = state["global_onhold_tracks"]
+        self.global_removed_tracks = state["global_removed_tracks"]
+        self.frame_id = state["frame_id"]
+        # track ids continue from where they were
+        BaseTrack._count = state["track_count"]
+
     @staticmethod
     def quantize_weights(model):
         for module_def, module in zip(model.module_defs, model.module_list):
@@ -165,12 +182,13 @@ class jde_1088x608(BaseWrapper):
     @torch.no_grad()
     def _input_to_feature_pyramid(self, x):
         """Computes and return feture pyramid all the way from the input"""
-        img = x[0]["image"].unsqueeze(0).to(self.darknet.device)
+        # a list of same-size frames is processed as a single batch
+        img = torch.stack([d["image"] for d in x]).to(self.darknet.device)
         input_size = tuple(img.shape[2:])
 
         _ = self.darknet(img, self.features_at_splits, is_nn_part1=True)
 
-        return {"data": self.features_at_splits, "input_size": [input_size]}
+        return {"data": self.features_at_splits, "input_size": [input_size] * len(x)}
 
     @torch.no_grad()
     def get_input_size(self, x):
@@ -42,6 +42,7 @@ from mmengine.registry import MODELS, DefaultScope
 from compressai_vision.registry import register_vision_model
 
 from .base_wrapper import BaseWrapper
+from .runtime import Subgraph
 
 __all__ = [
     "rtmo_multi_person_pose_estimation",
@@ -124,7 +125,8 @@ class rtmo_multi_person_pose_estimation(BaseWrapper):
         """Computes deep features at the intermediate layer(s) all the way from the input"""
 
         self.model = self.model.to(device).eval()
-        img = x[0]["image"].unsqueeze(0).to(device)
+        # a list of same-size frames is processed as a single batch
+        img = torch.stack([d["image"] for d in x]).to(device)
         input_size = tuple(img.shape[2:])
 
         if self.split_id == self.SPLIT_BACKBONE:
@@ -133,7 +135,7 @@ class rtmo_multi_person_pose_estimation(BaseWrapper):
             self.logger.error(f"Not supported split point {self.split_id}")
             raise NotImplementedError
 
-        output["input_size"] = [input_size]
+        output["input_size"] = [input_size] * len(x)
         return output
 
     def features_to_output(self, x: Dict, device: str):
@@ -154,7 +156,9 @@ class rtmo_multi_person_pose_estimation(BaseWrapper):
     def _input_to_feature_at_backbone(self, x):
         """Computes and return feature at the backbone outputing two feature tensors all the way from the input"""
 
-        features = self.backbone(x)
+        features = self.run_exported(
+            "nn_part1_backbone", Subgraph(self.backbone, model=self.model), x
+        )
         assert len(self.features_at_splits) == len(features)
 
         for key, val in zip(self.features_at_splits.keys(), features):
@@ -0,0 +1,289 @@
+# Copyright (c) 2022-2024, InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import hashlib
+import logging
+
+from pathlib import Path
+from typing import Callable, Dict
+
+import torch
+import torch.nn as nn
+
+from compressai_vision.utils import thread_budget
+
+__all__ = [
+    "ExportedRuntime",
+    "Subgraph",
+    "weights_digest",
+]
+
+BACKENDS = ["eager", "torchscript", "onnxruntime"]
+
+
+class Subgraph(nn.Module):
+    """nn.Module view of a function over some submodules, so that it can be exported
+
+    The submodules are registered so that their weights are part of the digest.
+    """
+
+    def __init__(self, fn: Callable, **modules):
+        super().__init__()
+        self.fn = fn
+        for name, module in modules.items():
+            self.add_module(name, module)
+
+    def forward(self, *args):
+        return self.fn(*args)
+
+
+class _Flatten(nn.Module):
+    """returns the outputs of a module as a flat tuple of tensors"""
+
+    def __init__(self, module: nn.Module):
+        super().__init__()
+        self.module = module
+
+    def forward(self, *args):
+        return _flat(self.module(*args))
+
+
+def _flat(out):
+    if isinstance(out, dict):
+        return tuple(out.values())
+    if isinstance(out, (tuple, list)):
+        return tuple(out)
+    return (out,)
+
+
+def _unflatten(outputs, structure):
+    if isinstance(structure, list):
+        return dict(zip(structure, outputs))
+    if structure is tuple:
+        return tuple(outputs)
+    return outputs[0]
+
+
+def _structure(out):
+    if isinstance(out, dict):
+        return list(out.keys())
+    if isinstance(out, (tuple, list)):
+        return tuple
+    return None
+
+
+def weights_digest(module: nn.Module) -> str:
+    """hash of the parameters and buffers of a module"""
+    sha = hashlib.sha1()
+    for name, tensor in module.state_dict().items():
+        tensor = tensor.detach().cpu().contiguous()
+        sha.update(f"{name}:{tensor.dtype}:{tuple(tensor.shape)}".encode())
+        sha.update(tensor.view(-1).view(torch.uint8).numpy().tobytes())
+    return sha.hexdigest()
+
+
+class _OnnxSession:
+    def __init__(self, path: Path, intra_op_threads: int):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+
+        self.session = ort.InferenceSession(
+            str(path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def __call__(self, *args):
+        device = args[0].device
+        feeds = {
+            name: arg.detach().cpu().numpy()
+            for name, arg in zip(self.input_names, args)
+        }
+        outputs = self.session.run(None, feeds)
+        return tuple(torch.from_numpy(out).to(device) for out in outputs)
+
+
+class ExportedRuntime:
+    """Runs parts of a vision model as exported, graph-optimized graphs
+
+    A part is traced the first time it is called with given input shapes, with
+    either TorchScript (traced, then frozen and optimized for inference) or
+    ONNX Runtime (CPU execution provider). The graphs are saved to `cache_dir`
+    under a name made of the part name, the hash of its weights and the input
+    shapes, and are reloaded by the next runs instead of being exported again.
+
+    Only tensor-to-tensor computations can be exported. Data-dependent steps,
+    e.g., proposal generation, NMS or tracking, remain in eager mode.
+
+    The first output of every graph is compared with the eager output. When it
+    is not within (atol, rtol), or when the export fails, a warning is logged
+    and the part keeps running in eager mode.
+
+    As graphs are specific to input shapes, at most `max_shapes` graphs are built
+    per part. Beyond, e.g., on datasets of images of various sizes, the new shapes
+    run in eager mode, which is cheaper than exporting a graph for each image.
+    """
+
+    def __init__(
+        self,
+        backend: str = "torchscript",
+        cache_dir: str = "~/.cache/compressai_vision/runtime",
+        intra_op_threads: int = 0,
+        check_equivalence: bool = True,
+        atol: float = 1e-4,
+        rtol: float = 1e-3,
+        model_key: str = "",
+        max_shapes: int = 8,
+    ):
+        assert backend in BACKENDS, f"Unknown runtime backend {backend}"
+
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.backend = backend
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.intra_op_threads = int(intra_op_threads)
+        self.check_equivalence = check_equivalence
+        self.atol = atol
+        self.rtol = rtol
+        self.model_key = model_key
+        self.max_shapes = max_shapes
+
+        # (part name, input shapes) -> (graph or None for eager, output structure)
+        self._graphs: Dict = {}
+        self._digests: Dict = {}
+        self._num_shapes: Dict = {}
+
+    def __call__(self, name: str, module: nn.Module, *args):
+        if self.backend == "eager":
+            return module(*args)
+
+        key = (name,) + tuple((tuple(a.shape), str(a.dtype)) for a in args)
+        if key in self._graphs:
+            graph, structure = self._graphs[key]
+            if graph is None:
+                return module(*args)
+            return _unflatten(graph(*args), structure)
+
+        num_shapes = self._num_shapes.get(name, 0)
+        if num_shapes >= self.max_shapes:
+            if num_shapes == self.max_shapes:
+                self.logger.warning(
+                    f"{name}: more than {self.max_shapes} input shapes, "
+                    "new shapes run in eager mode"
+                )
+                self._num_shapes[name] = num_shapes + 1
+            return module(*args)
+        self._num_shapes[name] = num_shapes + 1
+
+        out = module(*args)
+        graph = self._build(name, module, args)
+        if graph is not None and not self._equivalent(name, graph, args, out):
+            graph = None
+
+        self._graphs[key] = (graph, _structure(out))
+        return out
+
+    def _graph_path(self, name, module, args) -> Path:
+        if name not in self._digests:
+            self._digests[name] = weights_digest(module)
+
+        digest = self._digests[name][:16]
+        shapes = "_".join("x".join(map(str, a.shape)) for a in args)
+        key = hashlib.sha1(
+            f"{self.model_key}:{torch.__version__}:{args[0].device}".encode()
+        ).hexdigest()[:8]
+        ext = "onnx" if self.backend == "onnxruntime" else "pt"
+        return self.cache_dir / f"{name}-{digest}-{key}-{shapes}.{ext}"
+
+    def _build(self, name, module, args):
+        path = self._graph_path(name, module, args)
+        try:
+            if not path.is_file():
+                self._export(_Flatten(module).eval(), args, path)
+                self.logger.info(f"Exported {name} to {path}")
+            return self._load(path, args[0].device)
+        except Exception as e:
+            self.logger.warning(f"Failed to export {name}, running in eager mode: {e}")
+            return None
+
+    def _export(self, module, args, path: Path):
+        tmp = path.with_suffix(f".tmp{path.suffix}")
+        with torch.no_grad():
+            if self.backend == "torchscript":
+                traced = torch.jit.trace(module, args, check_trace=False)
+                frozen = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+                torch.jit.save(frozen, str(tmp))
+            else:
+                assert (
+                    args[0].device.type == "cpu"
+                ), "ONNX Runtime graphs are only run on cpu"
+                torch.onnx.export(
+                    module,
+                    args,
+                    str(tmp),
+                    input_names=[f"input_{i}" for i in range(len(args))],
+                    opset_version=17,
+                    do_constant_folding=True,
+                )
+        tmp.replace(path)
+
+    def _load(self, path: Path, device):
+        if self.backend == "torchscript":
+            return torch.jit.load(str(path), map_location=device)
+        threads = self.intra_op_threads or thread_budget.torch_threads("nn_part1")
+        return _OnnxSession(path, threads)
+
+    def _equivalent(self, name, graph, args, out) -> bool:
+        if not self.check_equivalence:
+            return True
+
+        with torch.no_grad():
+            outputs = graph(*args)
+        expected = _flat(out)
+
+        if len(outputs) != len(expected):
+            self.logger.warning(f"{name}: exported graph outputs do not match")
+            return False
+
+        for exported, eager in zip(outputs, expected):
+            if exported.shape != eager.shape:
+                self.logger.warning(f"{name}: exported graph outputs do not match")
+                return False
+            if not torch.allclose(exported, eager, atol=self.atol, rtol=self.rtol):
+                diff = (exported - eager).abs().max().item()
+                self.logger.warning(
+                    f"{name}: exported graph is not equivalent to eager mode "
+                    f"(max abs diff {diff}), running in eager mode"
+                )
+                return False
+
+        return True
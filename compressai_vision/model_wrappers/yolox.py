@@ -40,6 +40,7 @@ from yolox.utils import postprocess
 from compressai_vision.registry import register_vision_model
 
 from .base_wrapper import BaseWrapper
+from .runtime import Subgraph
 from .split_squeezes import squeeze_yolox
 
 __all__ = [
@@ -155,7 +156,8 @@ class yolox_darknet53(BaseWrapper):
         """Computes deep features at the intermediate layer(s) all the way from the input"""
 
         self.model = self.model.to(device).eval()
-        img = x[0]["image"].unsqueeze(0).to(device)
+        # a list of same-size frames is processed as a single batch
+        img = torch.stack([d["image"] for d in x]).to(device)
         input_size = tuple(img.shape[2:])
 
         if self.split_id == self.SPLIT_L13:
@@ -166,7 +168,7 @@ class yolox_darknet53(BaseWrapper):
             self.logger.error(f"Not supported split point {self.split_id}")
             raise NotImplementedError
 
-        output["input_size"] = [input_size]
+        output["input_size"] = [input_size] * len(x)
         return output
 
     def features_to_output(self, x: Dict, device: str):
@@ -191,9 +193,9 @@ class yolox_darknet53(BaseWrapper):
     def _input_to_feature_at_l13(self, x, device):
         """Computes and return feature at layer 13 with leaky relu all the way from the input"""
 
-        y = self.backbone.stem(x)
-        y = self.backbone.dark2(y)
-        y = self.backbone.dark3[0](y)
+        y = self.run_exported(
+            "nn_part1_l13", Subgraph(self._input_to_l13, model=self.model), x
+        )
 
         if not self.squeeze_at_split_enabled:
             self.features_at_splits[self.SPLIT_L13] = y
@@ -208,9 +210,9 @@ class yolox_darknet53(BaseWrapper):
     def _input_to_feature_at_l37(self, x, device):
         """Computes and return feature at layer 37 with 11th residual layer output all the way from the input"""
 
-        y = self.backbone.stem(x)
-        y = self.backbone.dark2(y)
-        y = self.backbone.dark3(y)
+        y = self.run_exported(
+            "nn_part1_l37", Subgraph(self._input_to_l37, model=self.model), x
+        )
         self.features_at_splits[self.SPLIT_L37] = y
 
         return {"data": self.features_at_splits}
@@ -238,26 +240,9 @@ class yolox_darknet53(BaseWrapper):
             smodel = self.squeeze_model.to(device)
             y = smodel.expand_(y)
 
-        for proc_module in self.backbone.dark3[1:]:
-            y = proc_module(y)
-
-        fp_lvl2 = y
-        fp_lvl1 = self.backbone.dark4(fp_lvl2)
-        fp_lvl0 = self.backbone.dark5(fp_lvl1)
-
-        # yolo branch 1
-        b1_in = self.yolo_fpn.out1_cbl(fp_lvl0)
-        b1_in = self.yolo_fpn.upsample(b1_in)
-        b1_in = torch.cat([b1_in, fp_lvl1], 1)
-        fp_lvl1 = self.yolo_fpn.out1(b1_in)
-
-        # yolo branch 2
-        b2_in = self.yolo_fpn.out2_cbl(fp_lvl1)
-        b2_in = self.yolo_fpn.upsample(b2_in)
-        b2_in = torch.cat([b2_in, fp_lvl2], 1)
-        fp_lvl2 = self.yolo_fpn.out2(b2_in)
-
-        outputs = self.head((fp_lvl2, fp_lvl1, fp_lvl0))
+        outputs = self.run_exported(
+            "nn_part2_l13", Subgraph(self._l13_to_head, model=self.model), y
+        )
 
         pred = postprocess(outputs, self.num_classes, self.conf_thres, self.nms_thres)
 
@@ -280,7 +265,33 @@ class yolox_darknet53(BaseWrapper):
 
         """
 
-        fp_lvl2 = x[self.SPLIT_L37]
+        outputs = self.run_exported(
+            "nn_part2_l37",
+            Subgraph(self._l37_to_head, model=self.model),
+            x[self.SPLIT_L37],
+        )
+
+        pred = postprocess(outputs, self.num_classes, self.conf_thres, self.nms_thres)
+
+        return pred
+
+    def _input_to_l13(self, x):
+        y = self.backbone.stem(x)
+        y = self.backbone.dark2(y)
+        return self.backbone.dark3[0](y)
+
+    def _input_to_l37(self, x):
+        y = self.backbone.stem(x)
+        y = self.backbone.dark2(y)
+        return self.backbone.dark3(y)
+
+    def _l13_to_head(self, y):
+        for proc_module in self.backbone.dark3[1:]:
+            y = proc_module(y)
+
+        return self._l37_to_head(y)
+
+    def _l37_to_head(self, fp_lvl2):
         fp_lvl1 = self.backbone.dark4(fp_lvl2)
         fp_lvl0 = self.backbone.dark5(fp_lvl1)
 
@@ -298,9 +309,7 @@ class yolox_darknet53(BaseWrapper):
 
         outputs = self.head((fp_lvl2, fp_lvl1, fp_lvl0))
 
-        pred = postprocess(outputs, self.num_classes, self.conf_thres, self.nms_thres)
-
-        return pred
+        return outputs
 
     @torch.no_grad()
     def forward(self, x):
@@ -27,9 +27,15 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
 # ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from .multitask_inference import MultiTaskInference
-from .remote_inference import ImageRemoteInference, VideoRemoteInference
-from .split_inference import ImageSplitInference, VideoSplitInference
+import importlib
+
+_LAZY_ATTRS = {
+    "MultiTaskInference": ".multitask_inference",
+    "ImageRemoteInference": ".remote_inference",
+    "VideoRemoteInference": ".remote_inference",
+    "ImageSplitInference": ".split_inference",
+    "VideoSplitInference": ".split_inference",
+}
 
 __all__ = [
     "VideoRemoteInference",
@@ -38,3 +44,10 @@ __all__ = [
     "ImageSplitInference",
     "MultiTaskInference",
 ]
+
+
+def __getattr__(name):
+    # submodules are imported on first access only, see compressai_vision.registry
+    if name in _LAZY_ATTRS:
+        return getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -34,7 +34,7 @@ import os
 
 from enum import Enum
 from pathlib import Path
-from typing import Callable, Dict
+from typing import Callable, Dict, Iterable, List
 from uuid import uuid4 as uuid
 
 import torch
@@ -45,10 +45,19 @@ from torch import Tensor
 
 from compressai_vision.codecs.utils import (
     MIN_MAX_DATASET,
-    min_max_inv_normalization,
-    min_max_normalization,
+    dequantize_feature_levels,
+    packed_feature_dtype,
+    quantize_feature_levels,
 )
+from compressai_vision.datasets import BackgroundPrefetcher
 from compressai_vision.model_wrappers import BaseWrapper
+from compressai_vision.utils import CodedResults, thread_budget, tracer
+from compressai_vision.utils.measure_complexity import ComplexityCache
+
+from .checkpoint import PipelineCheckpoint
+
+# 1: 16-bit features as lsb/msb uint8 pairs, 2: native uint16
+FEATURE_DUMP_FORMAT = 2
 
 
 class Parts(Enum):
@@ -102,6 +111,8 @@ class BasePipeline(nn.Module):
 
     def init_time_measure(self):
         self.elapsed_time = {"nn_part_1": 0, "encode": 0, "decode": 0, "nn_part_2": 0}
+        # input prefetching statistics other than times, see add_prefetch_details
+        self.prefetch_details = {}
 
     def update_time_elapsed(self, mname, elapsed):
         assert mname in self.elapsed_time
@@ -121,6 +132,12 @@ class BasePipeline(nn.Module):
             "nn_part_2": 0,
         }
 
+    def _create_complexity_cache(self, vision_model: BaseWrapper):
+        cache_dir = self.configs["codec"].get("complexity_cache_dir", None)
+        if not self.is_mac_calculation or not cache_dir:
+            return None
+        return ComplexityCache(cache_dir, vision_model)
+
     def add_kmac_and_pixels_info(self, mname, kmac, pixels):
         assert mname in self.kmacs
         self.kmacs[mname] = kmac
@@ -145,6 +162,21 @@ class BasePipeline(nn.Module):
             for k, v in self.kmacs.items()
         }
 
+    def _prefetched(self, dataloader: Iterable) -> Iterable:
+        """decodes and maps the next samples in background while NN Part 1 runs, if enabled"""
+        depth = self.configs["nn_task_part1"].get("prefetch_depth", 0)
+        if not depth:
+            return dataloader
+        return BackgroundPrefetcher(dataloader, depth, self.device_nn_part1)
+
+    def add_prefetch_details(self, loader: Iterable):
+        if not isinstance(loader, BackgroundPrefetcher):
+            return
+        self.elapsed_time["input_stall"] = loader.stall_time
+        # not a time, kept out of the timings (and of their sums)
+        self.prefetch_details["input_queue_depth"] = loader.mean_queue_depth
+        self.logger.info(f"Mean input queue depth: {loader.mean_queue_depth:.2f}")
+
     def add_time_details(self, mname: str, details):
         updates = {}
         for k, v in self.elapsed_time.items():
@@ -226,27 +258,24 @@ class BasePipeline(nn.Module):
                 datacatalog_name in list(MIN_MAX_DATASET.keys())
             ), f"{datacatalog_name} does not exist in the pre-computed minimum and maximum tables"
             minv, maxv = MIN_MAX_DATASET[datacatalog_name]
-            data_features = {}
-            for key, data in features["data"].items():
-                assert (
-                    data.min() >= minv and data.max() <= maxv
-                ), f"{data.min()} should be greater than {minv} and {data.max()} should be less than {maxv}"
-                out, _ = min_max_normalization(data, minv, maxv, bitdepth=n_bits)
-
-                if n_bits <= 8:
-                    data_features[key] = out.to(torch.uint8)
-                elif n_bits <= 16:
-                    data_features[key] = {
-                        "lsb": torch.bitwise_and(
-                            out.to(torch.int32), torch.tensor(0xFF)
-                        ).to(torch.uint8),
-                        "msb": torch.bitwise_and(
-                            torch.bitwise_right_shift(out.to(torch.int32), 8),
-                            torch.tensor(0xFF),
-                        ).to(torch.uint8),
+
+            if packed_feature_dtype(n_bits) is not None:
+                data_features = quantize_feature_levels(
+                    features["data"], minv, maxv, n_bits
+                )
+                output_features["dump_format"] = FEATURE_DUMP_FORMAT
+            else:
+                # no native uint16, 16-bit codes are split into lsb/msb bytes
+                codes = quantize_feature_levels(
+                    features["data"], minv, maxv, n_bits, dtype=torch.int32
+                )
+                data_features = {
+                    key: {
+                        "lsb": torch.bitwise_and(out, 0xFF).to(torch.uint8),
+                        "msb": torch.bitwise_right_shift(out, 8).to(torch.uint8),
                     }
-                else:
-                    raise NotImplementedError
+                    for key, out in codes.items()
+                }
         else:
             raise NotImplementedError
 
@@ -255,6 +284,11 @@ class BasePipeline(nn.Module):
 
     @staticmethod
     def _post_process_loaded_features(features, n_bits, datacatalog_name):
+        # dumps without a format are the legacy ones (lsb/msb bytes for 16 bits)
+        dump_format = features.pop("dump_format", 1)
+        if dump_format > FEATURE_DUMP_FORMAT:
+            raise NotImplementedError(f"unknown feature dump format {dump_format}")
+
         if n_bits == -1:
             assert "data" in features
         elif n_bits >= 8:
@@ -265,24 +299,15 @@ class BasePipeline(nn.Module):
                 datacatalog_name in list(MIN_MAX_DATASET.keys())
             ), f"{datacatalog_name} does not exist in the pre-computed minimum and maximum tables"
             minv, maxv = MIN_MAX_DATASET[datacatalog_name]
-            data_features = {}
-            for key, data in features["data"].items():
-                if n_bits <= 8:
-                    out = min_max_inv_normalization(data, minv, maxv, bitdepth=n_bits)
-                    data_features[key] = out.to(torch.float32)
-                elif n_bits <= 16:
-                    lsb_part = data["lsb"].to(torch.int32)
-                    msb_part = torch.bitwise_left_shift(data["msb"].to(torch.int32), 8)
-                    recovery = (msb_part + lsb_part).to(torch.float32)
-
-                    out = min_max_inv_normalization(
-                        recovery, minv, maxv, bitdepth=n_bits
-                    )
-                    data_features[key] = out.to(torch.float32)
-                else:
-                    raise NotImplementedError
 
-            features["data"] = data_features
+            data = features["data"]
+            if dump_format == 1 and n_bits == 16:
+                data = {
+                    key: torch.bitwise_left_shift(v["msb"].to(torch.int32), 8)
+                    + v["lsb"]
+                    for key, v in data.items()
+                }
+            features["data"] = dequantize_feature_levels(data, minv, maxv, n_bits)
         else:
             raise NotImplementedError
 
@@ -296,52 +321,133 @@ class BasePipeline(nn.Module):
         datacatalog_name=None,
     ):
         # run NN Part 1 or load pre-computed features
-        feature_dir = self.configs["nn_task_part1"].feature_dir
+        with tracer.span("nn_part_1", frame=seq_name), thread_budget.phase("nn_part1"):
+            feature_dir = self.configs["nn_task_part1"].feature_dir
+
+            features_file = f"{feature_dir}/{seq_name}{self._output_ext}"
+
+            if (
+                self.configs["nn_task_part1"].load_features
+                or self.configs["nn_task_part1"].load_features_when_available
+            ):
+                if Path(features_file).is_file():
+                    self.logger.debug(f"loading features: {features_file}")
+                    # features = torch.load(features_file)
+                    features = torch.load(
+                        features_file, map_location=self.device_nn_part1
+                    )
+                    features = self._post_process_loaded_features(
+                        features,
+                        self.configs["nn_task_part1"].load_features_n_bits,
+                        datacatalog_name,
+                    )
+                else:
+                    if self.configs["nn_task_part1"].load_features:
+                        raise FileNotFoundError(
+                            errno.ENOENT, os.strerror(errno.ENOENT), features_file
+                        )
+                    else:
+                        features = vision_model.input_to_features(
+                            x, self.device_nn_part1
+                        )
+                        self._dump_features(features, seq_name, datacatalog_name)
+            else:
+                features = vision_model.input_to_features(x, self.device_nn_part1)
+                self._dump_features(features, seq_name, datacatalog_name)
 
-        features_file = f"{feature_dir}/{seq_name}{self._output_ext}"
+        return features
 
+    def _from_inputs_to_features(
+        self,
+        vision_model: BaseWrapper,
+        xs: List,
+        seq_names: List[str],
+        datacatalog_name=None,
+    ) -> List[Dict]:
+        """runs NN Part 1 on a group of same-size inputs at once and returns the features of each frame"""
         if (
-            self.configs["nn_task_part1"].load_features
+            len(xs) == 1
+            or self.configs["nn_task_part1"].load_features
             or self.configs["nn_task_part1"].load_features_when_available
         ):
-            if Path(features_file).is_file():
-                self.logger.debug(f"loading features: {features_file}")
-                # features = torch.load(features_file)
-                features = torch.load(features_file, map_location=self.device_nn_part1)
-                features = self._post_process_loaded_features(
-                    features,
-                    self.configs["nn_task_part1"].load_features_n_bits,
-                    datacatalog_name,
+            return [
+                self._from_input_to_features(
+                    vision_model, x, seq_name, datacatalog_name
                 )
-            else:
-                if self.configs["nn_task_part1"].load_features:
-                    raise FileNotFoundError(
-                        errno.ENOENT, os.strerror(errno.ENOENT), features_file
-                    )
-                else:
-                    features = vision_model.input_to_features(x, self.device_nn_part1)
-                    if self.configs["nn_task_part1"].dump_features:
-                        self._create_folder(feature_dir)
-                        self.logger.debug(f"dumping features in: {feature_dir}")
-                        features_to_dump = self._prep_features_to_dump(
-                            features,
-                            self.configs["nn_task_part1"].dump_features_n_bits,
-                            datacatalog_name,
-                        )
-                        torch.save(features_to_dump, features_file)
-        else:
-            features = vision_model.input_to_features(x, self.device_nn_part1)
-            if self.configs["nn_task_part1"].dump_features:
-                self._create_folder(feature_dir)
-                self.logger.debug(f"dumping features in: {feature_dir}")
-                features_to_dump = self._prep_features_to_dump(
-                    features,
-                    self.configs["nn_task_part1"].dump_features_n_bits,
-                    datacatalog_name,
+                for x, seq_name in zip(xs, seq_names)
+            ]
+
+        with tracer.span("nn_part_1", frames=",".join(seq_names)):
+            with thread_budget.phase("nn_part1"):
+                features = vision_model.input_to_features(
+                    [x[0] for x in xs], self.device_nn_part1
                 )
-                torch.save(features_to_dump, features_file)
+        features_list = self._split_batched_features(features, len(xs))
+        for features, seq_name in zip(features_list, seq_names):
+            self._dump_features(features, seq_name, datacatalog_name)
 
-        return features
+        return features_list
+
+    def _dump_features(self, features: Dict, seq_name: str, datacatalog_name=None):
+        if not self.configs["nn_task_part1"].dump_features:
+            return
+
+        feature_dir = self.configs["nn_task_part1"].feature_dir
+        features_file = f"{feature_dir}/{seq_name}{self._output_ext}"
+
+        self._create_folder(feature_dir)
+        self.logger.debug(f"dumping features in: {feature_dir}")
+        with tracer.span("dump_features", frame=seq_name):
+            features_to_dump = self._prep_features_to_dump(
+                features,
+                self.configs["nn_task_part1"].dump_features_n_bits,
+                datacatalog_name,
+            )
+            torch.save(features_to_dump, features_file)
+
+    @staticmethod
+    def _split_batched_features(features: Dict, nb_frames: int) -> List[Dict]:
+        """splits batched NN Part 1 outputs into the usual per-frame feature dicts"""
+        assert len(features["input_size"]) == nb_frames
+
+        def frame(v, i):
+            # copied, as views of the batch keep (and torch.save writes) all of it
+            return v[i : i + 1].clone() if nb_frames > 1 else v
+
+        return [
+            {
+                **features,
+                "data": {k: frame(v, i) for k, v in features["data"].items()},
+                "input_size": [features["input_size"][i]],
+            }
+            for i in range(nb_frames)
+        ]
+
+    @staticmethod
+    def _same_size_groups(
+        dataloader: Iterable, batch_size: int = 1, start: int = 0, end: int = None
+    ):
+        """groups consecutive samples of the same input size, up to batch_size, in loader order
+
+        Yields lists of (frame index, sample) pairs, frames before start or from end on are dropped.
+        """
+        group = []
+        for e, d in enumerate(dataloader):
+            if e < start:
+                continue
+            if end is not None and e >= end:
+                break
+
+            if group and (
+                len(group) == batch_size
+                or group[-1][1][0]["image"].shape != d[0]["image"].shape
+            ):
+                yield group
+                group = []
+            group.append((e, d))
+
+        if group:
+            yield group
 
     def _from_features_to_output(
         self, vision_model: BaseWrapper, x: Dict, seq_name: str = None
@@ -375,7 +481,8 @@ class BasePipeline(nn.Module):
             for k, v in zip(vision_model.split_layer_list, x["data"].values())
         }
 
-        results = vision_model.features_to_output(x, self.device_nn_part2)
+        with tracer.span("nn_part_2", frame=seq_name), thread_budget.phase("nn_part2"):
+            results = vision_model.features_to_output(x, self.device_nn_part2)
         if self.configs["nn_task_part2"].dump_results:
             self._create_folder(output_results_dir)
             torch.save(results, results_file)
@@ -417,21 +524,23 @@ class BasePipeline(nn.Module):
         filename: str,
         remote_inference=False,
     ):
-        if self._get_title(codec).lower() == "fctm":
-            return codec.encode(
-                x,
-                codec_output_dir,
-                bitstream_name,
-                filename,
-            )
+        with tracer.span("encode", codec=self._get_title(codec), frame=filename):
+            with thread_budget.phase("encode"):
+                if self._get_title(codec).lower() == "fctm":
+                    return codec.encode(
+                        x,
+                        codec_output_dir,
+                        bitstream_name,
+                        filename,
+                    )
 
-        return codec.encode(
-            x,
-            codec_output_dir,
-            bitstream_name,
-            filename,
-            remote_inference=remote_inference,
-        )
+                return codec.encode(
+                    x,
+                    codec_output_dir,
+                    bitstream_name,
+                    filename,
+                    remote_inference=remote_inference,
+                )
 
     def _decompress(
         self,
@@ -443,21 +552,23 @@ class BasePipeline(nn.Module):
         remote_inference=False,
         vcm_mode=False,
     ):
-        if self._get_title(codec).lower() == "fctm":
-            return codec.decode(
-                bitstream,
-                codec_output_dir,
-                filename,
-            )
+        with tracer.span("decode", codec=self._get_title(codec), frame=filename):
+            with thread_budget.phase("decode"):
+                if self._get_title(codec).lower() == "fctm":
+                    return codec.decode(
+                        bitstream,
+                        codec_output_dir,
+                        filename,
+                    )
 
-        return codec.decode(
-            bitstream,
-            codec_output_dir,
-            filename,
-            org_img_size=org_img_size,
-            remote_inference=remote_inference,
-            vcm_mode=vcm_mode,
-        )
+                return codec.decode(
+                    bitstream,
+                    codec_output_dir,
+                    filename,
+                    org_img_size=org_img_size,
+                    remote_inference=remote_inference,
+                    vcm_mode=vcm_mode,
+                )
 
     def _evaluation(self, evaluator: Callable) -> Dict:
         save_path = None
@@ -465,10 +576,49 @@ class BasePipeline(nn.Module):
             save_path = self._create_folder(self.configs["evaluation"].evaluation_dir)
 
         if evaluator:
-            return evaluator.results(save_path)
+            with tracer.span("evaluator_results", cat="evaluation"):
+                return evaluator.results(save_path)
 
         return None
 
+    def _create_checkpoint(self) -> PipelineCheckpoint:
+        conf = self.configs.get("checkpoint", None) or {}
+        checkpoint_dir = conf.get("checkpoint_dir", None) or (
+            self.codec_output_dir / f"{self.bitstream_name}_checkpoint"
+        )
+        return PipelineCheckpoint(
+            checkpoint_dir, conf.get("interval", 0), conf.get("resume", False)
+        )
+
+    def _progress_state(
+        self,
+        next_frame: int,
+        output_list: CodedResults,
+        evaluator,
+        vision_model,
+        **extra,
+    ) -> Dict:
+        return {
+            "next_frame": next_frame,
+            "output_list": output_list,
+            "evaluator": evaluator.checkpoint_state() if evaluator else None,
+            "vision_model": vision_model.checkpoint_state(),
+            "elapsed_time": self.elapsed_time,
+            "kmacs": self.kmacs,
+            "pixels": self.pixels,
+            **extra,
+        }
+
+    def _restore_progress(self, progress: Dict, evaluator, vision_model) -> Dict:
+        if evaluator:
+            evaluator.load_checkpoint_state(progress["evaluator"])
+        vision_model.load_checkpoint_state(progress["vision_model"])
+        self.elapsed_time = progress["elapsed_time"]
+        self.kmacs = progress["kmacs"]
+        self.pixels = progress["pixels"]
+        self.logger.info(f"Resuming at frame {progress['next_frame']}")
+        return progress
+
     def _create_folder(self, dir: Path = None) -> Path:
         if dir is None:
             uid = str(uuid())
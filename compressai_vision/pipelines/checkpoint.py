@@ -0,0 +1,107 @@
+# Copyright (c) 2022-2024, InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import logging
+import os
+
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import torch
+
+__all__ = ["PipelineCheckpoint"]
+
+
+class PipelineCheckpoint:
+    """
+    Progress of a video pipeline run, saved periodically to resume it after a failure.
+
+    Two files are kept in the checkpoint directory:
+
+    - decoded.pt: the decoded features (or frames) and the bitstream information,
+      written once after decoding
+    - progress.pt: the index of the next frame to be processed by NN part 2 and the
+      evaluator, the outputs so far, the partial states of the evaluator and of the
+      vision model (e.g., tracks), and the elapsed times, written every `interval`
+      frames
+
+    Files are written to a temporary file first and then renamed, so an interruption
+    while saving leaves the previous checkpoint intact. With `resume`, a run continues
+    from the last checkpoint instead of starting over. Both files are removed once the
+    run has completed.
+    """
+
+    DECODED = "decoded.pt"
+    PROGRESS = "progress.pt"
+
+    def __init__(self, checkpoint_dir: str, interval: int = 0, resume: bool = False):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.interval = int(interval)
+        self.resume = bool(resume)
+
+        if self.enabled:
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0 or self.resume
+
+    def _save(self, name: str, state: Any):
+        path = self.checkpoint_dir / name
+        tmp = path.with_suffix(".tmp")
+        torch.save(state, tmp)
+        os.replace(tmp, path)
+
+    def _load(self, name: str) -> Optional[Any]:
+        path = self.checkpoint_dir / name
+        if not self.resume or not path.is_file():
+            return None
+        self.logger.info(f"Resuming from {path}")
+        return torch.load(path, map_location="cpu", weights_only=False)
+
+    def load_decoded(self) -> Optional[Dict]:
+        return self._load(self.DECODED)
+
+    def save_decoded(self, state: Dict):
+        if self.enabled:
+            self._save(self.DECODED, state)
+
+    def load_progress(self) -> Optional[Dict]:
+        return self._load(self.PROGRESS)
+
+    def is_due(self, nb_done: int) -> bool:
+        return self.interval > 0 and nb_done % self.interval == 0
+
+    def save_progress(self, state: Dict):
+        self._save(self.PROGRESS, state)
+
+    def clear(self):
+        for name in [self.DECODED, self.PROGRESS]:
+            (self.checkpoint_dir / name).unlink(missing_ok=True)
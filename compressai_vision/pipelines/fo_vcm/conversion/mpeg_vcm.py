@@ -71,6 +71,24 @@ import shutil
 
 from pathlib import Path
 
+from compressai_vision.utils.manifest import FileManifest, run_conversions
+
+
+def copyTree(src_dir, target_dir, manifest, num_workers=None):
+    """Copies all files of src_dir to target_dir on a process pool
+
+    Files recorded in the manifest as already copied from the same source are skipped.
+    """
+    jobs = []
+    for root, _, files in os.walk(src_dir):
+        target_root = os.path.join(target_dir, os.path.relpath(root, src_dir))
+        os.makedirs(target_root, exist_ok=True)
+        for fname in files:
+            src = os.path.join(root, fname)
+            target = os.path.join(target_root, fname)
+            jobs.append((target, [src], (src, target)))
+    return run_conversions(shutil.copy2, jobs, manifest, num_workers)
+
 
 def imageIdFileList(*args):
     """Just list arguments of .lst files.  They will be combined together.
@@ -114,6 +132,7 @@ def MPEGVCMToOpenImageV6(  # noqa: C901
     link=True,
     verbose=False,
     append_mask_dir=None,
+    num_workers=None,
 ):
     """From MPEG/VCM input file format to proper OpenImageV6 format
 
@@ -125,6 +144,7 @@ def MPEGVCMToOpenImageV6(  # noqa: C901
     :param data_dir: Source directory where the image jpg files are.  Use the standard OpenImageV6 directory.
     :param mask_dir: Source directory where the mask png files are.  Use the standard OpenImageV6 directory.
     :param link: True (default): create a softlink from source data_dir to target data_dir.  False: copy all images to target.
+    :param num_workers: Number of processes copying the images when link is False.  Default: one per cpu.  Copied images are recorded in ``output_directory/copy_manifest.json`` so that an interrupted copy resumes.
 
     More details on the conversion follow
 
@@ -566,7 +586,8 @@ def MPEGVCMToOpenImageV6(  # noqa: C901
                 target_data_dir,
                 "this might take a while..",
             )
-        shutil.copytree(data_dir, target_data_dir)
+        manifest = FileManifest(os.path.join(output_directory, "copy_manifest.json"))
+        copyTree(data_dir, target_data_dir, manifest, num_workers)
         if segmentation_csv_file is not None:
             if verbose:
                 print(
@@ -576,6 +597,6 @@ def MPEGVCMToOpenImageV6(  # noqa: C901
                     target_mask_dir,
                     "this might take a while..",
                 )
-            shutil.copytree(mask_dir, target_mask_dir)
+            copyTree(mask_dir, target_mask_dir, manifest, num_workers)
 
     print("DONE!")
@@ -2,11 +2,15 @@ import csv
 import glob
 import os
 import re
+import shlex
+import subprocess
 
 from pathlib import Path
 
 import fiftyone as fo
 
+from compressai_vision.utils.manifest import FileManifest, run_conversions
+
 # pick your choice..
 # container_format = "y4m"  # yuv @ y4m
 container_format = "mp4"  # lossless H264 @ mp4 # USE THIS!
@@ -38,7 +42,12 @@ classmap = {  # COCO-compatible
 }
 
 
-def video_convert(basedir):
+def _run_command(st):
+    print(st)
+    subprocess.run(shlex.split(st), check=True)
+
+
+def video_convert(basedir, num_workers=None, verify=False):
     """Converts video from YUV to lossless RAW@MP4
 
     Assumes this directory structure:
@@ -68,10 +77,16 @@ def video_convert(basedir):
     VP9 format.
 
     Same thing for all .yuv files found in the directory tree
+
+    The conversions run on num_workers processes (default: one per cpu).  The
+    converted files are recorded in ``basedir/video_convert_manifest.json`` and
+    skipped by later runs when unchanged (size & modification time, and md5 with
+    verify=True), so that an interrupted conversion resumes where it stopped.
     """
     r = re.compile(r"^(.*)\_(\d*)x(\d*)\_(\d*).*\.yuv")
     print("finding .yuv files from", basedir)
     foundsome = False
+    jobs = []
     for path in glob.glob(os.path.join(basedir, "*", "*.yuv")):
         foundsome = True
         # print(path) # /home/sampsa/silo/interdigital/mock2/ClassA/BQTerrace_1920x1080_60Hz_8bit_P420.yuv
@@ -121,19 +136,12 @@ def video_convert(basedir):
             st = "ffmpeg -y -f rawvideo -pixel_format yuv420p -video_size {x}x{y} -i {input} -an -c:v copy -q 0 {output}".format(
                 x=x, y=y, input=path, output=output
             )
-        """
-        if os.path.exists(output):
-            print(
-                "\nWARNING: converted video file",
-                output,
-                "exists already.  Will skip conversion.  Remove manually if needed\n",
-            )
-        else:
-        """
-        print(st)
-        os.system(st)
+        jobs.append((output, [path], (st,)))
     if not foundsome:
         print("could not find any .yuv files: check your directory & file structure")
+
+    manifest = FileManifest(os.path.join(basedir, "video_convert_manifest.json"))
+    run_conversions(_run_command, jobs, manifest, num_workers, verify)
     print("video conversion done")
 
 
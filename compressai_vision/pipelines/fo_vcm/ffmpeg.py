@@ -27,13 +27,115 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
 # ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-import io
+import re
 import shlex
 import subprocess
+import tempfile
+import threading
+
+from collections import OrderedDict
 
 import numpy as np
 
-from PIL import Image
+# filters that are plain copies of pixels, run in numpy (bit exact with ffmpeg)
+_PAD_OP = re.compile(r"pad=ceil\(iw/(\d+)\)\*\1:ceil\(ih/\1\)\*\1")
+_CROP_OP = re.compile(r"crop=(\d+):(\d+):0:0")
+
+
+def pad_rgb(rgb_image: np.array, multiple: int) -> np.array:
+    """same as -vf "pad=ceil(iw/S)*S:ceil(ih/S)*S" (black borders at right/bottom)"""
+    h, w = rgb_image.shape[:2]
+    H = -(-h // multiple) * multiple
+    W = -(-w // multiple) * multiple
+    return np.pad(rgb_image, ((0, H - h), (0, W - w), (0, 0)))
+
+
+def crop_rgb(rgb_image: np.array, width: int, height: int) -> np.array:
+    """same as -vf "crop=width:height:0:0" """
+    return np.ascontiguousarray(rgb_image[:height, :width])
+
+
+def raw_frame_size(form, width, height) -> int:
+    """number of bytes of a raw frame in a yuv420p(10le) or rgb24 pixel format"""
+    if form == "rgb24":
+        return width * height * 3
+    assert form in ("yuv420p", "yuv420p10le"), f"unsupported pixel format {form}"
+    n_samples = width * height + 2 * (-(-width // 2) * -(-height // 2))
+    return n_samples * (2 if form.endswith("10le") else 1)
+
+
+class _FFMpegWorker:
+    """A long-lived ffmpeg process converting raw frames of a fixed size
+
+    Frames are written to stdin and the outputs read from stdout, one at a time.
+    With output_size=None, the output is a ppm stream and the size of each output
+    frame is read from its header.
+    """
+
+    def __init__(self, comm, output_size=None):
+        self.output_size = output_size
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            shlex.split(comm),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=self.stderr,
+        )
+
+    def __call__(self, frame: bytes):
+        # write from a thread, so that ffmpeg never blocks on a full stdout pipe
+        writer = threading.Thread(target=self._write, args=(frame,))
+        writer.start()
+        try:
+            if self.output_size is None:
+                out = self._read_ppm()
+            else:
+                out = self._read(self.output_size)
+        finally:
+            writer.join()
+        return out
+
+    def _write(self, frame: bytes):
+        try:
+            self.process.stdin.write(frame)
+            self.process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            pass  # the process died, reported by the reader
+
+    def _read(self, size: int):
+        data = self.process.stdout.read(size)
+        if len(data) != size:
+            return None
+        return data
+
+    def _read_ppm(self):
+        # ffmpeg ppm encoder header: "P6\n{width} {height}\n255\n"
+        header = [self.process.stdout.readline() for _ in range(3)]
+        if header[0] != b"P6\n":
+            return None
+        width, height = map(int, header[1].split())
+        data = self._read(width * height * 3)
+        if data is None:
+            return None
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3).copy()
+
+    def errors(self) -> str:
+        self.stderr.seek(0)
+        return self.stderr.read().decode("utf-8")
+
+    def close(self):
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process.stdout.close()
+        self.stderr.close()
 
 
 class FFMpeg:
@@ -41,39 +143,78 @@ class FFMpeg:
 
     :param ffmpeg: the ffmpeg command
     :param logger: a logger instance
+    :param max_workers: number of ffmpeg processes kept alive
 
-    TODO: for reading video, define video input, keep ffmpeg process alive & stream into stdin
+    The padding and cropping filters are done in numpy. The other conversions run in
+    long-lived ffmpeg processes fed with raw frames, one per filter graph and input
+    size (the least recently used ones are closed beyond max_workers), so that no
+    process is spawned and no image is PNG-coded per call.
     """
 
-    def __init__(self, ffmpeg, logger):
+    def __init__(self, ffmpeg, logger, max_workers=4):
         self.ffmpeg = ffmpeg
         self.logger = logger
+        self.max_workers = max_workers
+        self.workers = OrderedDict()
+
+    def _worker(self, comm, output_size=None) -> _FFMpegWorker:
+        worker = self.workers.get(comm)
+        if worker is not None:
+            self.workers.move_to_end(comm)
+            return worker
+
+        self.logger.debug(comm)
+        worker = self.workers[comm] = _FFMpegWorker(comm, output_size)
+        while len(self.workers) > self.max_workers:
+            _, oldest = self.workers.popitem(last=False)
+            oldest.close()
+        return worker
+
+    def _run(self, comm, frame: bytes, output_size=None):
+        worker = self._worker(comm, output_size)
+        out = worker(frame)
+        if out is None:
+            self.logger.fatal("ffmpeg failed with %s", worker.errors())
+            del self.workers[comm]
+            worker.close()
+        return out
+
+    def close(self):
+        """terminates the ffmpeg processes"""
+        while self.workers:
+            _, worker = self.workers.popitem()
+            worker.close()
+
+    def __del__(self):
+        if hasattr(self, "workers"):
+            self.close()
+
+    def __getstate__(self):
+        # the processes stay with the instance that started them
+        state = self.__dict__.copy()
+        state["workers"] = OrderedDict()
+        return state
 
     def ff_op(self, rgb_image: np.array, op) -> np.array:
         """takes as an input a numpy RGB array (y,x,3)
 
         Outputs numpy RGB array after certain transformation
         """
-        pil_img = Image.fromarray(rgb_image)
-        f = io.BytesIO()
-        pil_img.save(f, format="png")
+        pad = _PAD_OP.fullmatch(op)
+        if pad is not None:
+            return pad_rgb(rgb_image, int(pad.group(1)))
 
-        comm = '{ffmpeg} -y -hide_banner -loglevel error -i pipe: -vf "{op}" -f apng pipe:'.format(
-            ffmpeg=self.ffmpeg, op=op
-        )
-        self.logger.debug(comm)
-        args = shlex.split(comm)
-        p = subprocess.Popen(
-            args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        height, width = rgb_image.shape[:2]
+        crop = _CROP_OP.fullmatch(op)
+        if crop is not None:
+            crop_width, crop_height = map(int, crop.groups())
+            if crop_width <= width and crop_height <= height:
+                return crop_rgb(rgb_image, crop_width, crop_height)
+
+        comm = '{ffmpeg} -hide_banner -loglevel error -f rawvideo -pix_fmt rgb24 -s {width}x{height} -i pipe: -vf "{op}" -pix_fmt rgb24 -f image2pipe -c:v ppm -flush_packets 1 pipe:'.format(
+            ffmpeg=self.ffmpeg, width=width, height=height, op=op
         )
-        stdout, stderr = p.communicate(f.getvalue())
-        if (stdout is None) or (len(stdout) < 5) or p.returncode != 0:
-            # print(stderr.decode("utf-8"))
-            self.logger.fatal("ffmpeg failed with %s", stderr.decode("utf-8"))
-            return None
-        f2 = io.BytesIO(stdout)
-        pil_img2 = Image.open(f2).convert("RGB")
-        return np.array(pil_img2)
+        return self._run(comm, np.ascontiguousarray(rgb_image).tobytes())
 
     def ff_RGB24ToRAW(self, rgb_image: np.array, form) -> bytes:
         """takes as an input a numpy RGB array (y,x,3)
@@ -82,24 +223,15 @@ class FFMpeg:
 
         produces raw video frame bytes in the given pixel format
         """
-        pil_img = Image.fromarray(rgb_image)
-        f = io.BytesIO()
-        pil_img.save(f, format="png")
-
-        comm = "{ffmpeg} -y -hide_banner -loglevel error -i pipe: -f rawvideo -pix_fmt {form} -dst_range 1 pipe:".format(
-            ffmpeg=self.ffmpeg, form=form
+        height, width = rgb_image.shape[:2]
+        comm = "{ffmpeg} -hide_banner -loglevel error -f rawvideo -pix_fmt rgb24 -s {width}x{height} -i pipe: -f rawvideo -pix_fmt {form} -dst_range 1 -flush_packets 1 pipe:".format(
+            ffmpeg=self.ffmpeg, width=width, height=height, form=form
         )
-        self.logger.debug(comm)
-        args = shlex.split(comm)
-        p = subprocess.Popen(
-            args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        return self._run(
+            comm,
+            np.ascontiguousarray(rgb_image).tobytes(),
+            raw_frame_size(form, width, height),
         )
-        stdout, stderr = p.communicate(f.getvalue())
-        if (stdout is None) or (len(stdout) < 5) or p.returncode != 0:  # say
-            self.logger.fatal("ffmpeg failed with %s", stderr.decode("utf-8"))
-            return None
-        f2 = io.BytesIO(stdout)
-        return f2.read()
 
     def ff_RAWToRGB24(self, raw: bytes, form, width=None, height=None) -> bytes:
         """takes as an input a numpy RGB array (y,x,3)
@@ -112,18 +244,13 @@ class FFMpeg:
         assert height is not None
         assert isinstance(raw, bytes)
 
-        comm = "{ffmpeg} -y -hide_banner -loglevel error -f rawvideo -pix_fmt {form} -s {width}x{height} -src_range 1 -i pipe: -frames 1 -pix_fmt rgb24 -f apng pipe:".format(
+        # a decoded file may hold more than one frame, only the first one is used
+        raw = raw[: raw_frame_size(form, width, height)]
+
+        comm = "{ffmpeg} -hide_banner -loglevel error -f rawvideo -pix_fmt {form} -s {width}x{height} -src_range 1 -i pipe: -pix_fmt rgb24 -f rawvideo -flush_packets 1 pipe:".format(
             ffmpeg=self.ffmpeg, form=form, width=width, height=height
         )
-        self.logger.debug(comm)
-        args = shlex.split(comm)
-        p = subprocess.Popen(
-            args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
-        stdout, stderr = p.communicate(raw)
-        if (stdout is None) or (len(stdout) < 5) or p.returncode != 0:  # say
-            self.logger.fatal("ffmpeg failed with %s", stderr.decode("utf-8"))
+        rgb = self._run(comm, raw, raw_frame_size("rgb24", width, height))
+        if rgb is None:
             return None
-        f = io.BytesIO(stdout)
-        pil_img = Image.open(f)
-        return np.array(pil_img)
+        return np.frombuffer(rgb, dtype=np.uint8).reshape(height, width, 3).copy()
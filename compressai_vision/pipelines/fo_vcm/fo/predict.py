@@ -27,9 +27,15 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
 # ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import concurrent.futures as cf
+import itertools
+import multiprocessing
 import traceback
 
+from collections import deque
+
 import cv2
+import torch
 
 from detectron2.data import MetadataCatalog
 from fiftyone import ProgressBar
@@ -42,6 +48,128 @@ from compressai_vision.pipelines.fo_vcm.conversion.detectron2 import (
 )
 from compressai_vision.pipelines.fo_vcm.pipeline.base import EncoderDecoder
 
+# number of samples whose predictions are written to the dataset at once
+WRITE_EVERY = 1000
+
+# EncoderDecoder of a worker process, see _init_worker
+_worker_encoder_decoder = None
+
+
+def _read_and_transform(paths, tags, encoder_decoder=None) -> list:
+    """Reads images and pushes them through the EncoderDecoder, if any
+
+    Returns a list of (nbits, image), ending with (None, error message) on failure
+    """
+    ims = []
+    for path in paths:
+        im = cv2.imread(path)
+        if im is None:
+            return [(None, "FATAL: could not read the image file '" + path + "'")]
+        ims.append(im)
+    if encoder_decoder is None:
+        return [(0, im) for im in ims]
+
+    # before using a detector, crunch through
+    # encoder/decoder
+    results = []
+    try:
+        if len(ims) == 1:
+            transformed = [
+                encoder_decoder.BGR(ims[0], tag=tags[0])
+            ]  # include a tag for cases where EncoderDecoder uses caching
+        else:
+            transformed = encoder_decoder.BGRBatch(ims, tags=list(tags))
+        for im, tag, (nbits, im_) in zip(ims, tags, transformed):
+            if nbits < 0:
+                # there's something wrong with the encoder/decoder process
+                # say, corrupt data from the VTMEncode bitstream etc.
+                print("EncoderDecoder returned error: will try using it once again")
+                nbits, im_ = encoder_decoder.BGR(im, tag=tag)
+            if nbits < 0:
+                msg = "EncoderDecoder returned error - again!  Will abort calculation"
+                return results + [(None, msg)]
+            results.append((nbits, im_))
+    except Exception as e:
+        return results + [
+            (
+                None,
+                "EncoderDecoder failed with '"
+                + str(e)
+                + "'\nTraceback:\n"
+                + traceback.format_exc(),
+            )
+        ]
+    return results
+
+
+def _init_worker(encoder_decoder):
+    global _worker_encoder_decoder
+    if encoder_decoder is not None:
+        encoder_decoder = encoder_decoder.worker_copy()
+    _worker_encoder_decoder = encoder_decoder
+
+
+def _worker_read_and_transform(paths, tags):
+    return _read_and_transform(paths, tags, _worker_encoder_decoder)
+
+
+def _transformed_images(paths, tags, encoder_decoder, num_workers, chunk_size=1):
+    """Yields the results of _read_and_transform in order, image by image
+
+    The images are handed to the EncoderDecoder in chunks of chunk_size.  With
+    num_workers > 0, the chunks are processed by a pool of processes, each with its
+    own copy of the EncoderDecoder, and at most 2 * num_workers are in flight.
+
+    The workers are spawned, not forked: the EncoderDecoder is pickled (so that open
+    ffmpeg pipes are not shared with the parent) and CUDA can be used in the workers.
+    """
+    jobs = (
+        (paths[k : k + chunk_size], tags[k : k + chunk_size])
+        for k in range(0, len(paths), chunk_size)
+    )
+    if num_workers == 0:
+        for chunk_paths, chunk_tags in jobs:
+            yield from _read_and_transform(chunk_paths, chunk_tags, encoder_decoder)
+        return
+
+    with cf.ProcessPoolExecutor(
+        num_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(encoder_decoder,),
+    ) as executor:
+        pending = deque(
+            executor.submit(_worker_read_and_transform, *job)
+            for job in itertools.islice(jobs, 2 * num_workers)
+        )
+        while pending:
+            results = pending.popleft().result()
+            for job in itertools.islice(jobs, 1):
+                pending.append(executor.submit(_worker_read_and_transform, *job))
+            yield from results
+
+
+def _predict(predictor, images: list) -> list:
+    """Runs a Detectron2 predictor on a list of BGR images of the same size at once
+
+    Same as DefaultPredictor.__call__ on each image: images of the same size are
+    padded the same way by the model, so that the results do not depend on batching.
+    """
+    if len(images) == 1:
+        return [predictor(images[0])]
+
+    with torch.no_grad():
+        inputs = []
+        for im in images:
+            if predictor.input_format == "RGB":
+                im = im[:, :, ::-1]
+            height, width = im.shape[:2]
+            image = predictor.aug.get_transform(im).apply_image(im)
+            image = torch.as_tensor(image.astype("float32").transpose(2, 0, 1))
+            image = image.to(predictor.cfg.MODEL.DEVICE)
+            inputs.append({"image": image, "height": height, "width": width})
+        return predictor.model(inputs)
+
 
 def annexPredictions(  # noqa: C901
     predictors: list = None,
@@ -51,6 +179,9 @@ def annexPredictions(  # noqa: C901
     encoder_decoder=None,  # compressai_vision.evaluation.pipeline.base.EncoderDecoder
     use_pb: bool = False,  # progressbar.  captures stdion
     use_print: int = 1,  # print progress at each n:th line.  good for batch jobs
+    num_workers: int = 0,
+    batch_size: int = 1,
+    encode_batch_size: int = 1,
 ):
     """Run detector and EncoderDecoder instance on a dataset.  Append detector results and bits-per-pixel to each sample.
 
@@ -61,6 +192,11 @@ def annexPredictions(  # noqa: C901
     :param encoder_decoder: (optional) a ``compressai_vision.evaluation.pipeline.EncoderDecoder`` subclass instance to apply on the image before detection
     :param use_pb: Show progressbar or not.  Nice for interactive runs, not so much for batch jobs.  Default: False.
     :param use_print: Print progress at every n:th. step.  Default: 0 = no printing.
+    :param num_workers: Number of processes reading the images and running the EncoderDecoder, each with its own copy of it (see ``EncoderDecoder.worker_copy``).  Default: 0 = in the main process.
+    :param batch_size: Maximum number of consecutive images of the same size run through the predictors at once.  Default: 1.
+    :param encode_batch_size: Number of images handed at once to ``EncoderDecoder.BGRBatch`` (e.g. batched ``CompressAIEncoderDecoder``).  Default: 1 = one ``BGR`` call per image.
+
+    The predictions are written to the dataset in bulk, every ``WRITE_EVERY`` samples.
     """
 
     predictor_fields = (
@@ -108,76 +244,72 @@ def annexPredictions(  # noqa: C901
     else:
         id_field_name = "id"
 
+    sample_ids, paths, tags = fo_dataset.values(["id", "filepath", id_field_name])
+    images = _transformed_images(
+        paths, tags, encoder_decoder, num_workers, encode_batch_size
+    )
+
     npix_sum = 0
     nbits_sum = 0
     cc = 0
+    written = 0
+    predictions = {field: [] for field in predictor_fields[: len(predictors)]}
+    group = []
+    error = None
     # with ProgressBar(fo_dataset) as pb: # captures stdout
     if use_pb:
         pb = ProgressBar(fo_dataset)
-    for sample in fo_dataset:
-        cc += 1
-        # sample.filepath
-        path = sample.filepath
-        im = cv2.imread(path)
-        if im is None:
-            print("FATAL: could not read the image file '" + path + "'")
-            return -1
-        # tag = path.split(os.path.sep)[-1].split(".")[0]  # i.e.: /path/to/some.jpg --> some.jpg --> some
-        # if open_images_id is avail, then use it, otherwise use normal id
-        tag = sample[id_field_name]
-        if encoder_decoder is not None:
-            # before using a detector, crunch through
-            # encoder/decoder
-            try:
-                nbits, im_ = encoder_decoder.BGR(
-                    im, tag=tag
-                )  # include a tag for cases where EncoderDecoder uses caching
-            except Exception as e:
-                print("EncoderDecoder failed with '" + str(e) + "'")
-                print("Traceback:")
-                traceback.print_exc()
-                return -1
-            if nbits < 0:
-                # there's something wrong with the encoder/decoder process
-                # say, corrupt data from the VTMEncode bitstream etc.
-                print("EncoderDecoder returned error: will try using it once again")
-                nbits, im_ = encoder_decoder.BGR(im, tag=tag)
-            if nbits < 0:
-                print("EncoderDecoder returned error - again!  Will abort calculation")
-                return -1
-
-            # NOTE: use tranformed image im_
-            npix_sum += im_.shape[0] * im_.shape[1]
-            nbits_sum += nbits
-        else:
-            im_ = im
+    for nbits, im_ in itertools.chain(images, [(0, None)]):
+        if nbits is None:
+            # the samples before the failing one are predicted and saved first
+            error, im_ = im_, None
+
+        if group and (
+            im_ is None or len(group) == batch_size or group[0].shape != im_.shape
+        ):
+            for e, predictor in enumerate(predictors):
+                for res in _predict(predictor, group):
+                    predictions[predictor_fields[e]].append(
+                        detectron251(
+                            res,
+                            model_catids=model_meta.thing_classes,
+                            # allowed_labels=allowed_labels # not needed, really
+                        )  # --> fiftyone Detections object
+                    )
+            n = len(group)
+            cc += n
+            group = []
 
-        for e, predictor in enumerate(predictors):
-            res = predictor(im_)
+            if cc - written >= WRITE_EVERY or im_ is None:
+                view = fo_dataset.select(sample_ids[written:cc], ordered=True)
+                for field, values in predictions.items():
+                    view.set_values(field, values)
+                    values.clear()
+                written = cc
 
-            field = predictor_fields[e]
-            predictions = detectron251(
-                res,
-                model_catids=model_meta.thing_classes,
-                # allowed_labels=allowed_labels # not needed, really
-            )  # --> fiftyone Detections object
+            if use_pb:
+                pb.update(n)
+            # print(">>>", cc%use_print)
+            if use_print > 0 and (cc // use_print) > ((cc - n) // use_print):
+                print("sample: ", cc, "/", len(fo_dataset))
 
-            """# could save nbits into each sample:
-            if encoder_decoder is not None:
-                predictions.nbits = nbits
-            """
+        if im_ is None:
+            break
 
-            sample[field] = predictions
+        if encoder_decoder is not None:
+            # NOTE: use tranformed image im_
+            npix_sum += im_.shape[0] * im_.shape[1]
+            nbits_sum += nbits
+        group.append(im_)
 
-        sample.save()
-        if use_pb:
-            pb.update()
-        # print(">>>", cc%use_print)
-        if use_print > 0 and ((cc % use_print) == 0):
-            print("sample: ", cc, "/", len(fo_dataset))
     if use_pb:
         pb.close()
 
+    if error is not None:
+        print(error)
+        images.close()
+        return -1
+
     # calculate bpp as defined by the VCM working group:
     bpp = None
     if encoder_decoder:
@@ -70,6 +70,13 @@ class EncoderDecoder:
         """Reset the internal state of the encoder & decoder, if there is any"""
         self.cc = 0
 
+    def worker_copy(self):
+        """Called on the copy of the instance sent to a worker process (see annexPredictions)
+
+        Returns the instance the worker uses, e.g. with its own temporary files
+        """
+        return self
+
     def __call__(self, x) -> tuple:
         """Push images(s) through the encoder+decoder, returns number of bits for each image and encoded+decoded images
 
@@ -92,6 +99,17 @@ class EncoderDecoder:
         """
         raise (AssertionError("virtual"))
 
+    def BGRBatch(self, bgr_images: list, tags: list = None) -> list:
+        """
+        :param bgr_images: list of numpy BGR images (y,x,3)
+        :param tags: list of strings that can be used to identify & cache images (optional)
+
+        Returns a list of (nbits, transformed BGR image), one BGR call per image unless
+        the subclass codes batches of images at once.
+        """
+        tags = [None] * len(bgr_images) if tags is None else tags
+        return [self.BGR(im, tag=tag) for im, tag in zip(bgr_images, tags)]
+
 
 class VoidEncoderDecoder(EncoderDecoder):
     """Does no encoding/decoding whatsoever.  Use for debugging."""
@@ -33,6 +33,7 @@ import os
 import numpy as np
 import torch
 
+from pytorch_msssim import ms_ssim
 from torchvision import transforms
 
 from compressai_vision.pipelines.fo_vcm.constant import inv_vf_per_scale, vf_per_scale
@@ -45,6 +46,40 @@ torch.backends.cudnn.deterministic = True
 torch.set_num_threads(1)
 
 
+def plan_buckets(sizes: list, m: int, max_batch: int, max_waste: float = 0.0) -> list:
+    """Groups images into buckets of a common padded size, to be coded as batches
+
+    :param sizes: (height, width) of each image
+    :param m: images are padded to multiples of m
+    :param max_batch: maximum number of images in a batch
+    :param max_waste: maximum fraction of a bucket that the padding added to an image may take
+
+    From the largest padded size down, an image joins the smallest bucket containing it
+    within max_waste, or starts a new bucket.  With max_waste = 0 (default) a bucket only
+    holds images of the same padded size, i.e. no padding is added by batching.
+
+    Returns a list of ((height, width), image indices) batches
+    """
+    padded = [(-(-h // m) * m, -(-w // m) * m) for h, w in sizes]
+    buckets = {}
+    for i in sorted(range(len(sizes)), key=lambda i: -padded[i][0] * padded[i][1]):
+        h, w = padded[i]
+        candidates = [
+            (H, W)
+            for H, W in buckets
+            if H >= h and W >= w and H * W - h * w <= max_waste * H * W
+        ]
+        size = min(candidates, key=lambda s: s[0] * s[1], default=(h, w))
+        buckets.setdefault(size, []).append(i)
+
+    batches = []
+    for size, indices in buckets.items():
+        indices.sort()
+        for k in range(0, len(indices), max_batch):
+            batches.append((size, indices[k : k + max_batch]))
+    return batches
+
+
 class CompressAIEncoderDecoder(EncoderDecoder):
     """EncoderDecoder class for CompressAI
 
@@ -61,6 +96,9 @@ class CompressAIEncoderDecoder(EncoderDecoder):
     :param scale: enable the VCM working group defined padding/scaling pre & post-processings steps.
                   Possible values: 100 (default), 75, 50, 25.  Special value: None = ffmpeg scaling.  100 equals to a simple padding operation
     :param dump: debugging option: dump input, intermediate and output images to disk in local directory
+    :param max_batch: maximum number of images compressed at once by ``BGRBatch``.  Default: 8
+    :param max_pad_waste: bucket policy of ``BGRBatch``, see ``plan_buckets``.  Default: 0 = batch only images of the same padded size
+    :param num_threads: number of threads used by torch on cpu.  Default: None = 1 (set at import)
 
     This class uses CompressAI model API's ``compress`` and ``decompress`` methods, so if your model has them, then it is
     compatible with this particular ``EncoderDecoder`` class, in detail:
@@ -88,6 +126,9 @@ class CompressAIEncoderDecoder(EncoderDecoder):
         ffmpeg="ffmpeg",
         scale: int = None,
         half=False,
+        max_batch: int = 8,
+        max_pad_waste: float = 0.0,
+        num_threads: int = None,
     ):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.net = net
@@ -110,6 +151,19 @@ class CompressAIEncoderDecoder(EncoderDecoder):
         self.ffmpeg = FFMpeg(self.ffmpeg_comm, self.logger)
         self.compute_metrics = True
         self.half = half
+        self.max_batch = max_batch
+        self.max_pad_waste = max_pad_waste
+        self.num_threads = num_threads
+        self._set_num_threads()
+
+    def _set_num_threads(self):
+        if self.num_threads is not None:
+            torch.set_num_threads(self.num_threads)
+
+    def __setstate__(self, state):
+        # copies unpickled by spawned workers (see annexPredictions) do not run __init__
+        self.__dict__.update(state)
+        self._set_num_threads()
 
     # some parameters can also be set after ctor
     def computeMetrics(self, state: bool):
@@ -127,12 +181,12 @@ class CompressAIEncoderDecoder(EncoderDecoder):
 
         :param x: a FloatTensor with dimensions (batch, channels, y, x)
 
-        WARNING: we assume that batch=1
+        Each image of the batch is compressed into its own bitstreams.  For batches of more than one image,
+        the latest metrics are lists with a value per image.
 
         Returns (nbitslist, x_hat), where x_hat is batch of images that have gone through the encoder/decoder process,
         nbitslist is a list of number of bits of each compressed image in that batch
         """
-        assert x.size()[0] == 1, "batch dimension must be 1"
         if self.half:
             x = x.half()
 
@@ -142,23 +196,24 @@ class CompressAIEncoderDecoder(EncoderDecoder):
             # decompression
             out_dec = self.net.decompress(out_enc["strings"], out_enc["shape"])
 
-        # TODO: out_enc["strings"][batch_index?][what?] .. for batch sizes > 1
-        total_strings = 0
-        for bitstream in out_enc["strings"]:
-            total_strings += len(bitstream[0])
-        # print("bitstream is>", type(bitstream))
-        # print("x_hat is>", x_hat.shape)
-        # num_pixels = x.shape[2] * x.shape[3]
-        # print("num_pixels", num_pixels)
-        nbits = 8 * total_strings  # BITS not BYTES
-        nbitslist = [nbits]
+        # out_enc["strings"][latent index][batch index]
+        nbitslist = [
+            8 * sum(len(strings[i]) for strings in out_enc["strings"])  # BITS not BYTES
+            for i in range(x.size(0))
+        ]
         x_hat = (
             torch.round(out_dec["x_hat"].clamp(0, 1) * 255.0) / 255.0
         )  # (batch, 3, H, W)  # reconstructed image
 
-        if self.compute_metrics:
+        if self.compute_metrics and x.size(0) == 1:
             self.latest_psnr = self.compute_psnr(x, x_hat)
             self.latest_msssim = self.compute_msssim(x, x_hat)
+        elif self.compute_metrics:
+            mse = torch.mean((x - x_hat) ** 2, dim=(1, 2, 3))
+            self.latest_psnr = (-10 * torch.log10(mse)).tolist()
+            self.latest_msssim = ms_ssim(
+                x, x_hat, data_range=1.0, size_average=False
+            ).tolist()
         return nbitslist, x_hat
 
     def getMetrics(self):
@@ -276,3 +331,52 @@ class CompressAIEncoderDecoder(EncoderDecoder):
         # print(">> cc, bpp_sum ", self.cc, self.bpp_sum)
         self.imcount += 1
         return nbitslist[0], bgr_image_hat
+
+    def BGRBatch(self, bgr_images: list, tags: list = None) -> list:
+        """Batched version of BGR, returns a list of (nbits, transformed BGR image)
+
+        :param bgr_images: list of numpy BGR images (y,x,3)
+        :param tags: not used
+
+        The (scaled) images are grouped into buckets (see ``plan_buckets``), padded to the size
+        of their bucket and each batch is compressed and decompressed at once.  The bitstreams
+        are split per image, so that the number of bits of each image is exact.
+        """
+        do_scaling = (self.scale is not None) and self.scale != 100
+
+        scaled = []
+        for bgr_image in bgr_images:
+            rgb_image = bgr_image[:, :, [2, 1, 0]]  # BGR --> RGB
+            if do_scaling:
+                rgb_image = self.ffmpeg.ff_op(rgb_image, vf_per_scale[self.scale])
+            scaled.append(rgb_image)
+        sizes = [im.shape[:2] for im in scaled]
+
+        results = [None] * len(bgr_images)
+        for (H, W), indices in plan_buckets(
+            sizes, self.m, self.max_batch, self.max_pad_waste
+        ):
+            # zero padding at the bottom & right, as with ffmpeg
+            x_pad = torch.zeros(len(indices), 3, H, W, dtype=torch.uint8)
+            for b, i in enumerate(indices):
+                h, w = sizes[i]
+                x_pad[b, :, :h, :w] = torch.from_numpy(scaled[i]).permute(2, 0, 1)
+            x_pad = self.toFloat(x_pad).to(self.device)
+
+            nbitslist, x_hat_pad = self(x_pad)
+            # same as transforms.ToPILImage
+            padded_hat = x_hat_pad.to("cpu").mul(255).byte().permute(0, 2, 3, 1).numpy()
+
+            for b, i in enumerate(indices):
+                h, w = sizes[i]
+                rgb_image_hat = np.ascontiguousarray(padded_hat[b, :h, :w])
+                if do_scaling:
+                    height, width = bgr_images[i].shape[:2]
+                    rgb_image_hat = self.ffmpeg.ff_op(
+                        rgb_image_hat,
+                        inv_vf_per_scale[self.scale].format(width=width, height=height),
+                    )
+                results[i] = (nbitslist[b], rgb_image_hat[:, :, [2, 1, 0]])
+
+        self.imcount += len(bgr_images)
+        return results
@@ -232,6 +232,16 @@ class VTMEncoderDecoder(EncoderDecoder):
             self.logger.debug("removing %s", self.folder)
             shutil.rmtree(self.folder)
 
+    def worker_copy(self):
+        """Gives the copy its own temporary folder, unless bitstreams are cached
+
+        Cached bitstreams are named by tag, so the workers share the cache folder.
+        """
+        if not self.caching:
+            self.folder = os.path.join(self.base_path, "vtm_" + str(uuid()))
+            os.makedirs(self.folder)
+        return self
+
     def reset(self):
         """Reset encoder/decoder internal state.  At the moment, there ain't any."""
         super().reset()
@@ -47,7 +47,7 @@ from tqdm import tqdm
 from compressai_vision.evaluators import BaseEvaluator
 from compressai_vision.model_wrappers import BaseWrapper
 from compressai_vision.registry import register_pipeline
-from compressai_vision.utils import dataio, time_measure
+from compressai_vision.utils import CodedResults, dataio, time_measure
 
 from ..base import BasePipeline
 
@@ -110,7 +110,7 @@ class MultiTaskInference(BasePipeline):
         ), "# of multiple tasks are not matched"
 
         self._update_codec_configs_at_pipeline_level(len(dataloader))
-        output_list = []
+        output_list = CodedResults(len(dataloader))
 
         tlid = self.target_task_layer_id
         for e, d in enumerate(tqdm(dataloader)):
@@ -169,27 +169,20 @@ class MultiTaskInference(BasePipeline):
             # assert len(evaluators) == len(preds)
             evaluators[tlid].digest(d, preds[tlid])
 
-            out_res = d[0].copy()
-            del (
-                out_res["image"],
-                out_res["width"],
-                out_res["height"],
-                out_res["image_id"],
-            )
-            out_res["qp"] = (
-                "uncmp" if codec.qp_value is None else codec.qp_value
-            )  # Assuming one qp will be used
             if self.configs["codec"]["decode_only"]:
-                acbytes = 0
+                nbytes = 0
                 for fpath in res["bitstream"]:
-                    acbytes += os.stat(fpath).st_size
-                out_res["bytes"] = acbytes
+                    nbytes += os.stat(fpath).st_size
             else:
-                out_res["bytes"] = res["bytes"][0]
-            out_res["coded_order"] = e
-            out_res["org_input_size"] = f'{d[0]["height"]}x{d[0]["width"]}'
-            out_res["input_size"] = dec_features["input_size"][0]
-            output_list.append(out_res)
+                nbytes = res["bytes"][0]
+            output_list.append(
+                file_name=d[0]["file_name"],
+                qp="uncmp" if codec.qp_value is None else codec.qp_value,
+                bytes=nbytes,
+                coded_order=e,
+                org_input_size=(d[0]["height"], d[0]["width"]),
+                input_size=dec_features["input_size"][0],
+            )
 
         if self.configs["codec"]["encode_only"] is True:
             print("bitstreams generated, exiting")
@@ -38,7 +38,12 @@ from tqdm import tqdm
 from compressai_vision.evaluators import BaseEvaluator
 from compressai_vision.model_wrappers import BaseWrapper
 from compressai_vision.registry import register_pipeline
-from compressai_vision.utils import metric_tracking, time_measure
+from compressai_vision.utils import (
+    CodedResults,
+    metric_tracking,
+    time_measure,
+    tracer,
+)
 
 from ..base import BasePipeline
 
@@ -80,7 +85,7 @@ class ImageRemoteInference(BasePipeline):
         """
         self._update_codec_configs_at_pipeline_level(len(dataloader))
         org_map_func = dataloader.dataset.get_org_mapper_func()
-        output_list = []
+        output_list = CodedResults(len(dataloader))
         timing = {
             "encode": metric_tracking(),
             "decode": metric_tracking(),
@@ -161,27 +166,21 @@ class ImageRemoteInference(BasePipeline):
             ):
                 evaluator.save_visualization(d, pred, self.vis_dir, self.vis_threshold)
 
-            evaluator.digest(d, pred)
-
-            out_res = d[0].copy()
-            del (
-                out_res["image"],
-                out_res["width"],
-                out_res["height"],
-                out_res["image_id"],
-            )
-            out_res["qp"] = (
-                "uncmp" if codec.qp_value is None else codec.qp_value
-            )  # Assuming one qp will be used
+            with tracer.span("evaluator_digest", cat="evaluation"):
+                evaluator.digest(d, pred)
 
             if not isinstance(res["bitstream"], dict):
-                out_res["bytes"] = os.stat(res["bitstream"]).st_size
+                nbytes = os.stat(res["bitstream"]).st_size
             else:
-                out_res["bytes"] = res["bytes"][0]
-
-            out_res["coded_order"] = e
-            out_res["org_input_size"] = f'{d[0]["height"]}x{d[0]["width"]}'
-            output_list.append(out_res)
+                nbytes = res["bytes"][0]
+
+            output_list.append(
+                file_name=d[0]["file_name"],
+                qp="uncmp" if codec.qp_value is None else codec.qp_value,
+                bytes=nbytes,
+                coded_order=e,
+                org_input_size=(d[0]["height"], d[0]["width"]),
+            )
 
         if self.configs["codec"]["encode_only"] is True:
             print("bitstreams generated, exiting")
@@ -27,6 +27,7 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
 # ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+from itertools import islice
 from pathlib import Path
 from typing import Dict, List, Tuple
 
@@ -40,7 +41,13 @@ from tqdm import tqdm
 from compressai_vision.evaluators import BaseEvaluator
 from compressai_vision.model_wrappers import BaseWrapper
 from compressai_vision.registry import register_pipeline
-from compressai_vision.utils import metric_tracking, time_measure, to_cpu
+from compressai_vision.utils import (
+    CodedResults,
+    metric_tracking,
+    time_measure,
+    to_cpu,
+    tracer,
+)
 
 from ..base import BasePipeline
 
@@ -111,7 +118,13 @@ class VideoRemoteInference(BasePipeline):
         }
 
         frames = {}
-        if not self.configs["codec"]["decode_only"]:
+        checkpoint = self._create_checkpoint()
+        decoded = checkpoint.load_decoded()
+        if decoded is not None:  # resume after decoding
+            res, dec_seq = decoded["res"], decoded["dec_seq"]
+            timing = decoded["timing"]
+
+        elif not self.configs["codec"]["decode_only"]:
             width, height = Image.open(file_names[0]).size
             org_input_size = {
                 "height": height,
@@ -156,25 +169,43 @@ class VideoRemoteInference(BasePipeline):
             res["bitstream"] = bin_files[0]
             # bitstream_bytes = res["bitstream"].stat().st_size
 
-        # Feature Deompression
-        start = time_measure()
-        dec_seq, dec_time_by_module, dec_complexity = self._decompress(
-            codec=codec,
-            bitstream=res["bitstream"],
-            codec_output_dir=self.codec_output_dir,
-            filename="",  # must be empty like this
-            org_img_size=None,
-            remote_inference=True,
-            vcm_mode=self.configs["codec"]["vcm_mode"],
-        )
-        end = time_measure()
-        timing["decode"].append((end - start))
+        if decoded is None:
+            # Feature Deompression
+            start = time_measure()
+            dec_seq, dec_time_by_module, dec_complexity = self._decompress(
+                codec=codec,
+                bitstream=res["bitstream"],
+                codec_output_dir=self.codec_output_dir,
+                filename="",  # must be empty like this
+                org_img_size=None,
+                remote_inference=True,
+                vcm_mode=self.configs["codec"]["vcm_mode"],
+            )
+            end = time_measure()
+            timing["decode"].append((end - start))
+
+            checkpoint.save_decoded({"res": res, "dec_seq": dec_seq, "timing": timing})
 
         self.logger.info("Processing remote NN")
 
-        output_list = []
+        output_list = CodedResults(len(dataloader))
+        start_frame = 0
+
+        progress = checkpoint.load_progress()
+        if progress is not None:
+            self._restore_progress(progress, evaluator, vision_model)
+            start_frame = progress["next_frame"]
+            output_list = progress["output_list"]
+            timing = progress["timing"]
+
         org_map_func = dataloader.dataset.get_org_mapper_func()
-        for e, d in enumerate(tqdm(dataloader)):
+        for e, d in enumerate(
+            tqdm(
+                islice(dataloader, start_frame, None),
+                total=len(dataloader) - start_frame,
+            ),
+            start=start_frame,
+        ):
             # some assertion needed to check if d is matched with dec_seq[e]
 
             start = time_measure()
@@ -189,29 +220,33 @@ class VideoRemoteInference(BasePipeline):
             ):
                 evaluator.save_visualization(d, pred, self.vis_dir, self.vis_threshold)
 
-            evaluator.digest(d, pred)
-
-            out_res = d[0].copy()
-            del out_res["image"]
-            out_res["qp"] = (
-                "uncmp" if codec.qp_value is None else codec.qp_value
-            )  # Assuming one qp will be used
+            with tracer.span("evaluator_digest", cat="evaluation"):
+                evaluator.digest(d, pred)
 
             if not isinstance(res["bitstream"], dict):
-                out_res["bytes"] = Path(res["bitstream"]).stat().st_size / len(
-                    dataloader
-                )
+                nbytes = Path(res["bitstream"]).stat().st_size / len(dataloader)
             else:
                 assert len(res["bytes"]) == len(dataloader)
-                out_res["bytes"] = res["bytes"][e]
-
-            out_res["coded_order"] = e
-            out_res["org_input_size"] = f'{d[0]["height"]}x{d[0]["width"]}'
+                nbytes = res["bytes"][e]
+
+            output_list.append(
+                file_name=d[0]["file_name"],
+                qp="uncmp" if codec.qp_value is None else codec.qp_value,
+                bytes=nbytes,
+                coded_order=e,
+                org_input_size=(d[0]["height"], d[0]["width"]),
+            )
 
-            output_list.append(out_res)
+            if checkpoint.is_due(e + 1):
+                checkpoint.save_progress(
+                    self._progress_state(
+                        e + 1, output_list, evaluator, vision_model, timing=timing
+                    )
+                )
 
         # performance evaluation on end-task
         eval_performance = self._evaluation(evaluator)
+        checkpoint.clear()
 
         for key, val in timing.items():
             timing[key] = val.sum
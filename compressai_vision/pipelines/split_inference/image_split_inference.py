@@ -39,7 +39,7 @@ from tqdm import tqdm
 from compressai_vision.evaluators import BaseEvaluator
 from compressai_vision.model_wrappers import BaseWrapper
 from compressai_vision.registry import register_pipeline
-from compressai_vision.utils import dict_sum, time_measure
+from compressai_vision.utils import CodedResults, dict_sum, time_measure, tracer
 from compressai_vision.utils.measure_complexity import (
     # calc_complexity_nn_part1_dn53,
     calc_complexity_nn_part1_plyr,
@@ -95,151 +95,178 @@ class ImageSplitInference(BasePipeline):
             Dict: A dictionary containing timing information, codec evaluation type, a list of output results, and performance evaluation metrics.
         """
         self._update_codec_configs_at_pipeline_level(len(dataloader))
-        output_list = []
+        output_list = CodedResults(len(dataloader))
 
         self.init_time_measure()
         self.init_complexity_measure()
+        complexity_cache = self._create_complexity_cache(vision_model)
         accum_enc_by_module = None
         accum_dec_by_module = None
 
-        for e, d in enumerate(tqdm(dataloader)):
-            org_img_size = {"height": d[0]["height"], "width": d[0]["width"]}
-            file_prefix = f'img_id_{d[0]["image_id"]}'
-
-            if not self.configs["codec"]["decode_only"]:
-                if e < self._codec_skip_n_frames:
-                    continue
-                if e >= self._codec_end_frame_idx:
-                    break
-
-                if self.is_mac_calculation:
-                    macs, pixels = calc_complexity_nn_part1_plyr(vision_model, d)
-                    self.acc_kmac_and_pixels_info("nn_part_1", macs, pixels)
-
+        decode_only = self.configs["codec"]["decode_only"]
+        loader = self._prefetched(dataloader)
+        for group in self._same_size_groups(
+            tqdm(loader),
+            1 if decode_only else self.configs["nn_task_part1"].get("batch_size", 1),
+            0 if decode_only else self._codec_skip_n_frames,
+            None if decode_only else self._codec_end_frame_idx,
+        ):
+            if not decode_only:
                 start = time_measure()
-                featureT = self._from_input_to_features(
-                    vision_model, d, file_prefix, evaluator.datacatalog_name
+                features_list = self._from_inputs_to_features(
+                    vision_model,
+                    [d for _, d in group],
+                    [f'img_id_{d[0]["image_id"]}' for _, d in group],
+                    evaluator.datacatalog_name,
                 )
                 self.update_time_elapsed("nn_part_1", (time_measure() - start))
-
-                # datatype conversion
-                featureT["data"] = {
-                    k: v.type(getattr(torch, self.datatype))
-                    for k, v in featureT["data"].items()
-                }
-                featureT["org_input_size"] = org_img_size
+            else:
+                features_list = [None] * len(group)
+
+            gts, preds = [], []
+            for (e, d), featureT in zip(group, features_list):
+                org_img_size = {"height": d[0]["height"], "width": d[0]["width"]}
+                file_prefix = f'img_id_{d[0]["image_id"]}'
+
+                if not decode_only:
+                    if self.is_mac_calculation:
+                        macs, pixels = calc_complexity_nn_part1_plyr(
+                            vision_model, d, complexity_cache
+                        )
+                        self.acc_kmac_and_pixels_info("nn_part_1", macs, pixels)
+
+                    # datatype conversion
+                    featureT["data"] = {
+                        k: v.type(getattr(torch, self.datatype))
+                        for k, v in featureT["data"].items()
+                    }
+                    featureT["org_input_size"] = org_img_size
+
+                    start = time_measure()
+                    res, enc_time_by_module, enc_complexity = self._compress(
+                        codec,
+                        featureT,
+                        self.codec_output_dir,
+                        self.bitstream_name,
+                        file_prefix,
+                    )
+                    self.update_time_elapsed("encode", (time_measure() - start))
+                    if self.is_mac_calculation:
+                        self.acc_kmac_and_pixels_info(
+                            "feature_reduction",
+                            enc_complexity[0],
+                            enc_complexity[1],
+                        )
+
+                    if accum_enc_by_module is None:
+                        accum_enc_by_module = enc_time_by_module
+                    else:
+                        accum_enc_by_module = dict_sum(
+                            accum_enc_by_module, enc_time_by_module
+                        )
+                else:
+                    res = {}
+                    bin_files = [
+                        file_path
+                        for file_path in self.codec_output_dir.glob(
+                            f"{self.bitstream_name}-{file_prefix}*"
+                        )
+                        if (
+                            (file_path.suffix in [".bin", ".mp4"])
+                            and "_tmp" not in file_path.name
+                        )
+                    ]
+                    assert (
+                        len(bin_files) > 0
+                    ), f"Error: decode_only mode, no bitstream file matching {self.bitstream_name}-{file_prefix}*"
+                    assert (
+                        len(bin_files) == 1
+                    ), f"Error, decode_only mode, multiple bitstream files matching {self.bitstream_name}*"
+
+                    res["bitstream"] = bin_files[0]
+                    print(f"reading bitstream... {res['bitstream']}")
+
+                if self.configs["codec"]["encode_only"] is True:
+                    continue
 
                 start = time_measure()
-                res, enc_time_by_module, enc_complexity = self._compress(
-                    codec,
-                    featureT,
-                    self.codec_output_dir,
-                    self.bitstream_name,
-                    file_prefix,
+                (
+                    dec_features,
+                    dec_time_by_module,
+                    dec_complexity,
+                ) = self._decompress(
+                    codec, res["bitstream"], self.codec_output_dir, file_prefix
                 )
-                self.update_time_elapsed("encode", (time_measure() - start))
+                self.update_time_elapsed("decode", (time_measure() - start))
                 if self.is_mac_calculation:
                     self.acc_kmac_and_pixels_info(
-                        "feature_reduction", enc_complexity[0], enc_complexity[1]
+                        "feature_restoration", dec_complexity[0], dec_complexity[1]
                     )
 
-                if accum_enc_by_module is None:
-                    accum_enc_by_module = enc_time_by_module
+                if accum_dec_by_module is None:
+                    accum_dec_by_module = dec_time_by_module
                 else:
-                    accum_enc_by_module = dict_sum(
-                        accum_enc_by_module, enc_time_by_module
+                    accum_dec_by_module = dict_sum(
+                        accum_dec_by_module, dec_time_by_module
                     )
-            else:
-                res = {}
-                bin_files = [
-                    file_path
-                    for file_path in self.codec_output_dir.glob(
-                        f"{self.bitstream_name}-{file_prefix}*"
+
+                # dec_features should contain "org_input_size" and "input_size"
+                # When using anchor codecs, that's not the case, we read input images to derive them
+                if (
+                    "org_input_size" not in dec_features
+                    or "input_size" not in dec_features
+                ):
+                    self.logger.warning(
+                        "Hacky: 'org_input_size' and 'input_size' retrived from input dataset."
                     )
-                    if (
-                        (file_path.suffix in [".bin", ".mp4"])
-                        and "_tmp" not in file_path.name
+                    dec_features["org_input_size"] = org_img_size
+                    dec_features["input_size"] = self._get_model_input_size(
+                        vision_model, d
                     )
-                ]
-                assert (
-                    len(bin_files) > 0
-                ), f"Error: decode_only mode, no bitstream file matching {self.bitstream_name}-{file_prefix}*"
-                assert (
-                    len(bin_files) == 1
-                ), f"Error, decode_only mode, multiple bitstream files matching {self.bitstream_name}*"
-
-                res["bitstream"] = bin_files[0]
-                print(f"reading bitstream... {res['bitstream']}")
-
-            if self.configs["codec"]["encode_only"] is True:
-                continue
-
-            start = time_measure()
-            dec_features, dec_time_by_module, dec_complexity = self._decompress(
-                codec, res["bitstream"], self.codec_output_dir, file_prefix
-            )
-            self.update_time_elapsed("decode", (time_measure() - start))
-            if self.is_mac_calculation:
-                self.acc_kmac_and_pixels_info(
-                    "feature_restoration", dec_complexity[0], dec_complexity[1]
-                )
 
-            if accum_dec_by_module is None:
-                accum_dec_by_module = dec_time_by_module
-            else:
-                accum_dec_by_module = dict_sum(accum_dec_by_module, dec_time_by_module)
+                dec_features["file_name"] = d[0]["file_name"]
+                if self.is_mac_calculation:
+                    macs, pixels = calc_complexity_nn_part2_plyr(
+                        vision_model,
+                        dec_features["data"],
+                        dec_features,
+                        complexity_cache,
+                    )
+                    self.acc_kmac_and_pixels_info("nn_part_2", macs, pixels)
 
-            # dec_features should contain "org_input_size" and "input_size"
-            # When using anchor codecs, that's not the case, we read input images to derive them
-            if "org_input_size" not in dec_features or "input_size" not in dec_features:
-                self.logger.warning(
-                    "Hacky: 'org_input_size' and 'input_size' retrived from input dataset."
+                start = time_measure()
+                pred = self._from_features_to_output(
+                    vision_model, dec_features, file_prefix
                 )
-                dec_features["org_input_size"] = org_img_size
-                dec_features["input_size"] = self._get_model_input_size(vision_model, d)
-
-            dec_features["file_name"] = d[0]["file_name"]
-            if self.is_mac_calculation:
-                macs, pixels = calc_complexity_nn_part2_plyr(
-                    vision_model, dec_features["data"], dec_features
+                self.update_time_elapsed("nn_part_2", (time_measure() - start))
+
+                if evaluator:
+                    gts.append(d)
+                    preds.append(pred)
+                    if getattr(self, "vis_dir", None) and hasattr(
+                        evaluator, "save_visualization"
+                    ):
+                        evaluator.save_visualization(
+                            d, pred, self.vis_dir, self.vis_threshold
+                        )
+
+                if not isinstance(res["bitstream"], dict):
+                    nbytes = os.stat(res["bitstream"]).st_size
+                else:
+                    nbytes = res["bytes"][0]
+
+                output_list.append(
+                    file_name=d[0]["file_name"],
+                    qp="uncmp" if codec.qp_value is None else codec.qp_value,
+                    bytes=nbytes,
+                    coded_order=e,
+                    org_input_size=(d[0]["height"], d[0]["width"]),
+                    input_size=dec_features["input_size"][0],
                 )
-                self.acc_kmac_and_pixels_info("nn_part_2", macs, pixels)
-
-            start = time_measure()
-            pred = self._from_features_to_output(
-                vision_model, dec_features, file_prefix
-            )
-            self.update_time_elapsed("nn_part_2", (time_measure() - start))
 
             if evaluator:
-                evaluator.digest(d, pred)
-                if getattr(self, "vis_dir", None) and hasattr(
-                    evaluator, "save_visualization"
-                ):
-                    evaluator.save_visualization(
-                        d, pred, self.vis_dir, self.vis_threshold
-                    )
-
-            out_res = d[0].copy()
-            del (
-                out_res["image"],
-                out_res["width"],
-                out_res["height"],
-                out_res["image_id"],
-            )
-            out_res["qp"] = (
-                "uncmp" if codec.qp_value is None else codec.qp_value
-            )  # Assuming one qp will be used
-
-            if not isinstance(res["bitstream"], dict):
-                out_res["bytes"] = os.stat(res["bitstream"]).st_size
-            else:
-                out_res["bytes"] = res["bytes"][0]
-
-            out_res["coded_order"] = e
-            out_res["org_input_size"] = f'{d[0]["height"]}x{d[0]["width"]}'
-            out_res["input_size"] = dec_features["input_size"][0]
-            output_list.append(out_res)
+                with tracer.span("evaluator_digest", cat="evaluation"):
+                    evaluator.digest_batch(gts, preds)
 
         if not self.configs["codec"]["decode_only"]:
             accum_enc_by_module = {
@@ -254,6 +281,7 @@ class ImageSplitInference(BasePipeline):
                 if key in accum_dec_by_module
             }
 
+        self.add_prefetch_details(loader)
         # if dec_only is True, accum_enc_by_module is None
         self.add_time_details("encode", accum_enc_by_module)
         # if enc_only is True, accum_dec_by_module is None
@@ -261,6 +289,10 @@ class ImageSplitInference(BasePipeline):
 
         if self.is_mac_calculation:
             self.calc_kmac_per_pixels_image_task()
+            if complexity_cache is not None:
+                self.logger.info(
+                    f"complexity cache: {complexity_cache.hits} hits, {complexity_cache.misses} misses"
+                )
 
         if self.configs["codec"]["encode_only"] is True:
             print("bitstreams generated, exiting")
@@ -30,7 +30,7 @@
 
 import os
 
-from itertools import repeat
+from itertools import islice, repeat
 from typing import Dict, List, Tuple, TypeVar
 
 import torch
@@ -42,7 +42,14 @@ from tqdm import tqdm
 from compressai_vision.evaluators import BaseEvaluator
 from compressai_vision.model_wrappers import BaseWrapper
 from compressai_vision.registry import register_pipeline
-from compressai_vision.utils import dl_to_ld, ld_to_dl, time_measure, to_cpu
+from compressai_vision.utils import (
+    CodedResults,
+    dl_to_ld,
+    ld_to_dl,
+    time_measure,
+    to_cpu,
+    tracer,
+)
 from compressai_vision.utils.measure_complexity import (
     calc_complexity_nn_part1_dn53,
     calc_complexity_nn_part1_plyr,
@@ -129,16 +136,23 @@ class VideoSplitInference(BasePipeline):
         self.init_time_measure()
         self.init_complexity_measure()
 
-        if not self.configs["codec"]["decode_only"]:
-            ## NN-part-1
-            for e, d in enumerate(tqdm(dataloader)):
-                output_file_prefix = f'img_id_{d[0]["image_id"]}'
-
-                if e < self._codec_skip_n_frames:
-                    continue
-                if e >= self._codec_end_frame_idx:
-                    break
+        checkpoint = self._create_checkpoint()
+        decoded = checkpoint.load_decoded()
+        if decoded is not None:  # resume after decoding
+            res, dec_features = decoded["res"], decoded["dec_features"]
+            self.elapsed_time = decoded["elapsed_time"]
+            self.kmacs, self.pixels = decoded["kmacs"], decoded["pixels"]
 
+        elif not self.configs["codec"]["decode_only"]:
+            ## NN-part-1
+            loader = self._prefetched(dataloader)
+            for group in self._same_size_groups(
+                tqdm(loader),
+                self.configs["nn_task_part1"].get("batch_size", 1),
+                self._codec_skip_n_frames,
+                self._codec_end_frame_idx,
+            ):
+                e, d = group[0]
                 if self.is_mac_calculation and e == self._codec_skip_n_frames:
                     if hasattr(vision_model, "darknet"):  # for jde
                         kmacs, pixels = calc_complexity_nn_part1_dn53(vision_model, d)
@@ -147,35 +161,33 @@ class VideoSplitInference(BasePipeline):
                     self.add_kmac_and_pixels_info("nn_part_1", kmacs, pixels)
 
                 start = time_measure()
-                res = self._from_input_to_features(
-                    vision_model, d, output_file_prefix, evaluator.datacatalog_name
+                res_list = self._from_inputs_to_features(
+                    vision_model,
+                    [d for _, d in group],
+                    [f'img_id_{d[0]["image_id"]}' for _, d in group],
+                    evaluator.datacatalog_name,
                 )
                 self.update_time_elapsed("nn_part_1", (time_measure() - start))
 
-                self._input_ftensor_buffer.append(
-                    {k: to_cpu(tensor) for k, tensor in res["data"].items()}
-                )
-
-                del res["data"]
+                for (e, d), res in zip(group, res_list):
+                    self._input_ftensor_buffer.append(
+                        {k: to_cpu(tensor) for k, tensor in res["data"].items()}
+                    )
 
-                if (e - self._codec_skip_n_frames) == 0:
-                    org_img_size = {"height": d[0]["height"], "width": d[0]["width"]}
-                    features["org_input_size"] = org_img_size
-                    features["input_size"] = res["input_size"]
+                    del res["data"]
 
-                    out_res = d[0].copy()
-                    del (
-                        out_res["image"],
-                        out_res["width"],
-                        out_res["height"],
-                        out_res["image_id"],
-                    )
-                    out_res["org_input_size"] = (d[0]["height"], d[0]["width"])
-                    out_res["input_size"] = features["input_size"][0]
+                    if (e - self._codec_skip_n_frames) == 0:
+                        org_img_size = {
+                            "height": d[0]["height"],
+                            "width": d[0]["width"],
+                        }
+                        features["org_input_size"] = org_img_size
+                        features["input_size"] = res["input_size"]
 
-                del d[0]["image"]
+                    del d[0]["image"]
 
             assert len(self._input_ftensor_buffer) == self._codec_n_frames_to_be_encoded
+            self.add_prefetch_details(loader)
 
             if self.configs["nn_task_part1"].generate_features_only is True:
                 print(
@@ -234,16 +246,27 @@ class VideoSplitInference(BasePipeline):
             res["bitstream"] = bin_files[0]
             # bitstream_bytes = res["bitstream"].stat().st_size
 
-        # Feature Deompression
-        start = time_measure()
-        dec_features, dec_time_by_module, dec_complexity = self._decompress(
-            codec, res["bitstream"], self.codec_output_dir, ""
-        )
-        self.update_time_elapsed("decode", (time_measure() - start))
-        self.add_time_details("decode", dec_time_by_module)
-        if self.is_mac_calculation:
-            self.add_kmac_and_pixels_info(
-                "feature_restoration", dec_complexity[0], dec_complexity[1]
+        if decoded is None:
+            # Feature Deompression
+            start = time_measure()
+            dec_features, dec_time_by_module, dec_complexity = self._decompress(
+                codec, res["bitstream"], self.codec_output_dir, ""
+            )
+            self.update_time_elapsed("decode", (time_measure() - start))
+            self.add_time_details("decode", dec_time_by_module)
+            if self.is_mac_calculation:
+                self.add_kmac_and_pixels_info(
+                    "feature_restoration", dec_complexity[0], dec_complexity[1]
+                )
+
+            checkpoint.save_decoded(
+                {
+                    "res": res,
+                    "dec_features": dec_features,
+                    "elapsed_time": self.elapsed_time,
+                    "kmacs": self.kmacs,
+                    "pixels": self.pixels,
+                }
             )
 
         # dec_features should contain "org_input_size" and "input_size"
@@ -278,7 +301,14 @@ class VideoSplitInference(BasePipeline):
         )
 
         self.logger.info("Processing NN-Part2...")
-        output_list = []
+        output_list = CodedResults(len(dataloader))
+        start_frame = 0
+
+        progress = checkpoint.load_progress()
+        if progress is not None:
+            self._restore_progress(progress, evaluator, vision_model)
+            start_frame = progress["next_frame"]
+            output_list = progress["output_list"]
 
         if getattr(self, "vis_dir", None):
             dec_ftensors_list = zip(dec_ftensors_list, dataloader)
@@ -286,7 +316,11 @@ class VideoSplitInference(BasePipeline):
             dec_ftensors_list = zip(dec_ftensors_list, repeat(None))
 
         for e, (ftensors, d) in enumerate(
-            tqdm(dec_ftensors_list, total=len(dataloader))
+            tqdm(
+                islice(dec_ftensors_list, start_frame, None),
+                total=len(dataloader) - start_frame,
+            ),
+            start=start_frame,
         ):
             data = {k: v.to(self.device_nn_part2) for k, v in ftensors.items()}
             dec_features["data"] = data
@@ -311,29 +345,36 @@ class VideoSplitInference(BasePipeline):
             self.update_time_elapsed("nn_part_2", (time_measure() - start))
 
             if evaluator:
-                evaluator.digest(gt_inputs[e], pred)
+                with tracer.span("evaluator_digest", cat="evaluation", frame=e):
+                    evaluator.digest(gt_inputs[e], pred)
                 if getattr(self, "vis_dir", None) and hasattr(
                     evaluator, "save_visualization"
                 ):
                     evaluator.save_visualization(
                         d, pred, self.vis_dir, self.vis_threshold
                     )
-            out_res = dec_features.copy()
-            del (out_res["data"], out_res["org_input_size"])
-
             if not isinstance(res["bitstream"], dict):
-                out_res["bytes"] = os.stat(res["bitstream"]).st_size / len(dataloader)
+                nbytes = os.stat(res["bitstream"]).st_size / len(dataloader)
             else:
                 assert len(res["bytes"]) == len(dataloader)
-                out_res["bytes"] = res["bytes"][e]
-
-            out_res["coded_order"] = e
-            out_res["input_size"] = dec_features["input_size"][0]
-            out_res["org_input_size"] = (
-                f'{dec_features["org_input_size"]["height"]}x{dec_features["org_input_size"]["width"]}'
+                nbytes = res["bytes"][e]
+
+            output_list.append(
+                file_name=file_names[e],
+                qp=dec_features["qp"],
+                bytes=nbytes,
+                coded_order=e,
+                org_input_size=(
+                    dec_features["org_input_size"]["height"],
+                    dec_features["org_input_size"]["width"],
+                ),
+                input_size=dec_features["input_size"][0],
             )
 
-            output_list.append(out_res)
+            if checkpoint.is_due(e + 1):
+                checkpoint.save_progress(
+                    self._progress_state(e + 1, output_list, evaluator, vision_model)
+                )
 
         # Calculate mac considering number of coded feature frames
         if self.is_mac_calculation:
@@ -347,6 +388,7 @@ class VideoSplitInference(BasePipeline):
 
         # performance evaluation on end-task
         eval_performance = self._evaluation(evaluator)
+        checkpoint.clear()
 
         return (
             self.time_elapsed_by_module,
@@ -37,6 +37,7 @@ from .registry import (
     PIPELINES,
     TRANSFORMS,
     VISIONMODELS,
+    LazyRegistry,
     register_codec,
     register_datacatalog,
     register_dataset,
@@ -55,6 +56,7 @@ __all__ = [
     "PIPELINES",
     "MULTASK_CODECS",
     "CODECS",
+    "LazyRegistry",
     "register_dataset",
     "register_vision_model",
     "register_datacatalog",
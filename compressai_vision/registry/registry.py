@@ -28,6 +28,8 @@
 # ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+import importlib
+
 from typing import Any, Callable, Dict, Type, TypeVar
 
 import torch.nn as nn
@@ -35,13 +37,138 @@ import torch.nn as nn
 from torch.utils.data import Dataset
 from torchvision import transforms
 
-PIPELINES: Dict[str, Callable[..., nn.Module]] = {}
-DATACATALOGS: Dict[str, Callable[..., Any]] = {}
-DATASETS: Dict[str, Callable[..., Dataset]] = {}
-VISIONMODELS: Dict[str, Callable[..., nn.Module]] = {}
-EVALUATORS: Dict[str, Callable[..., nn.Module]] = {}
-CODECS: Dict[str, Callable[..., nn.Module]] = {}
-MULTASK_CODECS: Dict[str, Callable[..., nn.Module]] = {}
+
+class LazyRegistry(dict):
+    """A registry whose built-in entries are declared as "module.path:ClassName" and only
+    imported when looked up, so that a run only imports the modules (and their third party
+    dependencies) of the models, codecs and evaluators it actually uses.
+
+    Classes registered with the register_* decorators behave as in a plain dict.
+    """
+
+    def __init__(self, lazy_entries: Dict[str, str] = None):
+        super().__init__()
+        self._lazy_entries = dict(lazy_entries or {})
+
+    def _resolve(self, name: str):
+        module_name, _, attr = self._lazy_entries[name].partition(":")
+        module = importlib.import_module(module_name)
+        # importing the module normally registers the class through its decorator
+        if not dict.__contains__(self, name):
+            if not hasattr(module, attr):
+                raise KeyError(
+                    f'"{name}" is declared in {module_name} but could not be loaded'
+                )
+            dict.__setitem__(self, name, getattr(module, attr))
+
+    def __getitem__(self, name: str):
+        if not dict.__contains__(self, name) and name in self._lazy_entries:
+            self._resolve(name)
+        return super().__getitem__(name)
+
+    def __contains__(self, name) -> bool:
+        return dict.__contains__(self, name) or name in self._lazy_entries
+
+    def get(self, name: str, default=None):
+        return self[name] if name in self else default
+
+    def keys(self):
+        return list(dict.fromkeys([*dict.keys(self), *self._lazy_entries]))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+
+_PIPELINES = "compressai_vision.pipelines"
+_CODECS = "compressai_vision.codecs"
+_DATASETS = "compressai_vision.datasets"
+_MODELS = "compressai_vision.model_wrappers"
+_EVALUATORS = "compressai_vision.evaluators.evaluators"
+
+PIPELINES: Dict[str, Callable[..., nn.Module]] = LazyRegistry(
+    {
+        "image-split-inference": f"{_PIPELINES}.split_inference.image_split_inference:ImageSplitInference",
+        "video-split-inference": f"{_PIPELINES}.split_inference.video_split_inference:VideoSplitInference",
+        "image-remote-inference": f"{_PIPELINES}.remote_inference.image_remote_inference:ImageRemoteInference",
+        "video-remote-inference": f"{_PIPELINES}.remote_inference.video_remote_inference:VideoRemoteInference",
+        "multi-task-inference": f"{_PIPELINES}.multitask_inference.multitask_inference:MultiTaskInference",
+    }
+)
+DATACATALOGS: Dict[str, Callable[..., Any]] = LazyRegistry(
+    {
+        name: f"{_DATASETS}.image:{name}"
+        for name in [
+            "MPEGTVDTRACKING",
+            "MPEGHIEVE",
+            "MPEGOIV6",
+            "SFUHW",
+            "PANDASET",
+            "COCO",
+            "IMAGES",
+        ]
+    }
+)
+DATASETS: Dict[str, Callable[..., Dataset]] = LazyRegistry(
+    {
+        name: f"{_DATASETS}.image:{name}"
+        for name in [
+            "DefaultDataset",
+            "Detectron2Dataset",
+            "TrackingDataset",
+            "YOLOXDataset",
+            "MMPOSEDataset",
+        ]
+    }
+)
+VISIONMODELS: Dict[str, Callable[..., nn.Module]] = LazyRegistry(
+    {
+        **{
+            name: f"{_MODELS}.detectron2:{name}"
+            for name in [
+                "faster_rcnn_X_101_32x8d_FPN_3x",
+                "mask_rcnn_X_101_32x8d_FPN_3x",
+                "faster_rcnn_R_50_FPN_3x",
+                "mask_rcnn_R_50_FPN_3x",
+                "panoptic_rcnn_R_101_FPN_3x",
+            ]
+        },
+        "jde_1088x608": f"{_MODELS}.jde:jde_1088x608",
+        "yolox_darknet53": f"{_MODELS}.yolox:yolox_darknet53",
+        "rtmo_multi_person_pose_estimation": f"{_MODELS}.rtmo:rtmo_multi_person_pose_estimation",
+    }
+)
+EVALUATORS: Dict[str, Callable[..., nn.Module]] = LazyRegistry(
+    {
+        "COCO-EVAL": f"{_EVALUATORS}:COCOEVal",
+        "OIC-EVAL": f"{_EVALUATORS}:OpenImagesChallengeEval",
+        "SEMANTICSEG-EVAL": f"{_EVALUATORS}:SemanticSegmentationEval",
+        "MOT-JDE-EVAL": f"{_EVALUATORS}:MOT_JDE_Eval",
+        "MOT-TVD-EVAL": f"{_EVALUATORS}:MOT_TVD_Eval",
+        "MOT-HIEVE-EVAL": f"{_EVALUATORS}:MOT_HiEve_Eval",
+        "YOLOX-COCO-EVAL": f"{_EVALUATORS}:YOLOXCOCOEval",
+        "MMPOSE-COCO-EVAL": f"{_EVALUATORS}:MMPOSECOCOEval",
+        "VISUAL-QUALITY-EVAL": f"{_EVALUATORS}:VisualQualityEval",
+    }
+)
+CODECS: Dict[str, Callable[..., nn.Module]] = LazyRegistry(
+    {
+        "bypass": f"{_CODECS}.base:Bypass",
+        "vtm": f"{_CODECS}.std_codecs:VTM",
+        "hm": f"{_CODECS}.std_codecs:HM",
+        "jm": f"{_CODECS}.std_codecs:JM",
+        "vvenc": f"{_CODECS}.std_codecs:VVENC",
+        "vcmrs": f"{_CODECS}.std_codecs:VCMRS",
+        "x264": f"{_CODECS}.ffmpeg:x264",
+        "x265": f"{_CODECS}.ffmpeg:x265",
+        "fctm": f"{_CODECS}.fctm:FCTM",
+    }
+)
+MULTASK_CODECS: Dict[str, Callable[..., nn.Module]] = LazyRegistry(
+    {"sic_sfu2022": f"{_CODECS}.sic_sfu2022:SIC_SFU2022"}
+)
 
 TRANSFORMS: Dict[str, Callable[..., Callable]] = {
     k: v for k, v in transforms.__dict__.items() if k[0].isupper()
@@ -58,6 +58,7 @@ from compressai_vision.config import (
     create_vision_model,
     write_outputs,
 )
+from compressai_vision.utils import append_to_results_db, thread_budget, tracer
 
 thisdir = Path(__file__).parent
 config_path = str(thisdir.joinpath("../../cfgs").resolve())
@@ -65,6 +66,8 @@ config_path = str(thisdir.joinpath("../../cfgs").resolve())
 
 def setup(conf: DictConfig) -> dict[str, Any]:
     configure_conf(conf)
+    tracer.enable(conf.misc.get("tracing", False))
+    thread_budget.configure(**conf.misc.get("threads", {}))
 
     # would there be any better way to do this?
     mtasks = [
@@ -197,17 +200,17 @@ def main(conf: DictConfig):
     pipeline, modules = setup(conf)
 
     print_specs(pipeline, **modules)
-    timing, eval_encode_type, coded_res, performance = pipeline(**modules)
+    try:
+        timing, eval_encode_type, coded_res, performance = pipeline(**modules)
+    finally:  # encode only runs exit from the pipeline
+        if tracer.enabled:
+            tracer.export(pipeline.codec_output_dir)
 
     # pretty output
-    coded_res_df = pd.DataFrame(coded_res)
+    coded_res_df = coded_res.to_dataframe()
 
     print("=" * 100)
     print(f"Encoding Information [Top 5 Rows...][{pipeline}]")
-    coded_res_df["file_name"] = coded_res_df["file_name"].apply(lambda x: Path(x).name)
-    coded_res_df["total_pixels"] = coded_res_df["org_input_size"].apply(
-        lambda x: int(x.split("x")[0]) * int(x.split("x")[1])
-    )
     print(
         tabulate(
             coded_res_df.head(5),
@@ -222,6 +225,7 @@ def main(conf: DictConfig):
     evaluator_name = _get_evaluator_name(modules["evaluators"][tlid])
     evaluator_filepath = _get_evaluator_filepath(modules["evaluators"][tlid])
     # seq_info_path = _get_seqinfo_path(**modules)
+    metrics = performance
     performance, eval_criteria = _summerize_performance(
         evaluator_name, performance, modules["evaluators"][tlid].criteria
     )
@@ -230,7 +234,7 @@ def main(conf: DictConfig):
     assert eval_encode_type == "bpp"
     if eval_encode_type == "bpp":
         dataset_name = _get_dataset_name(modules["evaluators"][tlid])
-        avg_bpp = _calc_bpp(coded_res_df)
+        avg_bpp = _calc_bpp(coded_res)
         result_df = pd.DataFrame(
             {
                 "Dataset": dataset_name,
@@ -251,6 +255,9 @@ def main(conf: DictConfig):
         os.path.join(evaluator_filepath, f'encode_details_{coded_res_df["qp"][0]}.csv'),
         index=False,
     )
+    append_to_results_db(
+        conf, modules["evaluators"][tlid], result_df, coded_res, timing, metrics=metrics
+    )
 
 
 def _get_seq_info(seq_info_path):
@@ -262,19 +269,14 @@ def _get_seq_info(seq_info_path):
     return name, int(fps), int(total_frame)
 
 
-def _calc_bitrate(coded_res_df, seq_info_path):
+def _calc_bitrate(coded_res, seq_info_path):
     name, fps, total_frame = _get_seq_info(seq_info_path)
     print(f"Frame Rate: {fps}, Total Frame: {total_frame}")
-    total_bytes = coded_res_df.groupby(["qp"])["bytes"].sum().tolist()[0]
-    bitrate = ((total_bytes * 8) * fps) / (1000 * total_frame)
-    return name, fps, total_frame, bitrate
+    return name, fps, total_frame, coded_res.bitrate(fps, total_frame)
 
 
-def _calc_bpp(coded_res_df):
-    total_bytes = coded_res_df.groupby(["qp"])["bytes"].sum().tolist()[0]
-    total_pixels = coded_res_df.groupby(["qp"])["total_pixels"].sum().tolist()[0]
-    avg_bpp = (total_bytes * 8) / total_pixels
-    return avg_bpp
+def _calc_bpp(coded_res):
+    return coded_res.bpp()
 
 
 def _summerize_performance(evaluator_name, performance, eval_criteria):
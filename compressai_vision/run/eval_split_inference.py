@@ -65,7 +65,12 @@ from compressai_vision.config import (
     write_outputs,
 )
 from compressai_vision.datasets import get_seq_info
-from compressai_vision.utils import get_max_num_cpus
+from compressai_vision.utils import (
+    append_to_results_db,
+    get_max_num_cpus,
+    thread_budget,
+    tracer,
+)
 
 thisdir = Path(__file__).parent
 config_path = str(thisdir.joinpath("../../cfgs").resolve())
@@ -73,6 +78,8 @@ config_path = str(thisdir.joinpath("../../cfgs").resolve())
 
 def setup(conf: DictConfig) -> dict[str, Any]:
     configure_conf(conf)
+    tracer.enable(conf.misc.get("tracing", False))
+    thread_budget.configure(**conf.misc.get("threads", {}))
 
     vision_model = create_vision_model(conf.misc.device.nn_parts, conf.vision_model)
     dataloader = create_dataloader(
@@ -133,6 +140,7 @@ def print_specs(pipeline, **kwargs):
                 \n  -- Weights                : {Path(kwargs['vision_model'].pretrained_weight_path).resolve()}\
                 \n Codec                      : {title(kwargs['codec']):<30s}\
                 \n  -- Counted # CPUs for use : {get_max_num_cpus()}\
+                \n  -- Thread Budget          : {thread_budget.cores} cores\
                 \n  -- Enc. Only              : {pipeline.configs['codec'].encode_only} \
                 \n  -- Dec. Only              : {pipeline.configs['codec'].decode_only} \
                 \n  -- Output Dir             : {Path(pipeline.codec_output_dir).resolve()} \
@@ -162,22 +170,19 @@ def main(conf: DictConfig):
     pipeline, modules = setup(conf)
 
     print_specs(pipeline, **modules)
-    elap_times, eval_encode_type, coded_res, performance, mac_complexity = pipeline(
-        **modules
-    )
+    try:
+        elap_times, eval_encode_type, coded_res, performance, mac_complexity = (
+            pipeline(**modules)
+        )
+    finally:  # encode only runs exit from the pipeline
+        _export_trace(pipeline, **modules)
 
     if coded_res is not None:  # Encode Only
         # pretty output
-        coded_res_df = pd.DataFrame(coded_res)
+        coded_res_df = coded_res.to_dataframe()
 
         print("=" * 100)
         print(f"Encoding Information [Top 5 Rows...][{pipeline}]")
-        coded_res_df["file_name"] = coded_res_df["file_name"].apply(
-            lambda x: Path(x).name
-        )
-        coded_res_df["total_pixels"] = coded_res_df["org_input_size"].apply(
-            lambda x: int(x.split("x")[0]) * int(x.split("x")[1])
-        )
         print(
             tabulate(
                 coded_res_df.head(5),
@@ -248,6 +253,7 @@ def main(conf: DictConfig):
 
             elap_times = updates
 
+    metrics = performance
     performance, eval_criteria = _summarize_performance(
         evaluator_name, performance, conf.evaluator.eval_criteria
     )
@@ -255,7 +261,7 @@ def main(conf: DictConfig):
     print(f"\nPerformance Metrics Using Evaluation Criteria {eval_criteria}\n")
     if eval_encode_type == "bpp":
         dataset_name = _get_dataset_name(**modules)
-        avg_bpp = _calc_bpp(coded_res_df)
+        avg_bpp = _calc_bpp(coded_res)
         result_df = pd.DataFrame(
             {
                 "Dataset": dataset_name,
@@ -268,7 +274,7 @@ def main(conf: DictConfig):
         print(tabulate(result_df, headers="keys", tablefmt="psql"))
 
     if eval_encode_type == "bitrate":
-        name, fps, total_frame, bitrate = _calc_bitrate(coded_res_df, seq_info_path)
+        name, fps, total_frame, bitrate = _calc_bitrate(coded_res, seq_info_path)
         result_df = pd.DataFrame(
             {
                 "Dataset": name,
@@ -311,20 +317,25 @@ def main(conf: DictConfig):
         index=False,
     )
 
+    append_to_results_db(
+        conf,
+        modules["evaluator"],
+        result_df,
+        coded_res,
+        elap_times,
+        kmac=mac_complexity if conf.codec["mac_computation"] else None,
+        metrics=metrics,
+    )
+
 
-def _calc_bitrate(coded_res_df, seq_info_path):
+def _calc_bitrate(coded_res, seq_info_path):
     name, fps, total_frame = get_seq_info(seq_info_path)
     print(f"Frame Rate: {fps}, Total Frame: {total_frame}")
-    total_bytes = coded_res_df.groupby(["qp"])["bytes"].sum().tolist()[0]
-    bitrate = ((total_bytes * 8) * fps) / (1000 * total_frame)
-    return name, fps, total_frame, bitrate
+    return name, fps, total_frame, coded_res.bitrate(fps, total_frame)
 
 
-def _calc_bpp(coded_res_df):
-    total_bytes = coded_res_df.groupby(["qp"])["bytes"].sum().tolist()[0]
-    total_pixels = coded_res_df.groupby(["qp"])["total_pixels"].sum().tolist()[0]
-    avg_bpp = (total_bytes * 8) / total_pixels
-    return avg_bpp
+def _calc_bpp(coded_res):
+    return coded_res.bpp()
 
 
 def _summarize_performance(evaluator_name, performance, eval_criteria):
@@ -408,6 +419,18 @@ def _summarize_performance(evaluator_name, performance, eval_criteria):
     return performance, eval_criteria
 
 
+def _export_trace(pipeline, **modules):
+    if not tracer.enabled:
+        return
+
+    output_dir = pipeline.codec_output_dir
+    if modules["evaluator"] is not None:
+        output_dir = _get_evaluator_filepath(**modules)
+
+    tracer.export(output_dir)
+    print(f"\nTrace saved in : {output_dir}\n")
+
+
 def _get_evaluator_filepath(**modules):
     return modules["evaluator"].output_dir
 
@@ -0,0 +1,233 @@
+# Copyright (c) 2022-2024, InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+r"""
+Runs a sweep of evaluation jobs through a queue in a shared directory
+
+Create the queue of a sweep once, then start workers on any number of nodes that see
+the same directory. Each worker pulls the next job until the sweep is done:
+
+.. code-block:: bash
+
+    compressai-vision-queue create /shared/sweeps/sfu_vtm \
+        --sequences Traffic_2560x1600_30_val Kimono_1920x1080_24_val \
+        --qps 22 27 32 37 42 47 \
+        --cmd "bash scripts/evaluation/sfu_hw_obj/eval_on_sfu_hw_obj_vtm.sh -t /data/fcm_testdata -i /opt/VTM -o /shared/runs -s {sequence} -q {qp}"
+
+    # on each node (e.g., one per SLURM array task)
+    compressai-vision-queue work /shared/sweeps/sfu_vtm
+
+    # the longest jobs first, with a runtime model fitted on past runs
+    compressai-vision-queue fit-costs costs.json --result_path /shared/runs/split-inference-video/vtm_ref/SFUHW
+    compressai-vision-queue create ... --codec vtm_ref --cost_model costs.json --seqinfo_root /data/fcm_testdata/SFU_HW_Obj
+
+    # or, to try the sweep on a single machine
+    compressai-vision-queue work /shared/sweeps/sfu_vtm --local 4
+
+    compressai-vision-queue status /shared/sweeps/sfu_vtm
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+from compressai_vision.utils import ResultsDB
+from compressai_vision.utils.job_costs import CostModel, critical_path_order, lpt_pack
+from compressai_vision.utils.work_queue import (
+    WorkQueue,
+    make_sweep_jobs,
+    run_local_workers,
+    run_worker,
+)
+
+
+def _queue(args) -> WorkQueue:
+    return WorkQueue(args.queue_dir, args.heartbeat, args.stale_after)
+
+
+def create(args):
+    if args.jobs is not None:
+        with open(args.jobs, "r") as f:
+            jobs = json.load(f)
+    else:
+        if not (args.sequences and args.qps and args.cmd):
+            raise ValueError("--sequences, --qps and --cmd are required without --jobs")
+        jobs = make_sweep_jobs(args.sequences, args.qps, args.cmd, args.stages)
+        for job in jobs:
+            job["codec"] = args.codec
+
+    if args.cost_model is not None:
+        cost_model = CostModel.load(args.cost_model)
+        costs = [cost_model.predict_job(job, args.seqinfo_root) for job in jobs]
+        for job, cost in zip(jobs, costs):
+            job["cost"] = cost
+        jobs = critical_path_order(jobs, costs)
+
+    queue = WorkQueue.create(args.queue_dir, jobs, heartbeat=args.heartbeat)
+    print(f"Queue of {len(queue.jobs)} jobs at {queue.root}")
+
+
+def work(args):
+    queue = _queue(args)
+    kwargs = {"max_jobs": args.max_jobs, "poll": args.poll}
+    if args.local > 0:
+        run_local_workers(queue, args.local, **kwargs)
+    else:
+        run_worker(queue, args.worker, **kwargs)
+    return status(args)
+
+
+def status(args):
+    queue_status = _queue(args).status()
+    for k, ids in queue_status.items():
+        print(f"{k:<8s}: {len(ids)}")
+        if args.verbose and k != "done":
+            for job_id in ids:
+                print(f"    {job_id}")
+    return 1 if queue_status["failed"] else 0
+
+
+def fit_costs(args):
+    cost_model = CostModel()
+    for result_path in args.result_path:
+        cost_model.add_result_tree(result_path, args.codec)
+    if args.results_db is not None:
+        with ResultsDB(args.results_db) as db:
+            cost_model.add_results_db(db, codec=args.codec)
+
+    cost_model.fit().save(args.cost_model)
+    for key, coefs in cost_model.coefs.items():
+        print(f"{key:<40s}: {', '.join(f'{v:.4f}' for v in coefs)}")
+
+
+def plan(args):
+    jobs = _queue(args).jobs
+    costs = [job.get("cost", 1.0) for job in jobs]
+    _, makespan = lpt_pack(costs, args.workers)
+    print(f"{len(jobs)} jobs, {sum(costs) / 3600:.2f} hours in total")
+    print(f"estimated wall time on {args.workers} workers: {makespan / 3600:.2f} hours")
+
+
+def reset(args):
+    ids = _queue(args).reset(failed_only=not args.all)
+    print(f"{len(ids)} jobs pending again")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--heartbeat", type=float, default=30.0)
+    parser.add_argument(
+        "--stale_after",
+        type=float,
+        default=None,
+        help="seconds without heartbeat after which a job is reclaimed (default: 4 heartbeats)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("create", help="create the queue of a sweep")
+    p.add_argument("queue_dir")
+    p.add_argument(
+        "--jobs",
+        default=None,
+        help="json list of jobs, each with an id and a cmd (and optionally the ids it runs after)",
+    )
+    p.add_argument("--sequences", nargs="*")
+    p.add_argument("--qps", nargs="*")
+    p.add_argument(
+        "--stages",
+        nargs="*",
+        default=["full"],
+        help="stages of each sequence and qp, run in that order (default: %(default)s)",
+    )
+    p.add_argument(
+        "--cmd", help="command line template, with {sequence}, {qp} and {stage}"
+    )
+    p.add_argument("--codec", default="", help="codec of the jobs, for the cost model")
+    p.add_argument(
+        "--cost_model",
+        default=None,
+        help="runtime model (see fit-costs) to start the longest jobs first",
+    )
+    p.add_argument(
+        "--seqinfo_root",
+        default=None,
+        help="folder of the sequences, holding <sequence>/seqinfo.ini",
+    )
+    p.set_defaults(func=create)
+
+    p = subparsers.add_parser(
+        "fit-costs", help="fit the runtime model of the jobs on past runs"
+    )
+    p.add_argument("cost_model", help="output json")
+    p.add_argument("--result_path", nargs="*", default=[])
+    p.add_argument("--results_db", default=None)
+    p.add_argument(
+        "--codec",
+        default=None,
+        help="codec of the runs (default: the codec folder of each run)",
+    )
+    p.set_defaults(func=fit_costs)
+
+    p = subparsers.add_parser("plan", help="estimate the wall time of the queue")
+    p.add_argument("queue_dir")
+    p.add_argument("--workers", type=int, default=1)
+    p.set_defaults(func=plan)
+
+    p = subparsers.add_parser("work", help="run jobs of the queue until it is done")
+    p.add_argument("queue_dir")
+    p.add_argument("--worker", default=None, help="worker id (default: host-pid)")
+    p.add_argument("--max_jobs", type=int, default=None)
+    p.add_argument("--poll", type=float, default=10.0)
+    p.add_argument(
+        "--local",
+        type=int,
+        default=0,
+        help="run that many workers on this machine, to try a sweep on a single node",
+    )
+    p.add_argument("-v", "--verbose", action="store_true")
+    p.set_defaults(func=work)
+
+    p = subparsers.add_parser("status", help="print the state of the jobs")
+    p.add_argument("queue_dir")
+    p.add_argument("-v", "--verbose", action="store_true")
+    p.set_defaults(func=status)
+
+    p = subparsers.add_parser("reset", help="make the failed jobs pending again")
+    p.add_argument("queue_dir")
+    p.add_argument("--all", action="store_true", help="also rerun the done jobs")
+    p.set_defaults(func=reset)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -29,9 +29,20 @@
 
 from . import dataio, git, pip, system
 from .external_exec import get_max_num_cpus
+from .manifest import FileManifest, run_conversions
 from .misc import dict_sum, dl_to_ld, ld_to_dl, metric_tracking, time_measure, to_cpu
+from .resources import thread_budget
+from .results import CodedResults
+from .results_db import ResultsDB, append_to_results_db
+from .tracing import tracer
+from .work_queue import WorkQueue
 
 __all__ = [
+    "CodedResults",
+    "FileManifest",
+    "ResultsDB",
+    "WorkQueue",
+    "append_to_results_db",
     "dataio",
     "git",
     "pip",
@@ -43,4 +54,7 @@ __all__ = [
     "dict_sum",
     "dl_to_ld",
     "ld_to_dl",
+    "run_conversions",
+    "thread_budget",
+    "tracer",
 ]
@@ -37,6 +37,8 @@ import sys
 from pathlib import Path
 from typing import Any, List, Optional
 
+from .tracing import tracer
+
 
 def get_max_num_cpus():
     # return multiprocessing.cpu_count()
@@ -55,28 +57,31 @@ def prevent_core_dump():
     resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
 
 
-def run_cmdlines_parallel(cmds: List[Any], logpath: Optional[Path] = None) -> None:
+def run_cmdlines_parallel(
+    cmds: List[Any], logpath: Optional[Path] = None, max_workers: Optional[int] = None
+) -> None:
     def worker(cmd, id, logpath):
         print(f"--> job_id [{id:03d}] Running: {' '.join(cmd)}", file=sys.stdout)
-        p = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            preexec_fn=prevent_core_dump,
-        )
-
-        if logpath is not None:
-            plogpath = Path(str(logpath) + f".sub_p{id}")
-            with plogpath.open("w") as f:
-                for bline in p.stdout:
-                    line = bline.decode()
-                    f.write(line)
-                f.flush()
-            assert p.wait() == 0
-        else:
-            p.stdout.read()  # clear up
-
-    with cf.ThreadPoolExecutor(get_max_num_cpus()) as exec:
+        with tracer.span(Path(str(cmd[0])).name, cat="process", job_id=id):
+            p = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                preexec_fn=prevent_core_dump,
+            )
+
+            if logpath is not None:
+                plogpath = Path(str(logpath) + f".sub_p{id}")
+                with plogpath.open("w") as f:
+                    for bline in p.stdout:
+                        line = bline.decode()
+                        f.write(line)
+                    f.flush()
+                assert p.wait() == 0
+            else:
+                p.stdout.read()  # clear up
+
+    with cf.ThreadPoolExecutor(max_workers or get_max_num_cpus()) as exec:
         all_jobs = [
             exec.submit(worker, cmd, id, logpath) for id, cmd in enumerate(cmds)
         ]
@@ -86,6 +91,11 @@ def run_cmdlines_parallel(cmds: List[Any], logpath: Optional[Path] = None) -> No
 
 
 def run_cmdline(cmdline: List[Any], logpath: Optional[Path] = None) -> None:
+    with tracer.span(Path(str(cmdline[0])).name, cat="process"):
+        _run_cmdline(cmdline, logpath)
+
+
+def _run_cmdline(cmdline: List[Any], logpath: Optional[Path] = None) -> None:
     print(f"--> Running: {' '.join(cmdline)}", file=sys.stdout)
 
     if logpath is None:
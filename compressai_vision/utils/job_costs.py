@@ -0,0 +1,229 @@
+# Copyright (c) 2022-2024, InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Runtime model of the jobs of a sweep, and longest-job-first scheduling
+
+The runtime of a job (a sequence coded at a qp) is modeled per codec and stage as
+
+    log(seconds) = a + b * log(width * height * frames) + c * qp
+
+fitted by least squares on the timings of past runs (the encode_video and
+decode_video columns of their summary.csv, or the rows of a ResultsDB), the size of
+the sequence being read from its seqinfo.ini (get_seq_info). The slopes b and c are
+pulled toward prior values, which they keep where the samples do not determine them.
+
+The jobs are then ordered by the cost of the longest chain of stages they start, so
+that the slowest jobs start first instead of setting the makespan at the end.
+"""
+
+import csv
+import json
+import math
+import re
+
+from glob import iglob
+from os.path import join
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from compressai_vision.datasets import get_seq_info
+
+__all__ = ["CostModel", "critical_path_order", "lpt_pack", "sequence_size"]
+
+# timing columns of the summaries modeled for each stage, the first one found is used
+STAGE_TIMINGS = {
+    "encode": ("encode_video", "encode"),
+    "decode": ("decode_video", "decode"),
+}
+FULL_TIMINGS = ("nn_part_1", "encode", "decode", "nn_part_2")
+
+# slopes of log(seconds) in log(pixels) and qp, until fitted
+PRIOR = (1.0, -0.05)
+
+_SIZE = re.compile(r"_(\d+)x(\d+)(?:_|$)")
+
+
+def sequence_size(seq_info_path) -> Tuple[int, int, int]:
+    """width, height and number of frames of a sequence"""
+    name, _, total_frame = get_seq_info(seq_info_path)
+    width, height = _SIZE.search(name).groups()
+    return int(width), int(height), total_frame
+
+
+def _features(width, height, frames, qp) -> np.ndarray:
+    return np.array([1.0, math.log(width * height * frames), float(qp)])
+
+
+def _codec_of(eval_dir) -> str:
+    """codec folder (codec type and experiment) of an evaluation folder"""
+    # <run_root>/<pipeline>/<codec><experiment>/<datacatalog>/<dataset>/qp<N>/evaluation
+    return Path(eval_dir).parts[-5]
+
+
+def _stage_seconds(summary: Dict) -> Dict[str, float]:
+    seconds = {}
+    for stage, columns in STAGE_TIMINGS.items():
+        for column in columns:
+            if summary.get(column) not in (None, ""):
+                seconds[stage] = float(summary[column])
+                break
+    if all(summary.get(k) not in (None, "") for k in FULL_TIMINGS):
+        seconds["full"] = sum(float(summary[k]) for k in FULL_TIMINGS)
+    return seconds
+
+
+class CostModel:
+    """Per codec and stage log-linear runtime models"""
+
+    def __init__(self, coefs: Optional[Dict[str, List[float]]] = None):
+        # "<codec>/<stage>": [a, b, c]
+        self.coefs = {} if coefs is None else dict(coefs)
+        self._samples: Dict[str, List[Tuple[np.ndarray, float]]] = {}
+
+    def add_sample(self, codec: str, stage: str, width, height, frames, qp, seconds):
+        if seconds <= 0:
+            return
+        key = f"{codec}/{stage}"
+        x = _features(width, height, frames, qp)
+        self._samples.setdefault(key, []).append((x, math.log(seconds)))
+
+    def add_summary(self, summary: Dict, codec: str):
+        """adds the timings of a summary.csv row of a video sequence"""
+        match = _SIZE.search(str(summary.get("Dataset", "")))
+        if match is None or summary.get("num_of_coded_frame") in (None, ""):
+            return  # image datasets
+        width, height = map(int, match.groups())
+        frames = int(summary["num_of_coded_frame"])
+        for stage, seconds in _stage_seconds(summary).items():
+            self.add_sample(codec, stage, width, height, frames, summary["qp"], seconds)
+
+    def add_result_tree(self, result_path, codec: Optional[str] = None):
+        """adds the summary.csv files found under result_path"""
+        for path in iglob(join(result_path, "**", "summary.csv"), recursive=True):
+            with open(path, newline="") as f:
+                for summary in csv.DictReader(f):
+                    self.add_summary(summary, codec or _codec_of(Path(path).parent))
+
+    def add_results_db(self, results_db, result_path=None, codec=None):
+        """adds the runs of a ResultsDB, under result_path if given"""
+        for run in results_db.latest(result_path):
+            for summary in run["summary"]:
+                summary = {**summary, **(run["timings"] or {})}
+                self.add_summary(summary, codec or _codec_of(run["eval_dir"]))
+
+    def fit(self, prior_weight: float = 1.0):
+        """
+        least squares, the slopes being pulled toward PRIOR with prior_weight, which
+        keeps them where the samples do not determine them (e.g., a single size)
+        """
+        prior_x = math.sqrt(prior_weight) * np.eye(3)[1:]
+        prior_y = math.sqrt(prior_weight) * np.array(PRIOR)
+        for key, samples in self._samples.items():
+            x = np.concatenate([np.stack([s[0] for s in samples]), prior_x])
+            y = np.concatenate([[s[1] for s in samples], prior_y])
+            coefs, *_ = np.linalg.lstsq(x, y, rcond=None)
+            self.coefs[key] = [float(v) for v in coefs]
+        return self
+
+    def predict(self, codec: str, stage: str, width, height, frames, qp) -> float:
+        """seconds, from the model of the codec and stage, or of the codec"""
+        coefs = self.coefs.get(f"{codec}/{stage}")
+        if coefs is None:
+            # models of the other stages of the codec, or of all the codecs
+            candidates = [v for k, v in self.coefs.items() if k.startswith(f"{codec}/")]
+            candidates = candidates or list(self.coefs.values())
+            if not candidates:  # no timing at all: relative costs only
+                candidates = [[0.0, *PRIOR]]
+            coefs = np.mean(candidates, axis=0)
+        return math.exp(float(np.dot(coefs, _features(width, height, frames, qp))))
+
+    def predict_job(self, job: Dict, seqinfo_root=None) -> float:
+        """
+        seconds of a queued job, the size of its sequence being read from
+        <seqinfo_root>/<sequence>/seqinfo.ini, or its name and frames fields
+        """
+        if seqinfo_root is not None:
+            seq_info_path = Path(seqinfo_root) / job["sequence"] / "seqinfo.ini"
+            width, height, frames = sequence_size(seq_info_path)
+        else:
+            width, height = map(int, _SIZE.search(job["sequence"]).groups())
+            frames = job.get("frames", 1)
+        return self.predict(
+            job.get("codec", ""), job["stage"], width, height, frames, job["qp"]
+        )
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"coefs": self.coefs}, f, indent=4)
+
+    @classmethod
+    def load(cls, path) -> "CostModel":
+        with open(path, "r") as f:
+            return cls(json.load(f)["coefs"])
+
+
+def critical_path_order(jobs: Sequence[Dict], costs: Sequence[float]) -> List[Dict]:
+    """
+    Jobs in decreasing order of the cost of the longest chain of jobs they start
+    (themselves and the jobs running after them), i.e., longest job first for
+    independent jobs.
+    """
+    index = {job["id"]: i for i, job in enumerate(jobs)}
+    followers: Dict[int, List[int]] = {i: [] for i in range(len(jobs))}
+    for i, job in enumerate(jobs):
+        for dep in job.get("after", []):
+            followers[index[dep]].append(i)
+
+    chain: Dict[int, float] = {}
+
+    def chain_cost(i):
+        if i not in chain:
+            chain[i] = costs[i] + max((chain_cost(j) for j in followers[i]), default=0)
+        return chain[i]
+
+    order = sorted(range(len(jobs)), key=lambda i: -chain_cost(i))
+    return [jobs[i] for i in order]
+
+
+def lpt_pack(costs: Iterable[float], num_workers: int) -> Tuple[List[List[int]], float]:
+    """
+    Longest processing time first packing of jobs on num_workers workers, for
+    static splits (e.g., SLURM arrays without a shared queue). Returns the indices
+    of the jobs of each worker and the estimated makespan.
+    """
+    costs = list(costs)
+    bins: List[List[int]] = [[] for _ in range(num_workers)]
+    loads = np.zeros(num_workers)
+    for i in sorted(range(len(costs)), key=lambda i: -costs[i]):
+        w = int(np.argmin(loads))
+        bins[w].append(i)
+        loads[w] += costs[i]
+    return bins, float(loads.max(initial=0.0))
@@ -0,0 +1,209 @@
+# Copyright (c) 2022-2024, InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Manifests of the files produced by the dataset conversion tools
+
+A manifest records, for each output, its size, modification time and md5, and the
+size and modification time of the inputs it was converted from. Conversions run on a
+process pool and skip the outputs that are already complete, so that an interrupted
+run resumes where it stopped, and later tools validate their inputs against the
+manifest of the tool that produced them without hashing them again.
+"""
+
+import concurrent.futures as cf
+import hashlib
+import json
+import os
+import time
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from .external_exec import get_max_num_cpus
+
+__all__ = ["FileManifest", "copy_yuv_clip", "file_md5", "run_conversions"]
+
+
+def file_md5(path, chunk_size: int = 1 << 24) -> str:
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def copy_yuv_clip(src_yuv, dst_yuv, offset: int, length: int, chunk_size=1 << 26):
+    """copies length bytes of src_yuv from offset to dst_yuv, e.g., a range of frames"""
+    with open(src_yuv, "rb") as src, open(dst_yuv, "wb") as dst:
+        src.seek(offset)
+        while length > 0:
+            chunk = src.read(min(chunk_size, length))
+            if not chunk:
+                break
+            dst.write(chunk)
+            length -= len(chunk)
+
+
+def _stat(path) -> Dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _describe(path) -> Dict:
+    return {**_stat(path), "md5": file_md5(path)}
+
+
+class FileManifest:
+    """
+    Manifest of the outputs of a conversion tool, stored as json at path.
+
+    Paths are stored relative to the directory of the manifest.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.root = self.path.parent
+        self.files: Dict[str, Dict] = {}
+        if self.path.is_file():
+            with self.path.open() as f:
+                self.files = json.load(f)["files"]
+
+    def _key(self, path) -> str:
+        return os.path.relpath(os.path.abspath(path), self.root)
+
+    def _inputs(self, inputs: Iterable) -> Dict[str, Dict]:
+        return {self._key(p): _stat(p) for p in inputs}
+
+    def is_complete(self, output, inputs: Sequence = (), verify: bool = False) -> bool:
+        """output was converted from the same inputs and is unchanged since
+
+        The size and modification time are compared, and the md5 with verify=True.
+        """
+        entry = self.files.get(self._key(output))
+        if entry is None or not os.path.isfile(output):
+            return False
+        if entry["inputs"] != self._inputs(inputs):
+            return False
+        if verify:
+            return _describe(output) == entry["file"]
+        return _stat(output) == {k: entry["file"][k] for k in ("size", "mtime_ns")}
+
+    def add(self, output, inputs: Sequence = (), description: Dict = None):
+        """records output, with the description computed by the conversion worker"""
+        self.files[self._key(output)] = {
+            "file": description or _describe(output),
+            "inputs": self._inputs(inputs),
+        }
+
+    def validate(self, paths: Iterable) -> List[str]:
+        """returns the paths that are missing from the manifest or changed since"""
+        invalid = []
+        for path in paths:
+            entry = self.files.get(self._key(path))
+            if (
+                entry is None
+                or not os.path.isfile(path)
+                or _stat(path) != {k: entry["file"][k] for k in ("size", "mtime_ns")}
+            ):
+                invalid.append(str(path))
+        return invalid
+
+    def md5sums(self) -> Dict[str, str]:
+        return {k: v["file"]["md5"] for k, v in self.files.items()}
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("w") as f:
+            json.dump({"files": self.files}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def _convert(convert: Callable, output, args: Tuple) -> Dict:
+    convert(*args)
+    return _describe(output)
+
+
+def run_conversions(
+    convert: Callable,
+    jobs: Iterable[Tuple[Any, Sequence, Tuple]],
+    manifest: FileManifest,
+    num_workers: int = None,
+    verify: bool = False,
+    save_interval: float = 10.0,
+) -> int:
+    """
+    Runs convert(*args) for each (output, inputs, args) job on a process pool,
+    skipping the outputs that the manifest holds as complete.
+
+    convert must be picklable (e.g., a module-level function) and write output. The
+    manifest is saved as outputs complete, at most every save_interval seconds, and
+    at the end. When a conversion fails, the pending ones are cancelled and the
+    running ones recorded as they complete before the error is re-raised. Returns
+    the number of conversions run.
+    """
+    jobs = list(jobs)
+    todo = [
+        (output, inputs, args)
+        for output, inputs, args in jobs
+        if not manifest.is_complete(output, inputs, verify)
+    ]
+    if len(todo) < len(jobs):
+        print(f"{len(jobs) - len(todo)} of {len(jobs)} outputs complete, skipping")
+    if not todo:
+        return 0
+
+    last_save = time.monotonic()
+    with cf.ProcessPoolExecutor(num_workers or get_max_num_cpus()) as executor:
+        futures = {
+            executor.submit(_convert, convert, output, args): (output, inputs)
+            for output, inputs, args in todo
+        }
+        pending = dict(futures)
+        try:
+            for future in cf.as_completed(futures):
+                output, inputs = pending.pop(future)
+                manifest.add(output, inputs, future.result())
+                if time.monotonic() - last_save > save_interval:
+                    manifest.save()
+                    last_save = time.monotonic()
+        except BaseException:
+            # records the conversions still running before re-raising, so that a
+            # resumed run does not redo them
+            for future in pending:
+                future.cancel()
+            cf.wait(pending)
+            for future, (output, inputs) in pending.items():
+                if not future.cancelled() and future.exception() is None:
+                    manifest.add(output, inputs, future.result())
+            raise
+        finally:
+            manifest.save()
+
+    return len(todo)
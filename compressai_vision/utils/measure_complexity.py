@@ -1,6 +1,12 @@
+import fcntl
+import hashlib
+import json
 import operator
+import os
 
 from functools import reduce
+from pathlib import Path
+from typing import Callable, Dict
 
 import torch
 
@@ -55,27 +61,52 @@ def calc_complexity_nn_part2_dn53(vision_model, dec_features):
     return kmacs, pixels
 
 
-def calc_complexity_nn_part1_plyr(vision_model, img):
+def calc_complexity_nn_part1_plyr(vision_model, img, cache=None):
     # input pre-processing
     imgs = vision_model.model.preprocess_image(img)
     _, C, H, W = imgs.tensor.shape
 
-    # backbone
-    partial_model = vision_model.backbone
+    pixels = reduce(operator.mul, [p_size for p_size in imgs.tensor.shape])
 
-    kmacs, _ = measure_mac(
-        partial_model=partial_model, input_res=(C, H, W), input_constructor=None
-    )
+    def _measure():
+        # backbone
+        partial_model = vision_model.backbone
 
-    pixels = reduce(operator.mul, [p_size for p_size in imgs.tensor.shape])
+        kmacs, _ = measure_mac(
+            partial_model=partial_model, input_res=(C, H, W), input_constructor=None
+        )
+        return kmacs
+
+    if cache is None:
+        return _measure(), pixels
+
+    kmacs = cache.get_or_measure("nn_part_1_plyr", [imgs.tensor.shape], _measure)
 
     return kmacs, pixels
 
 
-def calc_complexity_nn_part2_plyr(vision_model, data, dec_features):
+def calc_complexity_nn_part2_plyr(vision_model, data, dec_features, cache=None):
     if isinstance(data[0], list):  # image task
         data = {k: v[0] for k, v in data.items()}
 
+    pixels = sum(
+        [reduce(operator.mul, [p_size for p_size in d.shape]) for d in data.values()]
+    )
+
+    if cache is None:
+        return _measure_nn_part2_plyr(vision_model, data, dec_features), pixels
+
+    # the roi head input depends on the network input size as well
+    kmacs = cache.get_or_measure(
+        "nn_part_2_plyr",
+        [d.shape for d in data.values()] + [dec_features["input_size"][0]],
+        lambda: _measure_nn_part2_plyr(vision_model, data, dec_features),
+    )
+
+    return kmacs, pixels
+
+
+def _measure_nn_part2_plyr(vision_model, data, dec_features):
     device = vision_model.device
 
     input_res_list, partial_model_lst, input_constructure_lst = [], [], []
@@ -114,11 +145,7 @@ def calc_complexity_nn_part2_plyr(vision_model, data, dec_features):
 
         kmacs_sum = kmacs_sum + kmacs
 
-    pixels = sum(
-        [reduce(operator.mul, [p_size for p_size in d.shape]) for d in data.values()]
-    )
-
-    return kmacs_sum, pixels
+    return kmacs_sum
 
 
 def measure_mac(partial_model, input_res, input_constructor):
@@ -133,6 +160,98 @@ def measure_mac(partial_model, input_res, input_constructor):
     return macs / 1_000, params
 
 
+_weights_digests = {}
+
+
+def _weights_digest(weights_path: str) -> str:
+    path = Path(weights_path)
+    if not path.is_file():
+        return str(weights_path)
+
+    stat = path.stat()
+    memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _weights_digests:
+        sha = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        _weights_digests[memo_key] = sha.hexdigest()
+
+    return _weights_digests[memo_key]
+
+
+class ComplexityCache:
+    """On-disk cache of KMAC measurements shared across runs.
+
+    KMACs of a partial network only depend on the model, its split point and
+    the shapes of the tensors it is traced with, so a measurement is stored
+    once per (model cfg, weights hash, split point, part, input shapes) and
+    reused for every other image with the same shapes.
+
+    Note: the number of proposals reaching the roi heads is assumed to be
+    fixed for a given input size, which holds for the test-time top-k
+    setting of the detectron2 models.
+    """
+
+    CACHE_FILE_NAME = "complexity_cache.json"
+
+    def __init__(self, cache_dir: str, vision_model):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_path = self.cache_dir / self.CACHE_FILE_NAME
+
+        self.model_key = hashlib.sha1(
+            json.dumps(
+                [
+                    vision_model.__class__.__name__,
+                    str(vision_model.model_cfg_path),
+                    _weights_digest(vision_model.pretrained_weight_path),
+                    str(getattr(vision_model, "split_id", None)),
+                ]
+            ).encode()
+        ).hexdigest()[:16]
+
+        self._entries = self._read()
+        self.hits = 0
+        self.misses = 0
+
+    def _read(self) -> Dict:
+        if not self.cache_path.is_file():
+            return {}
+        try:
+            with open(self.cache_path, "r") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+    def _write(self, key: str, kmacs: float):
+        # merge with the entries other runs may have added in the meantime
+        with open(self.cache_dir / f"{self.CACHE_FILE_NAME}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = self._read()
+            entries[key] = kmacs
+            tmp_path = self.cache_dir / f"{self.CACHE_FILE_NAME}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entries, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.cache_path)
+        self._entries = entries
+
+    def key(self, part: str, shapes) -> str:
+        shapes = "|".join("x".join(str(int(s)) for s in shape) for shape in shapes)
+        return f"{self.model_key}/{part}/{shapes}"
+
+    def get_or_measure(self, part: str, shapes, measure: Callable[[], float]):
+        key = self.key(part, shapes)
+        if key in self._entries:
+            self.hits += 1
+            return self._entries[key]
+
+        self.misses += 1
+        kmacs = float(measure())
+        self._write(key, kmacs)
+        return kmacs
+
+
 class dummy:
     def __init__(self, img_size: list):
         self.image_sizes = img_size
@@ -0,0 +1,137 @@
+# Copyright (c) 2022-2024, InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import logging
+
+from contextlib import contextmanager
+from typing import Dict
+
+import torch
+
+from .external_exec import get_max_num_cpus
+
+__all__ = ["ThreadBudget", "thread_budget"]
+
+PHASES = ["nn_part1", "encode", "decode", "nn_part2"]
+
+# threads of the anchors' ffmpeg encodes, x264/x265 outputs depend on the thread count
+DEFAULT_CODEC_THREADS = 4
+
+
+class ThreadBudget:
+    """
+    Shares one budget of CPU cores between the consumers of a run.
+
+    The budget (misc.threads.cores, or all the cores of the affinity mask) is divided
+    between the dataloader workers, the torch intra-op threads and the external codec
+    processes, phase by phase:
+
+    - nn_part1 / nn_part2: torch threads get the cores left by the dataloader workers
+    - encode / decode: codec processes get the cores, torch keeps a single thread
+
+    A codec process running with several threads (e.g., ffmpeg) takes as many cores
+    from the budget, so fewer processes are run in parallel. As the bitstreams depend
+    on it, the number of threads of such a process is fixed (DEFAULT_CODEC_THREADS)
+    unless misc.threads.codec_threads is set, 0 to follow the budget.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.configure()
+
+    def configure(
+        self,
+        cores: int = 0,
+        dataloader_workers: int = -1,
+        codec_threads: int = DEFAULT_CODEC_THREADS,
+    ):
+        available = get_max_num_cpus()
+        self.cores = min(cores, available) if cores > 0 else available
+
+        # a worker takes a core from the budget, but torch keeps at least one
+        self._max_dataloader_workers = self.cores - 1
+        if dataloader_workers >= 0:
+            self._max_dataloader_workers = min(dataloader_workers, self.cores - 1)
+        self._dataloader_workers = 0
+
+        # not capped by the budget, so that bitstreams do not depend on the node
+        self._codec_threads = codec_threads if codec_threads > 0 else self.cores
+
+        self.allocation = self._allocate()
+        self.logger.debug(f"Thread budget: {self.allocation}")
+
+    def _allocate(self) -> Dict:
+        nn_threads = max(1, self.cores - self._dataloader_workers)
+        codec = {
+            "torch_threads": 1,
+            "codec_slots": self.cores,
+            "codec_threads": self._codec_threads,
+        }
+        return {
+            "cores": self.cores,
+            "dataloader_workers": self._dataloader_workers,
+            "nn_part1": {"torch_threads": nn_threads},
+            "encode": dict(codec),
+            "decode": dict(codec),
+            "nn_part2": {"torch_threads": nn_threads},
+        }
+
+    def dataloader_workers(self, requested: int) -> int:
+        """number of dataloader workers, at most the budgeted ones"""
+        self._dataloader_workers = min(requested, self._max_dataloader_workers)
+        self.allocation = self._allocate()
+        return self._dataloader_workers
+
+    def codec_slots(self, num_jobs: int, threads_per_job: int = 1) -> int:
+        """number of codec processes to run at once"""
+        return max(1, min(num_jobs, self.cores // max(1, threads_per_job)))
+
+    def codec_threads(self) -> int:
+        """number of threads of a multi-threaded codec process, e.g., ffmpeg"""
+        return self._codec_threads
+
+    def torch_threads(self, phase: str) -> int:
+        assert phase in PHASES, f"Unknown phase {phase}"
+        return self.allocation[phase]["torch_threads"]
+
+    @contextmanager
+    def phase(self, name: str):
+        """sets the torch intra-op threads of a pipeline phase"""
+        previous = torch.get_num_threads()
+        threads = self.torch_threads(name)
+        if threads != previous:
+            torch.set_num_threads(threads)
+        try:
+            yield
+        finally:
+            if threads != previous:
+                torch.set_num_threads(previous)
+
+
+thread_budget = ThreadBudget()
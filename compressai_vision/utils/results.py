@@ -0,0 +1,180 @@
+# Copyright (c) 2022-2024, InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+__all__ = ["CodedResults"]
+
+
+class _Interner:
+    """maps each distinct value to a small integer code"""
+
+    def __init__(self):
+        self.codes: Dict[Any, int] = {}
+        self.values: List[Any] = []
+
+    def __call__(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class CodedResults:
+    """
+    Columnar accumulator of the per-frame coding results of a pipeline run.
+
+    Each field is stored in a preallocated numpy column that grows geometrically,
+    instead of one dict per frame. File names and qps are interned, so that a
+    column holds small integer codes and each distinct string is stored once.
+
+    The columns are exposed as a DataFrame (file names and qps as categoricals) for
+    the encode details, and the bpp and bitrate are computed over whole columns.
+    """
+
+    _COLUMNS = {
+        "file_id": np.int32,
+        "qp_id": np.int32,
+        "bytes": np.float64,
+        "coded_order": np.int64,
+        "org_height": np.int32,
+        "org_width": np.int32,
+        "input_height": np.int32,
+        "input_width": np.int32,
+    }
+
+    def __init__(self, capacity: int = 1024):
+        self._size = 0
+        self._file_names = _Interner()
+        self._qps = _Interner()
+        self._columns = {
+            name: np.empty(capacity, dtype) for name, dtype in self._COLUMNS.items()
+        }
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self):
+        capacity = 2 * len(self._columns["bytes"])
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, column.dtype)
+            grown[: self._size] = column[: self._size]
+            self._columns[name] = grown
+
+    def append(
+        self,
+        file_name: str,
+        qp,
+        bytes: float,
+        coded_order: int,
+        org_input_size: Sequence[int],
+        input_size: Optional[Sequence[int]] = None,
+    ):
+        """adds the results of a frame, org_input_size and input_size given as (h, w)"""
+        if self._size == len(self._columns["bytes"]):
+            self._grow()
+
+        i = self._size
+        input_height, input_width = input_size if input_size is not None else (-1, -1)
+        row = {
+            "file_id": self._file_names(file_name),
+            "qp_id": self._qps(qp),
+            "bytes": bytes,
+            "coded_order": coded_order,
+            "org_height": org_input_size[0],
+            "org_width": org_input_size[1],
+            "input_height": input_height,
+            "input_width": input_width,
+        }
+        for name, value in row.items():
+            self._columns[name][i] = value
+        self._size += 1
+
+    def column(self, name: str) -> np.ndarray:
+        """view on the filled part of a column"""
+        return self._columns[name][: self._size]
+
+    @property
+    def qp(self):
+        """qp of the first frame, one qp being used per run"""
+        return self._qps.values[self.column("qp_id")[0]]
+
+    @property
+    def total_pixels(self) -> np.ndarray:
+        return self.column("org_height").astype(np.int64) * self.column("org_width")
+
+    def bpp(self) -> float:
+        """average bits per pixel over all the frames"""
+        return self.column("bytes").sum() * 8 / self.total_pixels.sum()
+
+    def bitrate(self, fps: float, total_frame: int) -> float:
+        """bitrate in kbps of a sequence of total_frame frames at fps"""
+        return (self.column("bytes").sum() * 8 * fps) / (1000 * total_frame)
+
+    @staticmethod
+    def _sizes(heights: np.ndarray, widths: np.ndarray) -> pd.Categorical:
+        sizes, codes = np.unique(
+            np.stack([heights, widths], axis=1), axis=0, return_inverse=True
+        )
+        categories = [f"{h}x{w}" for h, w in sizes]
+        return pd.Categorical.from_codes(codes.reshape(-1), categories)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """DataFrame of the encode details, built on views of the columns"""
+        # distinct paths may share a file name
+        file_names, file_codes = np.unique(
+            [Path(f).name for f in self._file_names.values], return_inverse=True
+        )
+        data = {
+            "file_name": pd.Categorical.from_codes(
+                file_codes.reshape(-1)[self.column("file_id")], file_names
+            ),
+            "qp": pd.Categorical.from_codes(self.column("qp_id"), self._qps.values),
+            "bytes": self.column("bytes"),
+            "coded_order": self.column("coded_order"),
+        }
+        if (self.column("input_height") >= 0).any():
+            data["input_size"] = self._sizes(
+                self.column("input_height"), self.column("input_width")
+            )
+        data["org_input_size"] = self._sizes(
+            self.column("org_height"), self.column("org_width")
+        )
+        data["total_pixels"] = self.total_pixels
+
+        return pd.DataFrame(data, copy=False)
+
+    def to_parquet(self, path: str):
+        """writes the encode details to a Parquet file (requires pyarrow)"""
+        self.to_dataframe().to_parquet(path, index=False)
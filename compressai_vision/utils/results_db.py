@@ -0,0 +1,235 @@
+# Copyright (c) 2022-2024, InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Append-only database of the results of the evaluation runs
+
+Each evaluation run appends one row to a SQLite database: the rows of its
+summary.csv along with the hash of its configuration, the coded bytes, the timings,
+the complexity in KMAC/pixel and the full metrics. The rows are indexed by the
+evaluation folder of the run, so that the scripts in scripts/metrics gather the
+results of a tree of runs with one indexed query, instead of scanning the tree for
+summary.csv and evaluation files.
+
+Rows are never updated. A run writing again in the same evaluation folder (e.g., with
+evaluator.overwrite_results) appends a new row, which supersedes the former ones.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from omegaconf import OmegaConf
+
+__all__ = ["ResultsDB", "append_to_results_db", "config_hash"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    config_hash TEXT NOT NULL,
+    eval_dir TEXT NOT NULL,
+    dataset_name TEXT NOT NULL,
+    qp,
+    bytes REAL,
+    num_frames INTEGER,
+    seqinfo_path TEXT,
+    annotation_path TEXT,
+    summary TEXT NOT NULL,
+    timings TEXT,
+    kmac TEXT,
+    metrics TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_eval_dir ON runs (eval_dir, id);
+CREATE INDEX IF NOT EXISTS runs_dataset_name ON runs (dataset_name, qp);
+CREATE INDEX IF NOT EXISTS runs_config_hash ON runs (config_hash);
+"""
+
+_JSON_COLUMNS = ("summary", "timings", "kmac", "metrics")
+
+
+def _plain(obj):
+    """converts numpy and torch values, found in the metrics, to json types"""
+    if isinstance(obj, dict):
+        return {str(k): _plain(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_plain(v) for v in obj]
+    if isinstance(obj, (str, int, float, bool)) or obj is None:
+        return obj
+    if hasattr(obj, "tolist"):  # arrays, tensors and their scalars
+        return _plain(obj.tolist())
+    return str(obj)
+
+
+def append_to_results_db(conf, evaluator, summary_df, coded_res, timings, **kwargs):
+    """appends the run to the database at conf.misc.results_db, if set"""
+    path = conf.misc.get("results_db", "")
+    if not path:
+        return
+
+    with ResultsDB(path) as db:
+        db.append_run(conf, evaluator, summary_df, coded_res, timings, **kwargs)
+    print(f"Results appended to : {path}\n")
+
+
+def config_hash(conf) -> str:
+    """md5 of the resolved configuration of a run"""
+    container = OmegaConf.to_container(conf, resolve=True)
+    encoded = json.dumps(_plain(container), sort_keys=True).encode()
+    return hashlib.md5(encoded).hexdigest()
+
+
+def _dir_range(path) -> tuple:
+    """bounds of the paths under the folder path, for an indexed range scan"""
+    prefix = os.path.join(os.path.abspath(path), "")
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+class ResultsDB:
+    """
+    Append-only store of the results of the evaluation runs, in a SQLite file at path.
+
+    Concurrent runs may append to the same database, the writes being serialized by
+    SQLite's file lock (timeout is how long a write waits for it, in seconds).
+    """
+
+    def __init__(self, path, timeout: float = 60.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=timeout)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def append(
+        self,
+        config_hash: str,
+        eval_dir: str,
+        dataset_name: str,
+        summary: List[Dict],
+        qp=None,
+        bytes: Optional[float] = None,
+        num_frames: Optional[int] = None,
+        seqinfo_path: Optional[str] = None,
+        annotation_path: Optional[str] = None,
+        timings: Optional[Dict] = None,
+        kmac: Optional[Dict] = None,
+        metrics: Any = None,
+    ) -> int:
+        """appends the results of a run, summary being the rows of its summary.csv"""
+        row = {
+            "created": time.time(),
+            "config_hash": config_hash,
+            "eval_dir": os.path.abspath(eval_dir),
+            "dataset_name": dataset_name,
+            "qp": _plain(qp),
+            "bytes": _plain(bytes),
+            "num_frames": num_frames,
+            "seqinfo_path": seqinfo_path and str(seqinfo_path),
+            "annotation_path": annotation_path and str(annotation_path),
+        }
+        for name, value in zip(_JSON_COLUMNS, (summary, timings, kmac, metrics)):
+            row[name] = None if value is None else json.dumps(_plain(value))
+
+        with self._conn:
+            cursor = self._conn.execute(
+                f"INSERT INTO runs ({', '.join(row)}) "
+                f"VALUES ({', '.join('?' * len(row))})",
+                tuple(row.values()),
+            )
+        return cursor.lastrowid
+
+    def append_run(
+        self,
+        conf,
+        evaluator,
+        summary_df,
+        coded_res,
+        timings: Dict,
+        kmac: Optional[Dict] = None,
+        metrics: Any = None,
+    ) -> int:
+        """appends the results of a pipeline run, as written to its summary.csv"""
+        return self.append(
+            config_hash=config_hash(conf),
+            eval_dir=evaluator.output_dir,
+            dataset_name=evaluator.dataset_name,
+            summary=summary_df.to_dict("records"),
+            qp=coded_res.qp if len(coded_res) else "uncmp",
+            bytes=coded_res.column("bytes").sum(),
+            num_frames=len(coded_res),
+            seqinfo_path=getattr(evaluator, "seqinfo_path", None),
+            annotation_path=getattr(evaluator, "annotation_path", None),
+            timings=timings,
+            kmac=kmac,
+            metrics=metrics,
+        )
+
+    def latest(self, result_path=None, config_hash: Optional[str] = None) -> List[Dict]:
+        """
+        Latest row of each evaluation folder under result_path (all if None),
+        sorted by dataset name and qp, with the json columns decoded.
+        """
+        where, params = [], []
+        if result_path is not None:
+            where.append("eval_dir >= ? AND eval_dir < ?")
+            params.extend(_dir_range(result_path))
+        if config_hash is not None:
+            where.append("config_hash = ?")
+            params.append(config_hash)
+        where = f"WHERE {' AND '.join(where)}" if where else ""
+
+        rows = self._conn.execute(
+            "SELECT * FROM runs WHERE id IN "
+            f"(SELECT MAX(id) FROM runs {where} GROUP BY eval_dir) "
+            "ORDER BY dataset_name, qp",
+            params,
+        ).fetchall()
+
+        out = []
+        for row in rows:
+            row = dict(row)
+            for name in _JSON_COLUMNS:
+                if row[name] is not None:
+                    row[name] = json.loads(row[name])
+            out.append(row)
+        return out
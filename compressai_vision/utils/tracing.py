@@ -0,0 +1,195 @@
+# Copyright (c) 2022-2024, InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import csv
+import json
+import os
+import resource
+import threading
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+import torch
+
+from .misc import time_measure
+
+__all__ = ["Tracer", "tracer"]
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def _rss_bytes() -> int:
+    """current resident set size, or peak size where /proc is not available"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _device_memory_bytes():
+    if torch.cuda.is_available() and torch.cuda.is_initialized():
+        return torch.cuda.memory_allocated(), torch.cuda.max_memory_allocated()
+    return None, None
+
+
+class Tracer:
+    """
+    Records timestamped spans of pipeline stages and sub-stages, with the memory in use.
+
+    Spans may overlap and be nested, and may come from several threads (e.g., parallel
+    encoding jobs). A disabled tracer records nothing.
+
+    Traces are exported as Chrome trace JSON, to be opened with chrome://tracing or
+    https://ui.perfetto.dev, and as a flat CSV table.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._spans: List[Dict] = []
+            self._origin = time_measure()
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+        if enabled:
+            self.reset()
+
+    @contextmanager
+    def span(self, name: str, cat: str = "pipeline", **args):
+        if not self.enabled:
+            yield
+            return
+
+        start = time_measure()
+        rss_begin = _rss_bytes()
+        try:
+            yield
+        finally:
+            end = time_measure()
+            device_mem, device_peak = _device_memory_bytes()
+            span = {
+                "name": name,
+                "cat": cat,
+                "start": start - self._origin,
+                "duration": end - start,
+                "thread": threading.current_thread().name,
+                "tid": threading.get_ident(),
+                "rss_begin": rss_begin,
+                "rss_end": _rss_bytes(),
+                "device_mem": device_mem,
+                "device_peak": device_peak,
+                "args": {k: str(v) for k, v in args.items()},
+            }
+            with self._lock:
+                self._spans.append(span)
+
+    @property
+    def spans(self) -> List[Dict]:
+        with self._lock:
+            return sorted(self._spans, key=lambda s: s["start"])
+
+    def to_chrome_trace(self) -> Dict:
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            args = {
+                **span["args"],
+                "rss_begin_mb": span["rss_begin"] / 2**20,
+                "rss_end_mb": span["rss_end"] / 2**20,
+            }
+            if span["device_mem"] is not None:
+                args["device_mem_mb"] = span["device_mem"] / 2**20
+                args["device_peak_mb"] = span["device_peak"] / 2**20
+
+            events.append(
+                {
+                    "name": span["name"],
+                    "cat": span["cat"],
+                    "ph": "X",
+                    "ts": span["start"] * 1e6,
+                    "dur": span["duration"] * 1e6,
+                    "pid": pid,
+                    "tid": span["tid"],
+                    "args": args,
+                }
+            )
+            counters = {"rss_mb": span["rss_end"] / 2**20}
+            if span["device_mem"] is not None:
+                counters["device_mem_mb"] = span["device_mem"] / 2**20
+            events.append(
+                {
+                    "name": "memory",
+                    "ph": "C",
+                    "ts": (span["start"] + span["duration"]) * 1e6,
+                    "pid": pid,
+                    "args": counters,
+                }
+            )
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, output_dir: str, name: str = "trace"):
+        """writes <name>.json (Chrome trace) and <name>.csv in output_dir"""
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        with open(output_dir / f"{name}.json", "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+        fields = [
+            "name",
+            "cat",
+            "start",
+            "duration",
+            "thread",
+            "rss_begin",
+            "rss_end",
+            "device_mem",
+            "device_peak",
+            "args",
+        ]
+        with open(output_dir / f"{name}.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            for span in self.spans:
+                writer.writerow({**span, "args": json.dumps(span["args"])})
+
+
+# process-wide tracer, enabled by the run scripts (misc.tracing)
+tracer = Tracer()
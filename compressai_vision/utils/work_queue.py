@@ -0,0 +1,408 @@
+# Copyright (c) 2022-2024, InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Queue of the jobs of a sweep, in a directory shared by the nodes running them
+
+A sweep is a manifest of (sequence, qp, stage) jobs, each one a command line. Workers,
+on any number of nodes, pull the next job from the queue until all the jobs are done,
+so that faster nodes (or nodes given cheaper sequences) take more of the work. A job
+whose stage follows another stage of the same sequence and qp (e.g., decode after
+encode) waits for it to succeed.
+
+Jobs are claimed with lock files, created exclusively (O_EXCL, atomic on local
+filesystems and NFSv3+). The worker running a job touches its claim every heartbeat
+seconds, and a claim not touched for stale_after seconds, left by a dead node, is
+reclaimed by another worker. A worker finding its claim taken over (e.g., after a
+stall) stops its job and does not record a result::
+
+    queue_dir/
+        manifest.json       the jobs, in the order they are claimed
+        claims/<job_id>     claim of a running job, holding the id of its worker
+        done/<job_id>.json  worker, return code and times of a finished job
+        logs/<job_id>.log   output of the job
+"""
+
+import json
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+import uuid
+
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from .system import hostname
+
+__all__ = ["WorkQueue", "make_sweep_jobs", "run_worker", "run_local_workers"]
+
+
+def _write_json_atomic(path: Path, data):
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+    with tmp.open("w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp, path)
+
+
+def _create_exclusive(path: Path, content: str) -> bool:
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as f:
+        f.write(content)
+    return True
+
+
+def _job_id(sequence: str, qp, stage: str) -> str:
+    return f"{sequence}_qp{qp}_{stage}".replace(os.sep, "-")
+
+
+def make_sweep_jobs(
+    sequences: Sequence[str],
+    qps: Sequence,
+    cmd: str,
+    stages: Sequence[str] = ("full",),
+) -> List[Dict]:
+    """
+    Jobs of a sweep over sequences, qps and stages, in that order. cmd is a command
+    line template formatted with {sequence}, {qp} and {stage}, and each stage
+    of a (sequence, qp) runs after the previous one.
+    """
+    jobs = []
+    for sequence in sequences:
+        for qp in qps:
+            previous = None
+            for stage in stages:
+                job_id = _job_id(sequence, qp, stage)
+                jobs.append(
+                    {
+                        "id": job_id,
+                        "sequence": sequence,
+                        "qp": qp,
+                        "stage": stage,
+                        "cmd": shlex.split(
+                            cmd.format(sequence=sequence, qp=qp, stage=stage)
+                        ),
+                        "after": [] if previous is None else [previous],
+                    }
+                )
+                previous = job_id
+    return jobs
+
+
+class WorkQueue:
+    """
+    Job queue of a sweep, stored in the directory root shared by the workers.
+    """
+
+    def __init__(self, root, heartbeat: float = 30.0, stale_after: float = None):
+        self.root = Path(root)
+        self.heartbeat = heartbeat
+        self.stale_after = 4 * heartbeat if stale_after is None else stale_after
+        self.claims_dir = self.root / "claims"
+        self.done_dir = self.root / "done"
+        self.logs_dir = self.root / "logs"
+        self._jobs = None
+
+    @classmethod
+    def create(cls, root, jobs: List[Dict], **kwargs) -> "WorkQueue":
+        """creates the queue of jobs at root, or opens it if it has the same jobs"""
+        queue = cls(root, **kwargs)
+        ids = [job["id"] for job in jobs]
+        if len(set(ids)) != len(ids):
+            raise ValueError("job ids shall be unique")
+
+        for d in (queue.claims_dir, queue.done_dir, queue.logs_dir):
+            d.mkdir(parents=True, exist_ok=True)
+
+        manifest = queue.root / "manifest.json"
+        if manifest.is_file():
+            if queue.jobs != jobs:
+                raise ValueError(f"{root} already holds a queue of other jobs")
+            return queue
+
+        _write_json_atomic(manifest, {"jobs": jobs})
+        queue._jobs = jobs
+        return queue
+
+    @property
+    def jobs(self) -> List[Dict]:
+        if self._jobs is None:
+            with (self.root / "manifest.json").open("r") as f:
+                self._jobs = json.load(f)["jobs"]
+        return self._jobs
+
+    def _claim_path(self, job_id) -> Path:
+        return self.claims_dir / job_id
+
+    def _done_path(self, job_id) -> Path:
+        return self.done_dir / f"{job_id}.json"
+
+    def result(self, job_id) -> Optional[Dict]:
+        try:
+            with self._done_path(job_id).open("r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _is_stale(self, path: Path) -> bool:
+        try:
+            return time.time() - path.stat().st_mtime > self.stale_after
+        except FileNotFoundError:
+            return False
+
+    def _reclaim(self, job_id, worker: str) -> bool:
+        """takes over the stale claim of a job, under a lock serializing reclaims"""
+        lock = self.claims_dir / f".{job_id}.reclaim"
+        if self._is_stale(lock):  # left by a worker dying while reclaiming
+            lock.unlink(missing_ok=True)
+        if not _create_exclusive(lock, worker):
+            return False
+
+        try:
+            claim = self._claim_path(job_id)
+            if not self._is_stale(claim):  # touched or released meanwhile
+                return False
+            tmp = self.claims_dir / f".{job_id}.{uuid.uuid4().hex}"
+            tmp.write_text(worker)
+            os.replace(tmp, claim)
+            return True
+        finally:
+            lock.unlink(missing_ok=True)
+
+    def _ready(self, job, results: Dict) -> bool:
+        return all(
+            results.get(dep) is not None and results[dep]["returncode"] == 0
+            for dep in job.get("after", [])
+        )
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """claims the next pending job, None if no job can be claimed now"""
+        results = {job["id"]: self.result(job["id"]) for job in self.jobs}
+        for job in self.jobs:
+            if results[job["id"]] is not None or not self._ready(job, results):
+                continue
+
+            claim = self._claim_path(job["id"])
+            if _create_exclusive(claim, worker):
+                if self.result(job["id"]) is not None:  # finished meanwhile
+                    claim.unlink(missing_ok=True)
+                    continue
+                return job
+            if self._is_stale(claim) and self._reclaim(job["id"], worker):
+                return job
+        return None
+
+    def owns(self, job_id, worker: str) -> bool:
+        try:
+            return self._claim_path(job_id).read_text() == worker
+        except FileNotFoundError:
+            return False
+
+    def touch(self, job_id):
+        os.utime(self._claim_path(job_id))
+
+    def complete(self, job_id, worker: str, returncode: int, start: float) -> bool:
+        """records the result of a job, unless another worker took over its claim"""
+        if not self.owns(job_id, worker):
+            return False
+
+        _write_json_atomic(
+            self._done_path(job_id),
+            {
+                "worker": worker,
+                "returncode": returncode,
+                "start": start,
+                "elapsed": time.time() - start,
+            },
+        )
+        self._claim_path(job_id).unlink(missing_ok=True)
+        return True
+
+    def reset(self, failed_only: bool = True) -> List[str]:
+        """makes the failed jobs (all the finished ones if not failed_only) pending"""
+        reset = []
+        for job in self.jobs:
+            result = self.result(job["id"])
+            if result is None or (failed_only and result["returncode"] == 0):
+                continue
+            self._done_path(job["id"]).unlink(missing_ok=True)
+            reset.append(job["id"])
+        return reset
+
+    def status(self) -> Dict[str, List[str]]:
+        """ids of the done, failed, running, stale (dead worker) and pending jobs"""
+        status = {k: [] for k in ("done", "failed", "running", "stale", "pending")}
+        for job in self.jobs:
+            result = self.result(job["id"])
+            claim = self._claim_path(job["id"])
+            if result is not None:
+                status["done" if result["returncode"] == 0 else "failed"].append(
+                    job["id"]
+                )
+            elif claim.exists():
+                status["stale" if self._is_stale(claim) else "running"].append(
+                    job["id"]
+                )
+            else:
+                status["pending"].append(job["id"])
+        return status
+
+    def finished(self) -> bool:
+        """all the jobs are done, or can not run because a job they follow failed"""
+        results = {job["id"]: self.result(job["id"]) for job in self.jobs}
+        after = {job["id"]: job.get("after", []) for job in self.jobs}
+        blocked = {}
+
+        def is_blocked(job_id) -> bool:
+            # a failure blocks the whole chain of jobs following it, not only the next
+            if job_id not in blocked:
+                blocked[job_id] = False  # in case of a cycle in the dependencies
+                blocked[job_id] = any(
+                    results[dep]["returncode"] != 0
+                    if results.get(dep) is not None
+                    else is_blocked(dep)
+                    for dep in after.get(job_id, [])
+                )
+            return blocked[job_id]
+
+        return all(
+            results[job["id"]] is not None or is_blocked(job["id"])
+            for job in self.jobs
+        )
+
+
+def _stop_process(proc: subprocess.Popen, grace: float):
+    """terminates the process group of the job (e.g., a script and its children)"""
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            proc.wait(grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def _heartbeat(
+    queue: WorkQueue,
+    job_id,
+    worker: str,
+    proc: subprocess.Popen,
+    stop: threading.Event,
+):
+    while not stop.wait(queue.heartbeat):
+        if not queue.owns(job_id, worker):
+            # the new owner runs the job again, in the same output directories
+            print(f"[{worker}] lost the claim of {job_id}, stopping it")
+            _stop_process(proc, grace=queue.heartbeat)
+            return
+        queue.touch(job_id)
+
+
+def _run_job(queue: WorkQueue, job: Dict, worker: str) -> Optional[int]:
+    """runs the job, returns its return code or None if its claim was lost"""
+    start = time.time()
+    with (queue.logs_dir / f"{job['id']}.log").open("w") as log:
+        proc = subprocess.Popen(
+            job["cmd"], stdout=log, stderr=subprocess.STDOUT, start_new_session=True
+        )
+        stop = threading.Event()
+        beat = threading.Thread(
+            target=_heartbeat,
+            args=(queue, job["id"], worker, proc, stop),
+            daemon=True,
+        )
+        beat.start()
+        try:
+            returncode = proc.wait()
+        finally:
+            stop.set()
+            beat.join()
+
+    if not queue.complete(job["id"], worker, returncode, start):
+        return None
+    return returncode
+
+
+def run_worker(
+    queue: WorkQueue,
+    worker: Optional[str] = None,
+    max_jobs: Optional[int] = None,
+    poll: float = 10.0,
+) -> int:
+    """
+    Runs the jobs of the queue, one at a time, until all of them are finished (the
+    worker waiting for running ones, which it reclaims if their node dies) or
+    max_jobs were run. Returns the number of jobs run.
+    """
+    if worker is None:
+        worker = f"{hostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    num_jobs = 0
+    while max_jobs is None or num_jobs < max_jobs:
+        job = queue.claim(worker)
+        if job is None:
+            if queue.finished():
+                break
+            time.sleep(poll)
+            continue
+
+        print(f"[{worker}] running {job['id']}: {' '.join(job['cmd'])}")
+        returncode = _run_job(queue, job, worker)
+        if returncode is None:
+            print(f"[{worker}] dropped {job['id']}, reclaimed by another worker")
+            continue
+        print(f"[{worker}] finished {job['id']} with return code {returncode}")
+        num_jobs += 1
+
+    return num_jobs
+
+
+def run_local_workers(queue: WorkQueue, num_workers: int, **kwargs) -> int:
+    """stand-in for a multi-node sweep: num_workers workers on this machine"""
+    workers = [
+        threading.Thread(
+            target=run_worker,
+            args=(queue, f"{hostname()}-{os.getpid()}-local{i}"),
+            kwargs=kwargs,
+        )
+        for i in range(num_workers)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    return len(queue.status()["done"])
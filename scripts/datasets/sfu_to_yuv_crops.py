@@ -7,6 +7,12 @@ import os
 
 from sfu_dicts import fr_dict, res_dict, seq_dict
 
+from compressai_vision.utils.manifest import (
+    FileManifest,
+    copy_yuv_clip,
+    run_conversions,
+)
+
 # Edit following paths as needed:
 SRC_YUV_DIR = os.path.expandvars("$SEQUENCE_DIR/x1100")
 DST_YUV_DIR = os.path.expandvars("$VCM_TESTDATA/SFU_HW_Obj-v3.2_supplied_jsons")
@@ -15,7 +21,7 @@ DST_YUV_DIR = os.path.expandvars("$VCM_TESTDATA/SFU_HW_Obj-v3.2_supplied_jsons")
 BYTES_PER_SAMPLE = 1.5
 
 
-def generate_yuv_clip(
+def yuv_clip_job(
     sequence, sequence_name, width, height, frames_to_be_encoded, frame_skip
 ):
     src_yuvs = os.listdir(SRC_YUV_DIR)
@@ -33,21 +39,26 @@ def generate_yuv_clip(
     offset = frame_size * frame_skip
     length = frame_size * frames_to_be_encoded
 
-    with open(src_yuv, "rb") as f:
-        f.seek(offset)
-        bytes = f.read(length)
-
-    with open(dst_yuv, "wb") as f:
-        f.write(bytes)
+    return dst_yuv, [src_yuv], (src_yuv, dst_yuv, offset, length)
 
 
 def main():
+    jobs = []
     for sequence, (clas, sequence_name) in seq_dict.items():
         width, height = res_dict[clas]
         intra_period, frame_rate, frames_to_be_encoded, frame_skip = fr_dict[sequence]
-        generate_yuv_clip(
-            sequence, sequence_name, width, height, frames_to_be_encoded, frame_skip
+        jobs.append(
+            yuv_clip_job(
+                sequence, sequence_name, width, height, frames_to_be_encoded, frame_skip
+            )
         )
 
+    # compare with the md5sums listed in README.md
+    manifest = FileManifest(os.path.join(DST_YUV_DIR, "manifest.json"))
+    run_conversions(copy_yuv_clip, jobs, manifest)
+    for name, md5 in sorted(manifest.md5sums().items()):
+        print(md5, name)
+
 
-main()
+if __name__ == "__main__":
+    main()
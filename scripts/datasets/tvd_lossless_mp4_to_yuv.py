@@ -1,22 +1,42 @@
 #!/usr/bin/env python
 import os
+import shlex
+import subprocess
 
 from pathlib import Path
 
+from compressai_vision.utils.manifest import FileManifest, run_conversions
+
 TVD_MP4_DIR = Path(os.path.expandvars("${VCM_TESTDATA}")) / "tvd_tracking_lossless"
 
 TVD_YUV_DIR = Path(os.path.expandvars("${VCM_TESTDATA}")) / "tvd_tracking_lossless"
 
+# read by tvd_to_yuv_crops.py to validate its inputs
+MANIFEST = TVD_YUV_DIR / "mp4_to_yuv_manifest.json"
 
-ALL_FILES = os.listdir(TVD_MP4_DIR)
-MP4_FILES = [af for af in ALL_FILES if af.endswith(".mp4")]
-
-print("Found:", MP4_FILES)
 
-for seq in ["TVD-01", "TVD-02", "TVD-03"]:
-    src_files = [mp4f for mp4f in MP4_FILES if mp4f.startswith(seq)]
-    src_file = src_files[0]
-    cmd = f"ffmpeg -i {TVD_MP4_DIR}/{src_file} {TVD_YUV_DIR}/{seq}.yuv"
+def run_command(cmd):
     print(cmd)
-    os.system(cmd)
-print("DONE")
+    subprocess.run(shlex.split(cmd), check=True)
+
+
+def main():
+    ALL_FILES = os.listdir(TVD_MP4_DIR)
+    MP4_FILES = [af for af in ALL_FILES if af.endswith(".mp4")]
+
+    print("Found:", MP4_FILES)
+
+    jobs = []
+    for seq in ["TVD-01", "TVD-02", "TVD-03"]:
+        src_files = [mp4f for mp4f in MP4_FILES if mp4f.startswith(seq)]
+        src_file = TVD_MP4_DIR / src_files[0]
+        dst_file = TVD_YUV_DIR / f"{seq}.yuv"
+        cmd = f"ffmpeg -y -i {src_file} {dst_file}"
+        jobs.append((dst_file, [src_file], (cmd,)))
+
+    run_conversions(run_command, jobs, FileManifest(MANIFEST))
+    print("DONE")
+
+
+if __name__ == "__main__":
+    main()
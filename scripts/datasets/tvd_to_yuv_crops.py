@@ -5,6 +5,12 @@ Extract SFU crops in YUV format from the original sequences
 
 import os
 
+from compressai_vision.utils.manifest import (
+    FileManifest,
+    copy_yuv_clip,
+    run_conversions,
+)
+
 SEQ_DICT = {
     "TVD-01-1": ["TVD-01", 3000, 50, 8, 1500, 500],
     "TVD-01-2": ["TVD-01", 3000, 50, 8, 2000, 500],
@@ -25,7 +31,7 @@ ALL_SRC_YUVS = [sf for sf in ALL_SRC_FILES if sf.endswith(".yuv")]
 os.makedirs(DST_YUV_DIR, exist_ok=True)
 
 
-def generate_yuv_clip(
+def yuv_clip_job(
     sequence, src_seq, width, height, frames_to_be_encoded, frame_skip, bit_depth
 ):
     src_yuvs = [sy for sy in ALL_SRC_YUVS if sy.startswith(src_seq)]
@@ -44,15 +50,11 @@ def generate_yuv_clip(
     offset = frame_size * frame_skip
     length = frame_size * frames_to_be_encoded
 
-    with open(src_yuv, "rb") as f:
-        f.seek(offset)
-        bytes = f.read(length)
-
-    with open(dst_yuv, "wb") as f:
-        f.write(bytes)
+    return dst_yuv, [src_yuv], (src_yuv, dst_yuv, offset, length)
 
 
 def main():
+    jobs = []
     for sequence, params in SEQ_DICT.items():
         width, height = 1920, 1080
         # intra_period, frame_rate = 64, 50
@@ -65,16 +67,29 @@ def main():
             frames_to_be_encoded,
         ) = params
 
-        generate_yuv_clip(
-            sequence,
-            src_seq,
-            width,
-            height,
-            frames_to_be_encoded,
-            frame_skip,
-            bit_depth,
+        jobs.append(
+            yuv_clip_job(
+                sequence,
+                src_seq,
+                width,
+                height,
+                frames_to_be_encoded,
+                frame_skip,
+                bit_depth,
+            )
         )
 
+    # the source yuvs from tvd_lossless_mp4_to_yuv.py, if its manifest is available
+    src_manifest = FileManifest(os.path.join(SRC_YUV_DIR, "mp4_to_yuv_manifest.json"))
+    if src_manifest.files:
+        invalid = src_manifest.validate({src for _, (src,), _ in jobs})
+        assert not invalid, f"incomplete or modified source yuvs: {invalid}"
+
+    manifest = FileManifest(os.path.join(DST_YUV_DIR, "manifest.json"))
+    run_conversions(copy_yuv_clip, jobs, manifest)
+    for name, md5 in sorted(manifest.md5sums().items()):
+        print(md5, name)
+
 
 if __name__ == "__main__":
     main()
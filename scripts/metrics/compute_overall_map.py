@@ -39,8 +39,8 @@ from __future__ import annotations
 import argparse
 import csv
 import json
-import os
 
+from concurrent.futures import ProcessPoolExecutor
 from typing import Any, List
 
 import numpy as np
@@ -53,6 +53,7 @@ from pycocotools.coco import COCO
 from pycocotools.cocoeval import COCOeval
 
 from compressai_vision.evaluators.evaluators import BaseEvaluator
+from compressai_vision.utils import get_max_num_cpus
 
 CLASSES = ["CLASS-AB", "CLASS-C", "CLASS-D"]
 
@@ -86,18 +87,22 @@ SEQUENCE_TO_OFFSET = {
     "RaceHorses": 140000,
 }
 
-TMP_EVAL_FILE = "tmp_eval.json"
-TMP_ANCH_FILE = "tmp_anch.json"
+# ground truth of the class being evaluated, set in each worker process
+_COCO_GT = None
 
 
-def compute_overall_mAP(class_name, items, no_cactus=False):
-    seq_root_names = SEQS_BY_CLASS[class_name]
+def _class_seq_root_names(class_name, no_cactus=False):
+    seq_root_names = list(SEQS_BY_CLASS[class_name])
 
     if no_cactus and class_name == "CLASS-AB":
         if "Cactus" in seq_root_names:
             seq_root_names.remove("Cactus")
 
-    classwise_instances_results = []
+    return seq_root_names
+
+
+def merge_ground_truth(items, seq_root_names):
+    """merges the ground truth of the sequences of a class, with offset image ids"""
     classwise_anchor_images = []
     classwise_annotation = []
     categories = None
@@ -107,13 +112,6 @@ def compute_overall_mAP(class_name, items, no_cactus=False):
 
         seq_img_id_offset = SEQUENCE_TO_OFFSET[root_name]
 
-        with open(item[utils.EVAL_INFO_KEY], "r") as f:
-            eval_data = json.load(f)
-
-        for d in eval_data:
-            d["image_id"] = int(d["image_id"]) + seq_img_id_offset
-            classwise_instances_results.append(d)
-
         with open(item[utils.GT_INFO_KEY], "r") as f:
             gt_data = json.load(f)
 
@@ -125,62 +123,117 @@ def compute_overall_mAP(class_name, items, no_cactus=False):
         for d in gt_data["annotations"]:
             annotation_id = annotation_id + 1
 
-            d["id"] = d["id"] = annotation_id
+            d["id"] = annotation_id
             d["image_id"] = d["image_id"] + seq_img_id_offset
             classwise_annotation.append(d)
 
         if e == 0:
             categories = gt_data["categories"]
 
-    classwise_gt_data = {
+    return {
         "images": classwise_anchor_images,
         "categories": categories,
         "annotations": classwise_annotation,
     }
 
-    with open(TMP_EVAL_FILE, "w") as f:
-        json.dump(classwise_instances_results, f, indent=4)
 
-    with open(TMP_ANCH_FILE, "w") as f:
-        json.dump(classwise_gt_data, f, indent=4)
+def merge_detections(items, seq_root_names) -> np.ndarray:
+    """
+    merges the detections of the sequences of a class, with offset image ids, as
+    the Nx7 [image_id, x, y, w, h, score, category_id] array taken by COCO.loadRes
+    """
+    detections = []
+    for item, root_name in zip(items, seq_root_names):
+        assert root_name in item[utils.SEQ_NAME_KEY]
 
-    summary = coco_evaluation(TMP_ANCH_FILE, TMP_EVAL_FILE)
+        seq_img_id_offset = SEQUENCE_TO_OFFSET[root_name]
 
-    os.remove(TMP_EVAL_FILE)
-    os.remove(TMP_ANCH_FILE)
+        with open(item[utils.EVAL_INFO_KEY], "r") as f:
+            eval_data = json.load(f)
 
-    # print("\n")
-    # print(summary)
-    # print("\n")
+        seq_detections = np.empty((len(eval_data), 7), dtype=np.float64)
+        for i, d in enumerate(eval_data):
+            seq_detections[i, 0] = int(d["image_id"]) + seq_img_id_offset
+            seq_detections[i, 1:5] = d["bbox"]
+            seq_detections[i, 5] = d["score"]
+            seq_detections[i, 6] = d["category_id"]
+        detections.append(seq_detections)
+
+    return np.concatenate(detections)
+
+
+def _coco_from_dict(dataset: dict) -> COCO:
+    coco = COCO()
+    coco.dataset = dataset
+    coco.createIndex()
+    return coco
+
+
+def _set_ground_truth(gt_data):
+    global _COCO_GT
+    _COCO_GT = _coco_from_dict(gt_data)
+
+
+def _evaluate_rate_point(items, seq_root_names):
+    detections = merge_detections(items, seq_root_names)
+    return coco_evaluation(_COCO_GT, _COCO_GT.loadRes(detections))
+
+
+def compute_overall_mAPs(
+    class_name, items_per_rate_point: List, no_cactus=False, num_workers=None
+):
+    """
+    Computes the overall mAP of a class at several rate points.
+
+    The ground truth of the sequences, the same for all the rate points, is merged
+    and indexed once. The rate points are evaluated in memory on num_workers
+    processes (by default, one per rate point within the cpu count, 0 to evaluate
+    them in this process), and a summary is returned for each of them.
+    """
+    seq_root_names = _class_seq_root_names(class_name, no_cactus)
+
+    gt_paths = [
+        [item[utils.GT_INFO_KEY] for item in items] for items in items_per_rate_point
+    ]
+    assert all(
+        paths == gt_paths[0] for paths in gt_paths
+    ), "the rate points of a class shall share the same ground truth"
+
+    gt_data = merge_ground_truth(items_per_rate_point[0], seq_root_names)
+
+    if num_workers is None:
+        num_workers = min(len(items_per_rate_point), get_max_num_cpus())
+    if num_workers <= 1:
+        _set_ground_truth(gt_data)
+        return [
+            _evaluate_rate_point(items, seq_root_names)
+            for items in items_per_rate_point
+        ]
+
+    with ProcessPoolExecutor(
+        num_workers, initializer=_set_ground_truth, initargs=(gt_data,)
+    ) as executor:
+        return list(
+            executor.map(
+                _evaluate_rate_point,
+                items_per_rate_point,
+                [seq_root_names] * len(items_per_rate_point),
+            )
+        )
 
-    return summary
+
+def compute_overall_mAP(class_name, items, no_cactus=False):
+    return compute_overall_mAPs(class_name, [items], no_cactus, num_workers=0)[0]
 
 
 # this function is originated from MPEG FCVCM Anchor s/w package (i.e., mpeg-fcvcm-sfu-objdet-anchor)
-def coco_evaluation(ann_file, detections):
-    if not os.path.isfile(detections):
-        return None
-    coco = COCO(ann_file)
-    coco_res = coco.loadRes(
-        detections
-    )  # JSON file like <sim_dir>/<test_name>/coco_instances_results.json
+def coco_evaluation(coco: COCO, coco_res: COCO):
     coco_eval = COCOeval(coco, coco_res, "bbox")
     coco_eval.params.imgIds = coco.getImgIds()  # image IDs to evaluate
     coco_eval.evaluate()
     coco_eval.accumulate()
     coco_eval.summarize()
 
-    import logging
-
-    class dummyclass:
-        def __init__(self):
-            self._logger = logging.getLogger(__name__)
-
-    # things = [i["name"] for i in coco_eval.cocoGt.cats.values()]
-    # out_all = COCOEvaluator._derive_coco_results(
-    #     dummyclass(), coco_eval, iou_type="bbox", class_names=things
-    # )
-
     headers = ["AP", "AP50", "AP75", "APS", "APM", "APL"]
     npstat = np.array(coco_eval.stats[:6])
     npstat = npstat * 100  # Percent
@@ -227,31 +280,50 @@ if __name__ == "__main__":
         required=True,
     )
 
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=None,
+        help="processes evaluating the rate points, 0 for none (default: one per rate point)",
+    )
+    parser.add_argument(
+        "--results_db",
+        default=None,
+        help="results database the runs appended to (misc.results_db), queried instead of scanning the result directory",
+    )
+
     args = parser.parse_args()
+    results_db = utils.open_results_db(args.results_db)
     if args.all_qualities:
         qualities = range(0, 6)
     else:
         qualities = [args.quality_index]
 
+    items_per_rate_point = []
+    for q in qualities:
+        items = utils.search_items(
+            args.result_path,
+            args.dataset_path,
+            q,
+            SEQS_BY_CLASS[args.class_to_compute],
+            BaseEvaluator.get_coco_eval_info_name,
+            results_db=results_db,
+        )
+
+        assert (
+            len(items) > 0
+        ), "Nothing relevant information found from given directories..."
+        items_per_rate_point.append(items)
+
+    summaries = compute_overall_mAPs(
+        args.class_to_compute, items_per_rate_point, num_workers=args.num_workers
+    )
+
     with open(
         f"{args.result_path}/{args.class_to_compute}.csv", "w", newline=""
     ) as file:
         writer = csv.writer(file)
-        for q in qualities:
-            items = utils.search_items(
-                args.result_path,
-                args.dataset_path,
-                q,
-                SEQS_BY_CLASS[args.class_to_compute],
-                BaseEvaluator.get_coco_eval_info_name,
-            )
-
-            assert (
-                len(items) > 0
-            ), "Nothing relevant information found from given directories..."
-
-            summary = compute_overall_mAP(args.class_to_compute, items)
-
+        for q, summary in zip(qualities, summaries):
             writer.writerow([f"{q}", f"{summary['AP'][0]:.4f}"])
             print(f"{'='*10} FINAL OVERALL mAP SUMMARY {'='*10}")
             print(f"{'-'*32} AP : {summary['AP'][0]:.4f}")
@@ -152,7 +152,14 @@ if __name__ == "__main__":
         required=True,
     )
 
+    parser.add_argument(
+        "--results_db",
+        default=None,
+        help="results database the runs appended to (misc.results_db), queried instead of scanning the result directory",
+    )
+
     args = parser.parse_args()
+    results_db = utils.open_results_db(args.results_db)
     if args.all_qualities:
         qualities = range(0, 6)
     else:
@@ -169,6 +176,7 @@ if __name__ == "__main__":
                 q,
                 SEQS_BY_CLASS[args.class_to_compute],
                 BaseEvaluator.get_jde_eval_info_name,
+                results_db=results_db,
             )
 
             assert (
@@ -33,68 +33,71 @@
 # References:
 # 1. H. Wang et al., "Improvements of the BD-Rate Metrics Using Monotonic Curve-Fitting Methods," 2024 Picture Coding Symposium (PCS), Taichung, Taiwan, 2024, pp. 1-5 (available online at  https://doi.org/10.1109/PCS60826.2024.10566370)
 
-import copy
-import math
-import sys
-
 import numpy as np
 import pandas as pd
 
-from cubic_polynomial import fit_cubic, func_cubic_1
+from rd_analysis import fit_monotonic_cubics, polyval3
 
+# rate points per sequence in the CTTC sheets
+NUM_RATE_POINTS = 6
 
-def _convert_nan_to_zero(values_possibly_nan):
-    for i in range(len(values_possibly_nan)):
-        if math.isnan(values_possibly_nan[i]):
-            values_possibly_nan[i] = 0.0
 
+def _fit_groups(rates, perfs, non_mono_only, group_size=NUM_RATE_POINTS):
+    """
+    Monotonic curve fitting of each group of group_size consecutive points, given in
+    decreasing rate order (i.e., sorted by qp), all the groups being fitted at once.
 
-def convert_to_monotonic_points_SFU(
-    seq_results, non_mono_only=True, perf_name="ap", rate_name="kbps"
-):
+    Return the accuracies with the fitted ones, a mask of the fitted points, and the
+    numbers of successful and failed fits.
     """
-    Functions to convert non-monotonic points to monotonic points.
+    perfs = np.asarray(perfs, dtype=np.float64)
 
-    Parameters:
-    seq_results: DataFrame --  the test results with non-monotonic points.
-    non_mono_only: bool -- apply the curve fitting on non-monotonic points only.
+    starts, xs, ys = [], [], []
+    for i in range(0, len(perfs), group_size):
+        y_values = np.nan_to_num(perfs[i : i + group_size])[::-1]
 
-    Return:
-    monotonic_seq_results: DataFrame -- the test results with monotonic points.
-    """
-    num_success = 0
-    num_non_success = 0
-    monotonic_seq_results = pd.DataFrame()
-    for i in range(0, len(seq_results), 6):
-        sub_df = seq_results.iloc[i : i + 6, :].reset_index(drop=True)
+        # check if the points are monotonic increase
+        is_increasing = bool(np.all(np.diff(y_values) > 0))
+        if non_mono_only and is_increasing:
+            continue
 
-        # get six x values (ap, mota) and y values
-        y_values = sub_df[perf_name].tolist()
-        _convert_nan_to_zero(y_values)
-        y_values.reverse()
+        x_values = np.log10(np.asarray(rates[i : i + group_size], dtype=np.float64))
+        starts.append(i)
+        xs.append(x_values[::-1])
+        ys.append(y_values)
 
-        x_values = sub_df[rate_name].tolist()
-        x_values.reverse()
-        x_values = np.log10(x_values)
+    coefs, success = fit_monotonic_cubics(xs, ys)
+
+    fitted = perfs.copy()
+    updated = np.zeros(len(perfs), dtype=bool)
+    for i, x_values, coef, ok in zip(starts, xs, coefs, success):
+        if ok:
+            fitted[i : i + len(x_values)] = polyval3(coef, x_values)[::-1]
+            updated[i : i + len(x_values)] = True
+
+    num_success = int(success.sum())
+    return fitted, updated, num_success, len(success) - num_success
+
+
+def _convert_df_to_monotonic_points(seq_results, non_mono_only, perf_name, rate_name):
+    monotonic_seq_results = seq_results.reset_index(drop=True)
+
+    fitted, updated, num_success, num_non_success = _fit_groups(
+        monotonic_seq_results[rate_name].tolist(),
+        monotonic_seq_results[perf_name].tolist(),
+        non_mono_only,
+    )
+    monotonic_seq_results.loc[updated, perf_name] = fitted[updated]
 
-        # check if the points are monotonic increase
-        is_increasing = all(x < y for x, y in zip(y_values, y_values[1:]))
-        if not non_mono_only or (non_mono_only and not is_increasing):
-            # curve fitting
-            sub_df = _core_curve_fitting_function(
-                x_values, y_values, sub_df, num_success, dataset="SFU"
-            )
-
-        monotonic_seq_results = pd.concat(
-            [monotonic_seq_results, sub_df], ignore_index=True
-        )
     print(f"num_success: {num_success}")
     print(f"num_non_success: {num_non_success}")
 
     return monotonic_seq_results
 
 
-def convert_to_monotonic_points_Pandaset(seq_results, non_mono_only=True):
+def convert_to_monotonic_points_SFU(
+    seq_results, non_mono_only=True, perf_name="ap", rate_name="kbps"
+):
     """
     Functions to convert non-monotonic points to monotonic points.
 
@@ -105,36 +108,23 @@ def convert_to_monotonic_points_Pandaset(seq_results, non_mono_only=True):
     Return:
     monotonic_seq_results: DataFrame -- the test results with monotonic points.
     """
-    num_success = 0
-    num_non_success = 0
-    monotonic_seq_results = pd.DataFrame()
-    for i in range(0, len(seq_results), 6):
-        sub_df = seq_results.iloc[i : i + 6, :].reset_index(drop=True)
+    return _convert_df_to_monotonic_points(
+        seq_results, non_mono_only, perf_name, rate_name
+    )
 
-        # get six x values and y values
-        y_values = sub_df["mIoU"].tolist()
-        _convert_nan_to_zero(y_values)
-        y_values.reverse()
 
-        x_values = sub_df["kbps"].tolist()
-        x_values.reverse()
-        x_values = np.log10(x_values)
+def convert_to_monotonic_points_Pandaset(seq_results, non_mono_only=True):
+    """
+    Functions to convert non-monotonic points to monotonic points.
 
-        # check if the points are monotonic increase
-        is_increasing = all(x < y for x, y in zip(y_values, y_values[1:]))
-        if not non_mono_only or (non_mono_only and not is_increasing):
-            # curve fitting
-            sub_df = _core_curve_fitting_function(
-                x_values, y_values, sub_df, num_success, dataset="SFU"
-            )
-
-        monotonic_seq_results = pd.concat(
-            [monotonic_seq_results, sub_df], ignore_index=True
-        )
-    print(f"num_success: {num_success}")
-    print(f"num_non_success: {num_non_success}")
+    Parameters:
+    seq_results: DataFrame --  the test results with non-monotonic points.
+    non_mono_only: bool -- apply the curve fitting on non-monotonic points only.
 
-    return monotonic_seq_results
+    Return:
+    monotonic_seq_results: DataFrame -- the test results with monotonic points.
+    """
+    return _convert_df_to_monotonic_points(seq_results, non_mono_only, "mIoU", "kbps")
 
 
 def convert_to_monotonic_points_TVD(seq_results, non_mono_only=True) -> list:
@@ -142,60 +132,25 @@ def convert_to_monotonic_points_TVD(seq_results, non_mono_only=True) -> list:
     Functions to convert non-monotonic points to monotonic points.
 
     Parameters:
-    seq_results: DataFrame --  the test results with non-monotonic points.
+    seq_results: list --  the test results with non-monotonic points, as rows
+    holding the rate and the accuracy at indices 1 and 2.
     non_mono_only: bool -- apply the curve fitting on non-monotonic points only.
-    category: string -- indicate the category
 
     Return:
-    monotonic_seq_results: DataFrame -- the test results with monotonic points.
+    monotonic_seq_results: list -- the test results with monotonic points.
     """
-    seq_results_copy = copy.deepcopy(seq_results)
-    monotonic_seq_results = []
-    num_success = 0
-    num_non_success = 0
-    for i in range(0, len(seq_results_copy), 6):
-        sub_list = seq_results_copy[i : i + 6]
-        # get six x values (ap, mota) and y values
-        y_values = [float(x[2]) for x in sub_list]
-        _convert_nan_to_zero(y_values)
-        y_values.reverse()
-
-        x_values = [x[1] for x in sub_list]
-        x_values.reverse()
-        x_values = np.log10(x_values)
-
-        # check if the points are monotonic increase
-        is_increasing = all(x < y for x, y in zip(y_values, y_values[1:]))
-        if not non_mono_only or (non_mono_only and not is_increasing):
-            # curve fitting
-            sub_list = _core_curve_fitting_function(
-                x_values, y_values, sub_list, num_success, dataset="TVD"
-            )
+    monotonic_seq_results = [list(row) for row in seq_results]
 
-        monotonic_seq_results.extend(sub_list)
+    fitted, updated, num_success, num_non_success = _fit_groups(
+        [row[1] for row in monotonic_seq_results],
+        [float(row[2]) for row in monotonic_seq_results],
+        non_mono_only,
+    )
+    for row, value, is_updated in zip(monotonic_seq_results, fitted, updated):
+        if is_updated:
+            row[2] = value
 
     print(f"num_success: {num_success}")
     print(f"num_non_success: {num_non_success}")
 
     return monotonic_seq_results
-
-
-def _core_curve_fitting_function(x_values, y_values, sub_data, num_success, dataset):
-    res = fit_cubic(x_values, y_values)
-    num_non_success = 0
-    if res.success:
-        num_success = num_success + 1
-        coef = res.x
-        y_values_mono = [func_cubic_1(x, coef) for x in x_values]
-        # update ap values
-        y_values_mono.reverse()
-        if dataset == "TVD":
-            for j, d in enumerate(sub_data):
-                d[2] = y_values_mono[j]
-        else:
-            sub_data["ap"] = y_values_mono
-
-    else:
-        num_non_success = num_non_success + 1
-
-    return sub_data
@@ -36,6 +36,7 @@ from __future__ import annotations
 import argparse
 import os
 
+from collections import Counter
 from glob import iglob
 from os.path import join
 from pathlib import Path
@@ -44,7 +45,7 @@ import numpy as np
 import pandas as pd
 import utils
 
-from compute_overall_map import compute_overall_mAP
+from compute_overall_map import compute_overall_mAPs
 from compute_overall_miou import compute_overall_mIoU
 from compute_overall_mot import compute_overall_mota
 from curve_fitting import (
@@ -58,7 +59,16 @@ from compressai_vision.evaluators.evaluators import BaseEvaluator
 DATASETS = ["TVD", "SFU", "OIV6", "HIEVE", "PANDASET"]
 
 
-def read_df_rec(path, seq_list, nb_operation_points, fn_regex=r"summary.csv"):
+def read_df_rec(
+    path,
+    seq_list=None,
+    nb_operation_points=0,
+    fn_regex=r"summary.csv",
+    results_db=None,
+):
+    if results_db is not None:
+        return read_df_db(path, nb_operation_points, results_db)
+
     summary_csvs = [f for f in iglob(join(path, "**", fn_regex), recursive=True)]
     if nb_operation_points > 0:
         seq_names = [
@@ -76,6 +86,18 @@ def read_df_rec(path, seq_list, nb_operation_points, fn_regex=r"summary.csv"):
     )
 
 
+def read_df_db(path, nb_operation_points, results_db):
+    runs = results_db.latest(path)
+    if nb_operation_points > 0:
+        counts = Counter(run["dataset_name"] for run in runs)
+        for sequence, count in counts.items():
+            assert (
+                count == nb_operation_points
+            ), f"Did not find {nb_operation_points} results for {sequence}"
+
+    return pd.DataFrame.from_records([row for run in runs for row in run["summary"]])
+
+
 def df_append(df1, df2):
     out = pd.concat([df1, df2], ignore_index=True)
     out.reset_index()
@@ -155,9 +177,12 @@ def generate_csv_classwise_video_map(
     nb_operation_points: int = 4,
     no_cactus: bool = False,
     skip_classwise: bool = False,
+    results_db=None,
 ):
     opts_metrics = {"AP": 0, "AP50": 1, "AP75": 2, "APS": 3, "APM": 4, "APL": 5}
-    results_df = read_df_rec(result_path, seq_list, nb_operation_points)
+    results_df = read_df_rec(
+        result_path, seq_list, nb_operation_points, results_db=results_db
+    )
 
     # sort
     sorterIndex = dict(zip(seq_list, range(len(seq_list))))
@@ -177,7 +202,7 @@ def generate_csv_classwise_video_map(
         classwise_name = list(seqs_by_class.keys())[0]
         classwise_seqs = list(seqs_by_class.values())[0]
 
-        class_wise_maps = []
+        items_per_rate_point = []
         for q in range(nb_operation_points):
             items = utils.search_items(
                 result_path,
@@ -187,16 +212,22 @@ def generate_csv_classwise_video_map(
                 BaseEvaluator.get_coco_eval_info_name,
                 by_name=True,
                 gt_folder=gt_folder,
+                results_db=results_db,
             )
 
             assert (
                 len(items) > 0
             ), "No evaluation information found in provided result directories..."
+            items_per_rate_point.append(items)
 
-            if not skip_classwise:
-                summary = compute_overall_mAP(classwise_name, items, no_cactus)
-                maps = summary.values[0][opts_metrics[metric]]
-                class_wise_maps.append(maps)
+        class_wise_maps = []
+        if not skip_classwise and nb_operation_points > 0:
+            summaries = compute_overall_mAPs(
+                classwise_name, items_per_rate_point, no_cactus
+            )
+            class_wise_maps = [
+                summary.values[0][opts_metrics[metric]] for summary in summaries
+            ]
 
         if not skip_classwise and nb_operation_points > 0:
             matched_seq_names = []
@@ -219,6 +250,7 @@ def generate_csv_classwise_video_mota(
     dataset_path,
     list_of_classwise_seq,
     nb_operation_points: int = 4,
+    results_db=None,
 ):
     seq_lists = [
         list(class_seq_dict.values())[0] for class_seq_dict in list_of_classwise_seq
@@ -226,7 +258,9 @@ def generate_csv_classwise_video_mota(
     seq_list = []
     [seq_list.extend(sequences) for sequences in seq_lists]
 
-    results_df = read_df_rec(result_path, seq_list, nb_operation_points)
+    results_df = read_df_rec(
+        result_path, seq_list, nb_operation_points, results_db=results_db
+    )
     results_df = results_df.sort_values(by=["Dataset", "qp"], ascending=[True, True])
 
     # accuracy in % for MPEG template
@@ -248,6 +282,7 @@ def generate_csv_classwise_video_mota(
                 q,
                 classwise_seqs,
                 BaseEvaluator.get_jde_eval_info_name,
+                results_db=results_db,
             )
 
             assert (
@@ -282,8 +317,11 @@ def generate_csv_classwise_video_miou(
     list_of_classwise_seq,
     seq_list,
     nb_operation_points: int = 4,
+    results_db=None,
 ):
-    results_df = read_df_rec(result_path, seq_list, nb_operation_points)
+    results_df = read_df_rec(
+        result_path, seq_list, nb_operation_points, results_db=results_db
+    )
 
     # sort
     sorterIndex = dict(zip(seq_list, range(len(seq_list))))
@@ -312,6 +350,7 @@ def generate_csv_classwise_video_miou(
                 BaseEvaluator.get_miou_eval_info_name,
                 by_name=True,
                 pandaset_flag=True,
+                results_db=results_db,
             )
 
             assert (
@@ -337,8 +376,10 @@ def generate_csv_classwise_video_miou(
     return output_df
 
 
-def generate_csv(result_path, seq_list, nb_operation_points):
-    result_df = read_df_rec(result_path, seq_list, nb_operation_points)
+def generate_csv(result_path, seq_list, nb_operation_points, results_db=None):
+    result_df = read_df_rec(
+        result_path, seq_list, nb_operation_points, results_db=results_db
+    )
 
     # sort
     result_df = result_df.sort_values(by=["Dataset", "qp"], ascending=[True, True])
@@ -409,6 +450,11 @@ if __name__ == "__main__":
         default=False,
         help="exclude Cactus sequence for FCM eval",
     )
+    parser.add_argument(
+        "--results_db",
+        default=None,
+        help="results database the runs appended to (misc.results_db), queried instead of scanning the result directory",
+    )
 
     args = parser.parse_args()
 
@@ -418,6 +464,7 @@ if __name__ == "__main__":
     ), "Please check correspondance between input dataset name and result directory"
 
     norm_result_path = os.path.normpath(args.result_path) + "/"
+    results_db = utils.open_results_db(args.results_db)
 
     if args.dataset_name == "SFU":
         metric = args.metric
@@ -493,6 +540,7 @@ if __name__ == "__main__":
             args.nb_operation_points,
             args.no_cactus,
             args.mode == "VCM",  # skip classwise evaluation
+            results_db,
         )
 
         if args.mode == "VCM":
@@ -504,7 +552,7 @@ if __name__ == "__main__":
             )
     elif args.dataset_name == "OIV6":
         output_df = generate_csv(
-            norm_result_path, ["MPEGOIV6"], args.nb_operation_points
+            norm_result_path, ["MPEGOIV6"], args.nb_operation_points, results_db
         )
     elif args.dataset_name == "TVD":
         if args.mode == "FCM":
@@ -514,6 +562,7 @@ if __name__ == "__main__":
                 args.dataset_path,
                 [tvd_all],
                 args.nb_operation_points,
+                results_db,
             )
         else:
             tvd_all = {
@@ -528,7 +577,7 @@ if __name__ == "__main__":
                 ]
             }
 
-            results_df = read_df_rec(norm_result_path)
+            results_df = read_df_rec(norm_result_path, results_db=results_db)
             results_df = results_df.sort_values(
                 by=["Dataset", "qp"], ascending=[True, True]
             )
@@ -557,6 +606,7 @@ if __name__ == "__main__":
             args.dataset_path,
             [hieve_1080p, hieve_720p],
             args.nb_operation_points,
+            results_db,
         )
         # sort for FCM template - comply with the template provided in wg04n00459
         seq_list = [
@@ -667,6 +717,7 @@ if __name__ == "__main__":
             [PANDAM1, PANDAM2, PANDAM3],
             seq_list,
             args.nb_operation_points,
+            results_db,
         )
     else:
         raise NotImplementedError
@@ -0,0 +1,391 @@
+# Copyright (c) 2022-2024, InterDigital Communications, Inc
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted (subject to the limitations in the disclaimer
+# below) provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of InterDigital Communications, Inc nor the names of its
+#   contributors may be used to endorse or promote products derived from this
+#   software without specific prior written permission.
+
+# NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY
+# THIS LICENSE. THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+r"""
+Rate-distortion analysis of the CTTC results: monotonic curve fitting and BD metrics
+
+The rd points of all the sequences are fitted at once. The cubics of the monotonic
+curve fitting [1] are first fitted by batched least squares. Where that fit already
+meets the constraints it is the solution, the problem being a convex quadratic
+program. Otherwise, it warm-starts SLSQP (with analytic jacobians), and these
+sequences are solved on a process pool.
+
+The BD-rate and BD-accuracy are computed between any number of anchors and tests,
+each results table being fitted once, and the pairs being integrated in batch.
+
+Usage:
+
+.. code-block:: bash
+
+    python scripts/metrics/rd_analysis.py --anchors final_SFU_anchor.csv \
+                                          --tests final_SFU_test1.csv final_SFU_test2.csv \
+                                          --rate_name "bitrate (kbps)" \
+                                          --curve_fit \
+                                          --output bd_SFU.csv
+
+References:
+1. H. Wang et al., "Improvements of the BD-Rate Metrics Using Monotonic Curve-Fitting Methods," 2024 Picture Coding Symposium (PCS), Taichung, Taiwan, 2024, pp. 1-5
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from scipy.optimize import minimize
+
+from compressai_vision.utils import get_max_num_cpus
+
+# feasibility tolerance of the least-squares cubics
+_TOLERANCE = 1e-9
+
+# below this number of sequences to solve, the pool costs more than it saves
+_MIN_SOLVES_PER_WORKER = 8
+
+
+def _powers(x: np.ndarray) -> np.ndarray:
+    """[x^3, x^2, x, 1] along a new last axis"""
+    return np.stack([x**3, x**2, x, np.ones_like(x)], axis=-1)
+
+
+def polyval3(coefs: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """evaluates the cubics coefs (..., 4), highest degree first, at x (..., P)"""
+    return np.einsum("...pk,...k->...p", _powers(x), coefs)
+
+
+def polyfit3(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """least-squares cubics of the rows of y (N, P) at the rows of x, in batch"""
+    return np.einsum("nkp,np->nk", np.linalg.pinv(_powers(x)), y)
+
+
+def _integral3(coefs: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """integrals of the cubics coefs (N, 4) over [lo, hi]"""
+    antiderivative = coefs / np.array([4.0, 3.0, 2.0, 1.0])
+
+    def at(x):
+        return np.einsum("nk,nk->n", antiderivative, _powers(x) * x[:, None])
+
+    return at(hi) - at(lo)
+
+
+def _monotonic_constraints(x: np.ndarray, m_min: float, m_max: float):
+    """
+    A (N, 2P+2, 4) and c (N, 2P+2) such that the constraints of the monotonic cubic
+    fitting of fit_cubic read A @ b >= c: increasing and concave at the points, and
+    within [m_min, m_max] at the first and last points.
+    """
+    zeros, ones = np.zeros_like(x), np.ones_like(x)
+    first_derivative = np.stack([3 * x**2, 2 * x, ones, zeros], axis=-1)
+    second_derivative = np.stack([-6 * x, -2 * ones, zeros, zeros], axis=-1)
+    powers = _powers(x)
+
+    a = np.concatenate(
+        [
+            first_derivative,
+            second_derivative,
+            powers[:, :1],
+            -powers[:, -1:],
+        ],
+        axis=1,
+    )
+    n, p = x.shape
+    c = np.concatenate(
+        [np.zeros((n, 2 * p)), np.full((n, 1), m_min), np.full((n, 1), -m_max)],
+        axis=1,
+    )
+    return a, c
+
+
+def _solve_monotonic_cubic(args):
+    """SLSQP of one sequence, warm-started at x0"""
+    x, y, a, c, x0 = args
+    v = _powers(x)
+
+    def objective(b):
+        residual = v @ b - y
+        return residual @ residual
+
+    def gradient(b):
+        return 2 * v.T @ (v @ b - y)
+
+    res = minimize(
+        objective,
+        x0=x0,
+        jac=gradient,
+        method="SLSQP",
+        constraints=dict(type="ineq", fun=lambda b: a @ b - c, jac=lambda b: a),
+    )
+    return res.x, res.success
+
+
+def _fit_same_length(x, y, m_min, m_max, num_workers):
+    coefs = polyfit3(x, y)
+    success = np.ones(len(x), dtype=bool)
+
+    a, c = _monotonic_constraints(x, m_min, m_max)
+    feasible = (np.einsum("njk,nk->nj", a, coefs) >= c - _TOLERANCE).all(axis=1)
+
+    to_solve = np.flatnonzero(~feasible)
+    if len(to_solve) == 0:
+        return coefs, success
+
+    args = [(x[i], y[i], a[i], c[i], coefs[i]) for i in to_solve]
+    if num_workers is None:
+        num_workers = get_max_num_cpus()
+    num_workers = min(num_workers, len(args) // _MIN_SOLVES_PER_WORKER)
+
+    if num_workers <= 1:
+        results = [_solve_monotonic_cubic(arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(num_workers) as executor:
+            chunksize = -(-len(args) // (4 * num_workers))
+            results = list(
+                executor.map(_solve_monotonic_cubic, args, chunksize=chunksize)
+            )
+
+    for i, (b, ok) in zip(to_solve, results):
+        coefs[i] = b
+        success[i] = ok
+
+    return coefs, success
+
+
+def fit_monotonic_cubics(
+    xs: Sequence[np.ndarray],
+    ys: Sequence[np.ndarray],
+    m_min: float = 0,
+    m_max: float = 100,
+    num_workers: Optional[int] = None,
+):
+    """
+    Monotonic cubic fitting [1] of the points (xs[i], ys[i]) of each sequence, with
+    xs increasing; the same problem as cubic_polynomial.fit_cubic, for all the
+    sequences at once.
+
+    Sequences with the same number of points are fitted in batch. num_workers bounds
+    the processes running SLSQP (None: the cpu count, 0: no pool).
+
+    Returns the coefficients (N, 4), highest degree first, and the success of each fit.
+    """
+    coefs = np.zeros((len(xs), 4))
+    success = np.zeros(len(xs), dtype=bool)
+
+    by_length: Dict[int, List[int]] = {}
+    for i, x in enumerate(xs):
+        by_length.setdefault(len(x), []).append(i)
+
+    for indices in by_length.values():
+        x = np.array([xs[i] for i in indices], dtype=np.float64)
+        y = np.array([ys[i] for i in indices], dtype=np.float64)
+        coefs[indices], success[indices] = _fit_same_length(
+            x, y, m_min, m_max, num_workers
+        )
+
+    return coefs, success
+
+
+class RDCurves:
+    """
+    Cubic fits of the rd points of each sequence of a results table, the log10 rate
+    as a function of the accuracy (for the BD-rate) and the accuracy as a function of
+    the log10 rate (for the BD-accuracy). Nan accuracies count as 0, as in the curve
+    fitting of the CTTC sheets.
+
+    With curve_fit, the accuracies are first replaced with the monotonic cubic fit of
+    the points, where it succeeds.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        rate_name: str = "bitrate (kbps)",
+        perf_name: str = "end_accuracy",
+        name_column: str = "Dataset",
+        curve_fit: bool = False,
+        num_workers: Optional[int] = None,
+    ):
+        self.names, log_rates, perfs = [], [], []
+        for name, points in df.groupby(name_column, sort=False):
+            points = points.sort_values(rate_name)
+            self.names.append(name)
+            log_rates.append(np.log10(points[rate_name].to_numpy(np.float64)))
+            perfs.append(np.nan_to_num(points[perf_name].to_numpy(np.float64)))
+
+        if curve_fit:
+            coefs, success = fit_monotonic_cubics(
+                log_rates, perfs, num_workers=num_workers
+            )
+            perfs = [
+                polyval3(b, x) if ok else y
+                for b, ok, x, y in zip(coefs, success, log_rates, perfs)
+            ]
+
+        n = len(self.names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.rate_fit = np.zeros((n, 4))
+        self.perf_fit = np.zeros((n, 4))
+        self.log_rate_range = np.array([(x.min(), x.max()) for x in log_rates])
+        self.perf_range = np.array([(y.min(), y.max()) for y in perfs])
+
+        by_length: Dict[int, List[int]] = {}
+        for i, x in enumerate(log_rates):
+            by_length.setdefault(len(x), []).append(i)
+
+        for indices in by_length.values():
+            assert len(log_rates[indices[0]]) >= 4, "a cubic fit takes 4 rd points"
+            x = np.array([log_rates[i] for i in indices])
+            y = np.array([perfs[i] for i in indices])
+            self.rate_fit[indices] = polyfit3(y, x)
+            self.perf_fit[indices] = polyfit3(x, y)
+
+    @classmethod
+    def from_csv(cls, path, **kwargs) -> "RDCurves":
+        return cls(pd.read_csv(path), **kwargs)
+
+
+def _average_difference(fits, ranges, a, t):
+    """average difference of the test and anchor fits over their common range"""
+    lo = np.maximum(ranges[0][a, 0], ranges[1][t, 0])
+    hi = np.minimum(ranges[0][a, 1], ranges[1][t, 1])
+    valid = hi > lo
+    lo, hi = np.where(valid, lo, 0.0), np.where(valid, hi, 1.0)
+
+    diff = (_integral3(fits[1][t], lo, hi) - _integral3(fits[0][a], lo, hi)) / (
+        hi - lo
+    )
+    return np.where(valid, diff, np.nan)
+
+
+def bd_metrics(anchor: RDCurves, test: RDCurves) -> pd.DataFrame:
+    """
+    BD-rate (%) and BD-accuracy of the sequences of test against those of anchor,
+    for the sequences found in both, nan where the curves do not overlap.
+    """
+    names = [name for name in test.names if name in anchor.index]
+    a = np.array([anchor.index[name] for name in names], dtype=np.int64)
+    t = np.array([test.index[name] for name in names], dtype=np.int64)
+
+    log_rate_diff = _average_difference(
+        (anchor.rate_fit, test.rate_fit), (anchor.perf_range, test.perf_range), a, t
+    )
+    perf_diff = _average_difference(
+        (anchor.perf_fit, test.perf_fit),
+        (anchor.log_rate_range, test.log_rate_range),
+        a,
+        t,
+    )
+
+    return pd.DataFrame(
+        {
+            "Dataset": names,
+            "BD-rate (%)": (np.power(10.0, log_rate_diff) - 1) * 100,
+            "BD-accuracy": perf_diff,
+        }
+    )
+
+
+def bd_tables(
+    anchors: Dict[str, RDCurves], tests: Dict[str, RDCurves]
+) -> pd.DataFrame:
+    """BD metrics of every test against every anchor, in one table"""
+    tables = []
+    for anchor_name, anchor in anchors.items():
+        for test_name, test in tests.items():
+            table = bd_metrics(anchor, test)
+            table.insert(0, "test", test_name)
+            table.insert(0, "anchor", anchor_name)
+            tables.append(table)
+
+    return pd.concat(tables, ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "--anchors",
+        nargs="+",
+        required=True,
+        help="results tables of the anchors, e.g. the final_[dataset].csv of gen_mpeg_cttc_csv.py",
+    )
+    parser.add_argument(
+        "--tests", nargs="+", required=True, help="results tables of the tests"
+    )
+    parser.add_argument(
+        "--rate_name",
+        default="bitrate (kbps)",
+        help="rate column, e.g. 'avg_bpp' for image datasets (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--perf_name",
+        default="end_accuracy",
+        help="accuracy column (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--curve_fit",
+        action="store_true",
+        default=False,
+        help="apply the monotonic curve fitting to the rd points first",
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=None,
+        help="processes running the curve fitting solver, 0 for none (default: cpu count)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="bd_metrics.csv",
+        help="csv of the BD metrics of each anchor / test pair (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    kwargs = {
+        "rate_name": args.rate_name,
+        "perf_name": args.perf_name,
+        "curve_fit": args.curve_fit,
+        "num_workers": args.num_workers,
+    }
+    anchors = {Path(p).stem: RDCurves.from_csv(p, **kwargs) for p in args.anchors}
+    tests = {Path(p).stem: RDCurves.from_csv(p, **kwargs) for p in args.tests}
+
+    output_df = bd_tables(anchors, tests)
+    output_df.to_csv(args.output, index=False)
+    print(output_df)
+    print(f"BD metrics saved at: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -41,6 +41,8 @@ import re
 
 from pathlib import Path
 
+from compressai_vision.utils import ResultsDB
+
 __all__ = [
     "get_seq_number",
     # "get_eval_info_path",
@@ -174,7 +176,21 @@ def search_items(
     by_name=False,
     pandaset_flag=False,
     gt_folder="annotations",
+    results_db=None,
 ):
+    if results_db is not None:
+        return search_items_db(
+            results_db,
+            result_path,
+            dataset_path,
+            rate_point,
+            seq_list,
+            eval_func,
+            by_name,
+            pandaset_flag,
+            gt_folder,
+        )
+
     _ret_list = []
     for seq_name in seq_list:
         if by_name is True:
@@ -212,3 +228,86 @@ def search_items(
         _ret_list.append(d)
 
     return _ret_list
+
+
+def _qp_key(run):
+    try:
+        return float(run["qp"])
+    except (TypeError, ValueError):
+        return float("inf")
+
+
+def search_items_db(
+    results_db,
+    result_path: str,
+    dataset_path: str,
+    rate_point: int,
+    seq_list: list,
+    eval_func: callable,
+    by_name=False,
+    pandaset_flag=False,
+    gt_folder="annotations",
+):
+    """search_items over the runs recorded in a ResultsDB, not scanning result_path"""
+    runs_by_dname = {}
+    for run in results_db.latest(result_path):
+        runs_by_dname.setdefault(run["dataset_name"], []).append(run)
+    dnames = sorted(runs_by_dname)
+
+    _ret_list = []
+    for seq_name in seq_list:
+        if by_name is True:
+            matched = [d for d in dnames if seq_name in d]
+            if len(matched) == 0:
+                continue
+        else:  # by number
+            seq_num = get_seq_number(seq_name)
+            matched = [d for d in dnames if get_seq_number(d) == seq_num]
+            assert len(matched) > 0, f"no run of {seq_name} found in {result_path}"
+        dname = matched[0]
+
+        runs = sorted(runs_by_dname[dname], key=_qp_key)
+        if rate_point == -1:
+            assert len(runs) == 1, f"found {len(runs)} runs of {dname}, expected one"
+            run = runs[0]
+        else:
+            if len(runs) < rate_point + 1:
+                assert by_name is True, f"no run at rate point {rate_point} of {dname}"
+                continue
+            run = runs[rate_point]
+
+        eval_info_path = f"{run['eval_dir']}/{eval_func(dname)}"
+        check_file_validity(eval_info_path)
+
+        if by_name is False:
+            seq_info_path, seq_gt_path = get_seq_info_path_by_seq_num(
+                seq_num, dataset_path
+            )
+        elif pandaset_flag is True:
+            seq_info_path, seq_gt_path = get_seq_info_path_by_seq_name_pandaset(
+                seq_name, dataset_path, gt_folder
+            )
+        else:
+            seq_info_path, seq_gt_path = get_seq_info_path_by_seq_name(
+                seq_name, dataset_path, gt_folder
+            )
+
+        d = {
+            SEQ_NAME_KEY: dname,
+            SEQ_INFO_KEY: seq_info_path,
+            EVAL_INFO_KEY: eval_info_path,
+            GT_INFO_KEY: seq_gt_path,
+        }
+
+        _ret_list.append(d)
+
+    return _ret_list
+
+
+def open_results_db(path):
+    """ResultsDB at path, None if path is None (results found by scanning the tree)"""
+    if path is None:
+        return None
+
+    assert os.path.isfile(path), f"{path} does not exist"
+    return ResultsDB(path)